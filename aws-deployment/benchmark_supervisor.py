@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Check that SealionInference keeps its throughput with a chatty llama.cpp
+Runs a stream of requests through SealionInference against
+fake_llama_server.py, which logs a few hundred lines per request, and
+reports latency per batch: with the pipes drained it stays flat, and with
+--crash-after the supervisor restarts the server and the requests recover.
+--baseline instead launches the fake server the old way (pipes never read)
+and counts how many requests complete before it stalls.
+
+Usage:
+    python benchmark_supervisor.py --requests 300 --batch 50
+    python benchmark_supervisor.py --requests 300 --crash-after 120
+    python benchmark_supervisor.py --baseline
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAKE_SERVER = os.path.join(HERE, 'fake_llama_server.py')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_baseline(port, requests_count):
+    """Old behaviour: PIPEs nobody reads"""
+    process = subprocess.Popen([sys.executable, FAKE_SERVER, '--port', str(port)],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        url = f"http://localhost:{port}"
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+
+        for i in range(requests_count):
+            try:
+                requests.post(f"{url}/completion", json={"prompt": f"q{i}", "n_predict": 16}, timeout=3)
+            except requests.RequestException as e:
+                print(f"Request {i + 1} stalled ({type(e).__name__}): the server is blocked writing logs")
+                return
+        print(f"All {requests_count} requests completed")
+    finally:
+        process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description='llama.cpp supervisor throughput check')
+    parser.add_argument('--requests', type=int, default=300, help='Requests to send')
+    parser.add_argument('--batch', type=int, default=50, help='Requests per reported batch')
+    parser.add_argument('--log-lines', type=int, default=200, help='Log lines per stream per request')
+    parser.add_argument('--crash-after', type=int, default=0, help='Make the fake server crash after N requests')
+    parser.add_argument('--baseline', action='store_true', help='Run the fake server with undrained pipes')
+    args = parser.parse_args()
+
+    port = free_port()
+    if args.baseline:
+        run_baseline(port, args.requests)
+        return
+
+    os.environ.update({
+        'LLAMA_SERVER_BIN': FAKE_SERVER,
+        'LLAMA_PORT': str(port),
+        'FAKE_LLAMA_LOG_LINES': str(args.log_lines),
+        'FAKE_LLAMA_CRASH_AFTER': str(args.crash_after)
+    })
+    import inference
+    sealion = inference.inference
+
+    start = time.perf_counter()
+    sealion.start_server()
+    print(f"Server ready in {time.perf_counter() - start:.2f} s")
+
+    latencies, errors = [], 0
+    quiet = io.StringIO()
+    try:
+        for i in range(args.requests):
+            request_start = time.perf_counter()
+            # Same flow as handler(): wait for a (re)started server, then predict
+            with contextlib.redirect_stdout(quiet):
+                if not sealion.server_ready:
+                    sealion.start_server()
+                result = sealion.predict({"inputs": f"Question {i}", "parameters": {"max_new_tokens": 16}})
+            latencies.append((time.perf_counter() - request_start) * 1000)
+            errors += result.get("status") != "success"
+            quiet.seek(0)
+            quiet.truncate()
+
+            if (i + 1) % args.batch == 0:
+                batch = latencies[-args.batch:]
+                print(f"requests {i + 2 - args.batch:4d}-{i + 1:4d}: mean {statistics.mean(batch):6.1f} ms | "
+                      f"max {max(batch):7.1f} ms | errors so far {errors}")
+    finally:
+        stats = sealion.supervisor.stats()
+        sealion.cleanup()
+
+    print(f"Supervisor: {stats}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Chatty stand-in for the llama.cpp server, for exercising SealionInference
+Accepts the llama.cpp server arguments, logs a burst of verbose lines to
+stdout and stderr on startup and for every request (as --verbose does),
+serves /health (503 while "loading") and /completion, and can crash after N
+requests. Point LLAMA_SERVER_BIN at this file to use it; the FAKE_LLAMA_*
+variables set the defaults when it is started with llama.cpp's arguments.
+
+Usage:
+    python fake_llama_server.py --port 8080 --log-lines 200 --crash-after 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def log(stream, msg, **fields):
+    """One llama.cpp-style JSON log line"""
+    stream.write(json.dumps({"timestamp": int(time.time()), "level": "INFO", "function": "main",
+                             "msg": msg, **fields}) + "\n")
+    stream.flush()
+
+class FakeLlamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send(404, {'error': 'not found'})
+        elif not self.server.loaded.is_set():
+            self._send(503, {'status': 'loading model'})
+        else:
+            self._send(200, {'status': 'ok'})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        # Blocking writes, like llama.cpp: with nobody reading the pipes this stalls the request
+        filler = 'x' * self.server.line_bytes
+        for i in range(self.server.log_lines):
+            log(sys.stdout, "slot update", slot=i % 2, n_past=i, detail=filler)
+            log(sys.stderr, "sampled token", token=i, detail=filler)
+
+        with self.server.lock:
+            self.server.requests += 1
+            crash = self.server.crash_after and self.server.requests >= self.server.crash_after
+        if crash:
+            log(sys.stderr, "simulated crash", requests=self.server.requests)
+            os._exit(1)
+
+        n_predict = int(body.get('n_predict', 16))
+        self._send(200, {
+            'content': ' '.join(['token'] * n_predict),
+            'tokens_cached': len(body.get('prompt', '').split()),
+            'timings': {'prompt_ms': 1.0, 'predicted_per_second': 1000.0}
+        })
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Chatty fake llama.cpp server')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--load-seconds', type=float, default=float(os.environ.get('FAKE_LLAMA_LOAD_SECONDS', '0.5')),
+                        help='Simulated model load time')
+    parser.add_argument('--log-lines', type=int, default=int(os.environ.get('FAKE_LLAMA_LOG_LINES', '200')),
+                        help='Lines logged to each stream per request')
+    parser.add_argument('--line-bytes', type=int, default=int(os.environ.get('FAKE_LLAMA_LINE_BYTES', '200')),
+                        help='Approximate size of each log line')
+    parser.add_argument('--crash-after', type=int, default=int(os.environ.get('FAKE_LLAMA_CRASH_AFTER', '0')),
+                        help='Exit after this many requests (0 = never)')
+    args, _ = parser.parse_known_args()  # Ignore the remaining llama.cpp flags
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeLlamaHandler)
+    server.daemon_threads = True
+    server.loaded = threading.Event()
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.log_lines = args.log_lines
+    server.line_bytes = args.line_bytes
+    server.crash_after = args.crash_after
+
+    log(sys.stdout, "HTTP server listening", hostname=args.host, port=str(args.port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    for i in range(args.log_lines):
+        log(sys.stderr, "llama_model_loader: loaded meta data", key=i, detail='x' * args.line_bytes)
+    time.sleep(args.load_seconds)
+    server.loaded.set()
+    log(sys.stdout, "all slots are idle and system prompt is empty, clear the KV cache")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
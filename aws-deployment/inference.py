@@ -9,70 +9,295 @@ import subprocess
 import time
 import signal
 import sys
-from typing import Dict, Any
+from collections import deque
+from typing import Dict, Any, List
 import requests
 import threading
 
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+    
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"]
+    
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+class LlamaServerSupervisor:
+    """
+    Runs the llama.cpp server as a managed child process.
+    
+    stdout/stderr are drained by background threads (an unread pipe fills up
+    and blocks the server mid-request), readiness is signalled by the server's
+    own log lines and confirmed with /health, and a watcher thread restarts the
+    server with backoff when it exits unexpectedly.
+    """
+    
+    # Log lines llama.cpp prints once it can take requests (old and new server builds)
+    READY_MARKERS = ("HTTP server listening", "server is listening", "all slots are idle", "model loaded")
+    # Fallback health check interval for builds whose logs don't match
+    HEALTH_FALLBACK_SECONDS = 5.0
+    
+    def __init__(self, cmd: List[str], health_url: str, start_timeout: float = 120,
+                 max_restarts: int = 5, restart_window: float = 300, log_tail: int = 200):
+        self.cmd = cmd
+        self.health_url = health_url
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.process = None
+        self.ready = False
+        self.failed = None
+        self.restarts = 0
+        self.last_exit_code = None
+        self.started_at = None
+        self.logs = deque(maxlen=log_tail)  # Recent structured log records
+        self.line_counts = {"stdout": 0, "stderr": 0}
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()  # Serializes launches
+        self._marker_seen = False
+        self._stopping = False
+        self._restart_times = deque()
+        self._watcher = None
+    
+    def start(self, timeout: float = None) -> None:
+        """Launch the server unless it is already running (or restarting) and wait until it is ready"""
+        with self._lock:
+            if self.process is None or self.failed or self._stopping:
+                with self._cond:
+                    self.failed = None
+                    self._stopping = False
+                self._restart_times.clear()
+                process = self._launch()
+                # Each watcher owns the process it launched, so one left over from
+                # before a stop() can't mistake that process's exit for a crash
+                self._watcher = threading.Thread(target=self._watch, args=(process,), name="llama-watcher", daemon=True)
+                self._watcher.start()
+        self.wait_ready(self.start_timeout if timeout is None else timeout)
+    
+    def wait_ready(self, timeout: float) -> None:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.ready or self.failed, timeout=timeout):
+                raise TimeoutError(f"Server not ready within {timeout:.0f}s; last output: {self.tail(5)}")
+            if self.failed:
+                raise RuntimeError(self.failed)
+    
+    def _launch(self) -> subprocess.Popen:
+        print(f"Starting llama.cpp server with command: {' '.join(self.cmd)}")
+        with self._cond:
+            self.ready = False
+            self._marker_seen = False
+        process = subprocess.Popen(
+            self.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace',
+            bufsize=1
+        )
+        self.process = process
+        self.started_at = time.monotonic()
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+            threading.Thread(target=self._drain, args=(name, pipe), name=f"llama-{name}", daemon=True).start()
+        threading.Thread(target=self._await_ready, args=(process,), name="llama-ready", daemon=True).start()
+        return process
+    
+    def _drain(self, name: str, pipe) -> None:
+        """Read a pipe to EOF so the server never blocks on a full buffer"""
+        for line in pipe:
+            record = self._parse(name, line.rstrip())
+            self.logs.append(record)
+            self.line_counts[name] += 1
+            if record["level"] in ("ERROR", "WARN", "WARNING"):
+                print(f"[llama.cpp {name}] {record['msg']}")
+            if not self.ready and any(marker in line for marker in self.READY_MARKERS):
+                with self._cond:
+                    self._marker_seen = True
+                    self._cond.notify_all()
+        pipe.close()
+        # EOF means the process is exiting; wake the readiness check
+        with self._cond:
+            self._cond.notify_all()
+    
+    @staticmethod
+    def _parse(stream: str, line: str) -> Dict[str, Any]:
+        """Structured record for a log line (llama.cpp's JSON logs or plain text)"""
+        if line.startswith('{'):
+            try:
+                data = json.loads(line)
+                return {"stream": stream, "time": time.time(), "level": str(data.get("level", "INFO")).upper(),
+                        "msg": data.get("msg", line), "fields": data}
+            except ValueError:
+                pass
+        level = "ERROR" if line.startswith(("error", "ERROR", "E ")) else "INFO"
+        return {"stream": stream, "time": time.time(), "level": level, "msg": line}
+    
+    def _await_ready(self, process: subprocess.Popen) -> None:
+        """Mark the server ready once a ready log line (or the fallback interval) is followed by a healthy /health"""
+        deadline = time.monotonic() + self.start_timeout
+        while process.poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Server not ready within {self.start_timeout:.0f}s, killing it")
+                process.kill()
+                return
+            with self._cond:
+                self._cond.wait_for(lambda: self._marker_seen or process.poll() is not None,
+                                    timeout=min(remaining, self.HEALTH_FALLBACK_SECONDS))
+                self._marker_seen = False
+            if process.poll() is None and self._healthy():
+                with self._cond:
+                    self.ready = True
+                    self._cond.notify_all()
+                print(f"Server is ready! (pid {process.pid}, {time.monotonic() - self.started_at:.1f}s)")
+                return
+    
+    def _healthy(self) -> bool:
+        try:
+            return requests.get(self.health_url, timeout=2).status_code == 200
+        except requests.RequestException:
+            return False
+    
+    def _watch(self, process: subprocess.Popen) -> None:
+        """Restart the server with exponential backoff whenever it exits on its own"""
+        while True:
+            code = process.wait()
+            with self._cond:
+                if self.process is not process:
+                    return  # Replaced by a later start(), which has its own watcher
+                self.ready = False
+                self.last_exit_code = code
+                if self._stopping:
+                    self._cond.notify_all()
+                    return
+            print(f"llama.cpp server exited with code {code}; last output: {self.tail(5)}")
+            
+            now = time.monotonic()
+            while self._restart_times and now - self._restart_times[0] > self.restart_window:
+                self._restart_times.popleft()
+            if len(self._restart_times) >= self.max_restarts:
+                with self._cond:
+                    self.failed = f"Server crashed {self.max_restarts} times in {self.restart_window:.0f}s (exit code {code})"
+                    self._cond.notify_all()
+                print(self.failed)
+                return
+            self._restart_times.append(now)
+            
+            time.sleep(min(30, 2 ** (len(self._restart_times) - 1)))
+            with self._lock:
+                if self._stopping or self.process is not process:
+                    return
+                self.restarts += 1
+                process = self._launch()
+    
+    def tail(self, count: int = 10) -> List[str]:
+        return [record["msg"] for record in list(self.logs)[-count:]]
+    
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self.ready = False
+            self._cond.notify_all()
+        process = self.process
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": self.process.pid if self.process else None,
+            "ready": self.ready,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1) if self.started_at else None,
+            "log_lines": dict(self.line_counts),
+            "failed": self.failed
+        }
+
 class SealionInference:
     def __init__(self):
         self.model_path = os.environ.get('MODEL_PATH', '/opt/ml/model/Gemma-SEA-LION-v4-27B-IT-Q4_K_M.gguf')
         self.llama_cpp_path = os.environ.get('LLAMA_CPP_PATH', '/opt/llama.cpp')
-        self.server_process = None
-        self.server_ready = False
-        self.server_thread = None
+        self.server_binary = os.environ.get('LLAMA_SERVER_BIN', f"{self.llama_cpp_path}/server")
+        self.port = int(os.environ.get('LLAMA_PORT', '8080'))
+        self.base_url = f"http://localhost:{self.port}"
+        self.start_timeout = float(os.environ.get('LLAMA_START_TIMEOUT', '120'))
+        self.supervisor = None
+        
+        # llama.cpp serves this many sequences at once (continuous batching);
+        # each slot gets its own ctx_size window
+        self.parallel = int(os.environ.get('LLAMA_PARALLEL', '2'))
+        self.ctx_size = int(os.environ.get('LLAMA_CTX_SIZE', '2048'))
+        # Requests beyond the slots wait inside llama.cpp; past this, reject
+        self.max_inflight = int(os.environ.get('LLAMA_MAX_INFLIGHT', str(self.parallel * 2)))
+        self.admission = threading.BoundedSemaphore(self.max_inflight)
+        # Identical concurrent requests share one generation
+        self.single_flight = SingleFlight()
         
+    @property
+    def server_ready(self) -> bool:
+        return self.supervisor is not None and self.supervisor.ready
+    
     def start_server(self):
-        """Start llama.cpp server in background"""
+        """Start llama.cpp server under the supervisor (or wait for a restart in progress)"""
         try:
             cmd = [
-                f"{self.llama_cpp_path}/server",
+                self.server_binary,
                 "-m", self.model_path,
-                "--port", "8080",
+                "--port", str(self.port),
                 "--host", "0.0.0.0",
-                "--ctx-size", "2048",
+                "--ctx-size", str(self.ctx_size * self.parallel),
                 "--batch-size", "512",
                 "--threads", "4",
                 "--n-gpu-layers", "0",  # CPU only for serverless
+                "--parallel", str(self.parallel),
+                "--cont-batching",
                 "--verbose"
             ]
             
-            print(f"Starting llama.cpp server with command: {' '.join(cmd)}")
-            
-            self.server_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Wait for server to start
-            self._wait_for_server()
+            if self.supervisor is None:
+                self.supervisor = LlamaServerSupervisor(cmd, f"{self.base_url}/health", self.start_timeout)
+            self.supervisor.start()
             
         except Exception as e:
             print(f"Error starting server: {e}")
             raise
     
-    def _wait_for_server(self):
-        """Wait for server to be ready"""
-        max_attempts = 30
-        attempt = 0
-        
-        while attempt < max_attempts:
-            try:
-                response = requests.get("http://localhost:8080/health", timeout=5)
-                if response.status_code == 200:
-                    self.server_ready = True
-                    print("Server is ready!")
-                    return
-            except:
-                pass
-            
-            attempt += 1
-            time.sleep(1)
-            print(f"Waiting for server... attempt {attempt}/{max_attempts}")
-        
-        raise Exception("Server failed to start within timeout")
-    
     def predict(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle inference requests"""
         try:
@@ -92,32 +317,71 @@ class SealionInference:
                     "status": "error"
                 }
             
+            # Identical deterministic requests share one generation; sampled ones each get their own
+            if float(parameters.get('temperature', 0.7)) != 0:
+                return self._admit_and_complete(inputs, parameters)
+            key = json.dumps({"inputs": inputs, "parameters": parameters}, sort_keys=True)
+            return self.single_flight.do(key, lambda: self._admit_and_complete(inputs, parameters))
+                
+        except Exception as e:
+            print(f"Error in predict: {e}")
+            return {
+                "error": str(e),
+                "status": "error"
+            }
+    
+    def _admit_and_complete(self, inputs: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a completion if a slot is free (coalesced callers don't take one)"""
+        # Admission control: fail fast instead of piling requests onto the server
+        if not self.admission.acquire(blocking=False):
+            return {
+                "error": "Server busy, retry later",
+                "status": "busy"
+            }
+        try:
+            return self._complete(inputs, parameters)
+        finally:
+            self.admission.release()
+    
+    def _complete(self, inputs: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one completion on the llama.cpp server"""
+        try:
             # Prepare request for llama.cpp
             request_data = {
                 "prompt": inputs,
                 "n_predict": parameters.get('max_new_tokens', 150),
                 "temperature": parameters.get('temperature', 0.7),
                 "top_p": parameters.get('top_p', 0.9),
-                "stop": ["</s>", "[INST]", "[/INST]"]
+                "stop": ["</s>", "[INST]", "[/INST]"],
+                # Keep the evaluated prompt in the slot's KV cache so a shared
+                # system prompt is only processed once
+                "cache_prompt": True
             }
             
             print(f"Sending request: {request_data}")
             
-            # Call llama.cpp server
+            # Call llama.cpp server (per-request deadline, capped at 60 s)
             response = requests.post(
-                "http://localhost:8080/completion",
+                f"{self.base_url}/completion",
                 json=request_data,
-                timeout=60
+                timeout=min(float(parameters.get('timeout', 60)), 60)
             )
             
             if response.status_code == 200:
                 result = response.json()
                 generated_text = result.get('content', '')
+                timings = result.get('timings', {})
                 
                 return {
                     "generated_text": generated_text,
                     "status": "success",
-                    "model": "Gemma-SEA-LION-v4-27B-IT-Q4_K_M"
+                    "model": "Gemma-SEA-LION-v4-27B-IT-Q4_K_M",
+                    "metrics": {
+                        # Prompt evaluation time is what the first token waits for
+                        "prompt_ms": timings.get('prompt_ms'),
+                        "tokens_cached": result.get('tokens_cached'),
+                        "tokens_per_second": timings.get('predicted_per_second')
+                    }
                 }
             else:
                 return {
@@ -126,7 +390,7 @@ class SealionInference:
                 }
                 
         except Exception as e:
-            print(f"Error in predict: {e}")
+            print(f"Error in completion: {e}")
             return {
                 "error": str(e),
                 "status": "error"
@@ -134,9 +398,8 @@ class SealionInference:
     
     def cleanup(self):
         """Cleanup server process"""
-        if self.server_process:
-            self.server_process.terminate()
-            self.server_process.wait()
+        if self.supervisor:
+            self.supervisor.stop()
 
 # Global inference instance
 inference = SealionInference()
@@ -162,7 +425,7 @@ def handler(event, context):
         print(f"Returning result: {json.dumps(result)}")
         
         return {
-            "statusCode": 200,
+            "statusCode": 429 if result.get("status") == "busy" else 200,
             "body": json.dumps(result)
         }
         
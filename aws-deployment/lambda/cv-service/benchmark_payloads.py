@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compare request/response encodings of the CV Lambda against the local stub
+Requests: JSON with a base64 image field, a raw binary body and a multipart
+upload. Responses: JSON and MessagePack. Reports the bytes a client sends or
+receives over the wire and the handler latency for each.
+
+Usage:
+    python benchmark_payloads.py --image-kb 1500 --detections 50
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+
+# Disable the result cache so every call reaches the CV service
+os.environ['CV_CACHE_SIZE'] = '0'
+
+BOUNDARY = 'simisbenchmarkboundary'
+
+def make_events(image_bytes):
+    """(name, event, client wire bytes) for each request encoding"""
+    image_b64 = base64.b64encode(image_bytes).decode('ascii')
+    
+    json_body = json.dumps({'image': image_b64, 'device_type': 'thermometer'})
+    
+    multipart = (
+        f'--{BOUNDARY}\r\n'
+        'Content-Disposition: form-data; name="device_type"\r\n\r\n'
+        'thermometer\r\n'
+        f'--{BOUNDARY}\r\n'
+        'Content-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+        'Content-Type: image/jpeg\r\n\r\n'
+    ).encode('ascii') + image_bytes + f'\r\n--{BOUNDARY}--\r\n'.encode('ascii')
+    
+    return [
+        ('json', {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'body': json_body
+        }, len(json_body)),
+        ('binary', {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'image/jpeg'},
+            'queryStringParameters': {'device_type': 'thermometer'},
+            'body': image_b64,
+            'isBase64Encoded': True
+        }, len(image_bytes)),
+        ('multipart', {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'},
+            'body': base64.b64encode(multipart).decode('ascii'),
+            'isBase64Encoded': True
+        }, len(multipart))
+    ]
+
+def response_bytes(response):
+    """Bytes the client receives once API Gateway decodes binary bodies"""
+    if response.get('isBase64Encoded'):
+        return len(base64.b64decode(response['body']))
+    return len(response['body'].encode('utf-8'))
+
+def measure(handler, event, calls):
+    latencies = []
+    response = None
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = handler(event, None)
+        latencies.append((time.perf_counter() - start) * 1000)
+    if response['statusCode'] != 200:
+        raise RuntimeError(response['body'])
+    return statistics.mean(latencies), response
+
+def main():
+    parser = argparse.ArgumentParser(description='CV Lambda payload encoding comparison')
+    parser.add_argument('--image-kb', type=int, default=1500, help='Size of the synthetic image')
+    parser.add_argument('--detections', type=int, default=50, help='Detections returned by the stub')
+    parser.add_argument('--calls', type=int, default=20, help='Handler calls per encoding')
+    args = parser.parse_args()
+    
+    from stub_cv_server import start_stub_server
+    _, os.environ['CV_SERVICE_ENDPOINT'] = start_stub_server(detections=args.detections)
+    
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    from index import lambda_handler
+    
+    image_bytes = os.urandom(args.image_kb * 1024)
+    
+    print(f"Request encodings ({args.image_kb} KB image):")
+    for name, event, wire_bytes in make_events(image_bytes):
+        latency, _ = measure(lambda_handler, event, args.calls)
+        print(f"  {name:>9}: {wire_bytes / 1024:8.1f} KB on the wire | handler {latency:6.2f} ms")
+    
+    print(f"Response encodings ({args.detections} detections):")
+    _, event, _ = make_events(image_bytes)[1]
+    for name, accept in (('json', 'application/json'), ('msgpack', 'application/msgpack')):
+        latency, response = measure(lambda_handler, {**event, 'headers': {**event['headers'], 'Accept': accept}}, args.calls)
+        print(f"  {name:>9}: {response_bytes(response) / 1024:8.1f} KB on the wire | handler {latency:6.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CV proxy with and without connection reuse
+"Cold" builds a fresh CVServiceProxy (and so a fresh connection) per call,
+as the handler used to; "pooled" reuses one proxy and its keep-alive session,
+as warm Lambda invocations now do. Runs against the local stub by default,
+or a real endpoint (where the TLS handshake makes the gap much larger).
+
+Usage:
+    python benchmark_pooling.py --calls 200 --delay-ms 5
+    python benchmark_pooling.py --endpoint https://cv.example.com/detect
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+# Disable the result cache so every call reaches the CV service
+os.environ['CV_CACHE_SIZE'] = '0'
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    return {
+        'mean': statistics.mean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[int(len(ordered) * 0.95) - 1]
+    }
+
+def run(calls, make_proxy, image_data):
+    latencies = []
+    proxy = None
+    for _ in range(calls):
+        start = time.perf_counter()
+        proxy = make_proxy(proxy)
+        result = proxy.detect_devices(image_data)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not result['success']:
+            raise RuntimeError(result['error'])
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description='CV proxy connection pooling benchmark')
+    parser.add_argument('--calls', type=int, default=200, help='Requests per mode')
+    parser.add_argument('--delay-ms', type=float, default=0, help='Stub server latency')
+    parser.add_argument('--endpoint', help='Benchmark a real CV endpoint instead of the stub')
+    args = parser.parse_args()
+    
+    if args.endpoint:
+        os.environ['CV_SERVICE_ENDPOINT'] = args.endpoint
+    else:
+        from stub_cv_server import start_stub_server
+        _, os.environ['CV_SERVICE_ENDPOINT'] = start_stub_server(delay_ms=args.delay_ms)
+    
+    from index import CVServiceProxy
+    
+    image_data = 'data:image/jpeg;base64,' + 'A' * 40000
+    
+    def cold(previous):
+        if previous is not None:
+            previous.session.close()
+        return CVServiceProxy()
+    
+    def pooled(previous):
+        return previous or CVServiceProxy()
+    
+    print(f"Endpoint: {os.environ['CV_SERVICE_ENDPOINT']} ({args.calls} calls per mode)")
+    for name, factory in (('cold', cold), ('pooled', pooled)):
+        stats = run(args.calls, factory, image_data)
+        print(f"{name:>7}: mean {stats['mean']:.2f} ms | p50 {stats['p50']:.2f} ms | p95 {stats['p95']:.2f} ms")
+
+if __name__ == '__main__':
+    main()
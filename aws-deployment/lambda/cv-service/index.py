@@ -1,14 +1,236 @@
 import json
+import asyncio
 import base64
+import hashlib
+import httpx
+import msgpack
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-from typing import Dict, List, Any
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+class ResultCache:
+    """
+    Content-addressed LRU cache with TTL for CV detection results.
+    Lives at module scope so it survives across warm Lambda invocations.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(image: memoryview, *params: Any) -> Tuple:
+        """
+        Key on an exact hash of the image plus every setting that affects the result.
+        image is any buffer (typically a view into the encoded request body), so
+        hashing doesn't copy the payload.
+        """
+        digest = hashlib.sha256(image).hexdigest()
+        return (digest,) + params
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: Tuple, value: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+# Shared across warm invocations of this Lambda container
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('CV_CACHE_SIZE', '256')),
+    ttl_seconds=float(os.environ.get('CV_CACHE_TTL', '300'))
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+class CVServiceError(Exception):
+    """CV backend answered with a non-200 status"""
+    
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f'CV service returned status {status_code}')
+        self.status_code = status_code
+        self.text = text
+
+class CircuitBreaker:
+    """
+    Failure-rate and slow-call circuit breaker for one backend endpoint.
+    
+    Closed: calls go through and outcomes are recorded in a rolling window.
+    Open: once the failure or slow-call rate crosses its threshold, calls are
+    rejected for open_seconds. Half-open: a single probe is let through; if it
+    succeeds in time the breaker closes, otherwise it opens again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 5.0, slow_call_rate: float = 0.5,
+                 open_seconds: float = 30.0):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """Whether a call may go out now (claims the probe slot when half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+    
+    def record(self, success: bool, latency: float) -> None:
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            if self._current_state() == self.HALF_OPEN:
+                if success and not slow:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                    logger.info("CV circuit breaker closed")
+                else:
+                    self._trip()
+                return
+            
+            self._outcomes.append((not success, slow))
+            if self._state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                calls = len(self._outcomes)
+                failures = sum(1 for failed, _ in self._outcomes if failed)
+                slow_calls = sum(1 for _, was_slow in self._outcomes if was_slow)
+                if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                    self._trip()
+    
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self.trips += 1
+        logger.warning("CV circuit breaker opened")
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self._current_state(),
+                'window_calls': calls,
+                'failure_rate': round(sum(1 for failed, _ in self._outcomes if failed) / calls, 4) if calls else 0.0,
+                'slow_call_rate': round(sum(1 for _, slow in self._outcomes if slow) / calls, 4) if calls else 0.0,
+                'trips': self.trips,
+                'rejected': self.rejected
+            }
+
+def build_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        window=int(os.environ.get('CV_BREAKER_WINDOW', '20')),
+        min_calls=int(os.environ.get('CV_BREAKER_MIN_CALLS', '5')),
+        failure_rate=float(os.environ.get('CV_BREAKER_FAILURE_RATE', '0.5')),
+        slow_call_seconds=float(os.environ.get('CV_BREAKER_SLOW_SECONDS', '5')),
+        slow_call_rate=float(os.environ.get('CV_BREAKER_SLOW_RATE', '0.5')),
+        open_seconds=float(os.environ.get('CV_BREAKER_OPEN_SECONDS', '30'))
+    )
+
+def build_session(pool_size: int = 10, retries: int = 2, token: str = '') -> requests.Session:
+    """
+    Create a keep-alive HTTP session with a connection pool and retry policy.
+    Reusing it across invocations skips the TCP/TLS handshake on warm calls.
+    Only connection failures are retried: error responses and timeouts go
+    straight back so the circuit breaker and hedging see every failed attempt.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,  # Don't re-send a request the backend may already be processing
+        status=0,  # A 504 arrives after the full timeout; retrying it only stretches the tail
+        backoff_factor=0.1,
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Content-Type': 'application/json',
+        'User-Agent': 'SIMISAI-CV-Proxy/1.0',
+        'Connection': 'keep-alive'
+    })
+    
+    # Add authentication if token is provided
+    if token:
+        session.headers['Authorization'] = f'Bearer {token}'
+    return session
+
 class CVServiceProxy:
     """
     CV Service Proxy for SIMISAI
@@ -19,9 +241,36 @@ class CVServiceProxy:
         self.cv_endpoint = os.environ.get('CV_SERVICE_ENDPOINT')
         self.cv_token = os.environ.get('CV_SERVICE_TOKEN', '')
         self.timeout = int(os.environ.get('CV_SERVICE_TIMEOUT', '30'))
+        self.model_version = os.environ.get('CV_MODEL_VERSION', 'unknown')
         
         if not self.cv_endpoint:
             raise ValueError("CV_SERVICE_ENDPOINT environment variable is required")
+        
+        self.session = build_session(
+            pool_size=int(os.environ.get('CV_SERVICE_POOL_SIZE', '10')),
+            retries=int(os.environ.get('CV_SERVICE_RETRIES', '2')),
+            token=self.cv_token
+        )
+        
+        # Optional secondary endpoint for hedged requests
+        self.secondary_endpoint = os.environ.get('CV_SERVICE_SECONDARY_ENDPOINT')
+        self.hedge_min_delay = float(os.environ.get('CV_HEDGE_MIN_DELAY_MS', '50')) / 1000
+        self.hedge_default_delay = float(os.environ.get('CV_HEDGE_DELAY_MS', '1000')) / 1000
+        self.latencies = deque(maxlen=200)  # Recent primary latencies, seconds
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._executor = ThreadPoolExecutor(max_workers=4) if self.secondary_endpoint else None
+        
+        self.breakers = {self.cv_endpoint: build_breaker()}
+        if self.secondary_endpoint:
+            self.breakers[self.secondary_endpoint] = build_breaker()
+        
+        # Fan-out settings for multi-device / multi-image requests
+        self.fanout_concurrency = int(os.environ.get('CV_FANOUT_CONCURRENCY', '4'))
+        self.fanout_deadline = float(os.environ.get('CV_FANOUT_DEADLINE', str(self.timeout)))
+        # Async client is bound to its event loop, so both live as long as the proxy
+        self._loop = None
+        self._async_client = None
     
     def detect_devices(self, image_data: str, device_type: str = 'thermometer', 
                       confidence_threshold: float = 0.5) -> Dict[str, Any]:
@@ -37,77 +286,299 @@ class CVServiceProxy:
             Dictionary with detection results
         """
         try:
-            payload = {
-                'image': image_data,
-                'device_type': device_type,
-                'confidence_threshold': confidence_threshold,
-                'timestamp': self._get_timestamp()
-            }
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'User-Agent': 'SIMISAI-CV-Proxy/1.0'
-            }
-            
-            # Add authentication if token is provided
-            if self.cv_token:
-                headers['Authorization'] = f'Bearer {self.cv_token}'
+            body = self._encode_body(image_data, device_type, confidence_threshold)
+            cache_key = ResultCache.make_key(self._image_view(body), self.cv_endpoint, self.model_version,
+                                             device_type, confidence_threshold)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                logger.info("CV result cache hit")
+                return {**cached, 'processing_time': 0, 'cache_hit': True}
             
             logger.info(f"Calling CV service at {self.cv_endpoint}")
-            logger.info(f"Payload size: {len(json.dumps(payload))} bytes")
+            logger.info(f"Payload size: {len(body)} bytes")
             
-            response = requests.post(
-                self.cv_endpoint,
-                json=payload,
-                headers=headers,
-                timeout=self.timeout
-            )
+            result = self._call_with_hedging(body)
+            return self._handle_success(result, cache_key, device_type, confidence_threshold)
             
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"CV service success: {len(result.get('detections', []))} detections")
-                
-                return {
-                    'success': True,
-                    'detections': result.get('detections', []),
-                    'processing_time': result.get('processing_time', 0),
-                    'model_version': result.get('model_version', 'unknown'),
-                    'confidence_threshold': confidence_threshold,
-                    'device_type': device_type
-                }
-            else:
-                logger.error(f"CV service error: {response.status_code} - {response.text}")
-                return {
-                    'success': False,
-                    'error': f'CV service returned status {response.status_code}',
-                    'detections': [],
-                    'fallback': True
-                }
-                
+        except CircuitOpenError:
+            logger.warning("CV service circuit open, skipping call")
+            return {**self._error_result('CV service circuit open'), 'circuit_open': True}
+        except CVServiceError as e:
+            logger.error(f"CV service error: {e.status_code} - {truncate(e.text)}")
+            return self._error_result(str(e))
         except requests.exceptions.Timeout:
             logger.error("CV service timeout")
-            return {
-                'success': False,
-                'error': 'CV service timeout',
-                'detections': [],
-                'fallback': True
-            }
+            return self._error_result('CV service timeout')
         except requests.exceptions.RequestException as e:
             logger.error(f"CV service request error: {str(e)}")
-            return {
-                'success': False,
-                'error': f'CV service request failed: {str(e)}',
-                'detections': [],
-                'fallback': True
-            }
+            return self._error_result(f'CV service request failed: {str(e)}')
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}")
-            return {
-                'success': False,
-                'error': f'Unexpected error: {str(e)}',
-                'detections': [],
-                'fallback': True
-            }
+            return self._error_result(f'Unexpected error: {str(e)}')
+    
+    def _call(self, endpoint: str, body: bytes) -> Dict[str, Any]:
+        """POST to one endpoint and record the outcome on its circuit breaker"""
+        start = time.perf_counter()
+        try:
+            # Pooled keep-alive session (auth and content headers are set on it)
+            response = self.session.post(endpoint, data=body, timeout=self.timeout)
+            if response.status_code != 200:
+                raise CVServiceError(response.status_code, response.text)
+            result = response.json()
+        except CVServiceError as e:
+            # 4xx means the request was bad, not that the backend is unhealthy
+            self.breakers[endpoint].record(e.status_code < 500, time.perf_counter() - start)
+            raise
+        except Exception:
+            self.breakers[endpoint].record(False, time.perf_counter() - start)
+            raise
+        
+        latency = time.perf_counter() - start
+        self.breakers[endpoint].record(True, latency)
+        if endpoint == self.cv_endpoint:
+            self.latencies.append(latency)
+        return result
+    
+    def _hedge_delay(self) -> float:
+        """p95 of recent primary latencies, so only the slowest ~5% of calls get hedged"""
+        if len(self.latencies) < 20:
+            return self.hedge_default_delay
+        ordered = sorted(self.latencies)
+        return max(self.hedge_min_delay, ordered[int(len(ordered) * 0.95) - 1])
+    
+    def _call_with_hedging(self, body: bytes) -> Dict[str, Any]:
+        """
+        Call the primary endpoint, skipping it while its breaker is open. If a
+        secondary endpoint is configured and the primary hasn't answered within
+        the hedge delay (or fails), race the same request against the secondary.
+        """
+        primary_allowed = self.breakers[self.cv_endpoint].allow_request()
+        
+        if not self.secondary_endpoint:
+            if not primary_allowed:
+                raise CircuitOpenError()
+            return self._call(self.cv_endpoint, body)
+        
+        if not primary_allowed:
+            if not self.breakers[self.secondary_endpoint].allow_request():
+                raise CircuitOpenError()
+            return self._call(self.secondary_endpoint, body)
+        
+        primary = self._executor.submit(self._call, self.cv_endpoint, body)
+        try:
+            return primary.result(timeout=self._hedge_delay())
+        except FutureTimeout:
+            pass
+        except Exception:
+            # Primary failed fast; the secondary is the only chance left
+            if not self.breakers[self.secondary_endpoint].allow_request():
+                raise
+            return self._call(self.secondary_endpoint, body)
+        
+        if not self.breakers[self.secondary_endpoint].allow_request():
+            return primary.result()
+        
+        self.hedged += 1
+        secondary = self._executor.submit(self._call, self.secondary_endpoint, body)
+        error = None
+        for future in as_completed((primary, secondary)):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if future is secondary:
+                self.hedge_wins += 1
+            # The slower call finishes in the background and still feeds its breaker
+            return result
+        raise error
+    
+    def health(self) -> Dict[str, Any]:
+        """Breaker and hedging state for monitoring"""
+        return {
+            'breakers': {endpoint: breaker.stats() for endpoint, breaker in self.breakers.items()},
+            'hedge_delay_ms': round(self._hedge_delay() * 1000, 1) if self.secondary_endpoint else None,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins
+        }
+    
+    def detect_many(self, images: List[str], device_types: List[str],
+                    confidence_threshold: float = 0.5) -> Dict[str, Any]:
+        """
+        Detect several device types and/or images in one call
+        
+        Sends one CV request per (image, device type) pair concurrently, so the
+        caller pays roughly one round-trip instead of one per pair.
+        
+        Args:
+            images: Base64 encoded images
+            device_types: Device types to look for in every image
+            confidence_threshold: Minimum confidence for detections
+            
+        Returns:
+            Merged detections tagged with device_type and image_index, plus a
+            per-request summary
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(
+            self._detect_many_async(images, device_types, confidence_threshold)
+        )
+    
+    async def _detect_many_async(self, images: List[str], device_types: List[str],
+                                 confidence_threshold: float) -> Dict[str, Any]:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                headers=dict(self.session.headers),
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.fanout_concurrency,
+                                    max_keepalive_connections=self.fanout_concurrency)
+            )
+        
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.fanout_concurrency)
+        pairs = [(index, image, device_type)
+                 for index, image in enumerate(images)
+                 for device_type in device_types]
+        
+        results = await asyncio.gather(*(
+            self._detect_with_deadline(semaphore, image, device_type, confidence_threshold)
+            for _, image, device_type in pairs
+        ))
+        
+        detections = []
+        summary = []
+        for (index, _, device_type), result in zip(pairs, results):
+            for detection in result['detections']:
+                detections.append({**detection, 'device_type': device_type, 'image_index': index})
+            summary.append({
+                'image_index': index,
+                'device_type': device_type,
+                'success': result['success'],
+                'detections': len(result['detections']),
+                'cache_hit': result.get('cache_hit', False),
+                'error': result.get('error')
+            })
+        
+        failed = sum(1 for item in summary if not item['success'])
+        logger.info(f"CV fan-out: {len(pairs)} requests, {failed} failed, {len(detections)} detections")
+        
+        return {
+            'success': failed < len(pairs),
+            'detections': detections,
+            'results': summary,
+            'processing_time': round(time.perf_counter() - start, 4),
+            'confidence_threshold': confidence_threshold,
+            'fallback': failed == len(pairs)
+        }
+    
+    async def _detect_with_deadline(self, semaphore: asyncio.Semaphore, image_data: str,
+                                    device_type: str, confidence_threshold: float) -> Dict[str, Any]:
+        """One fan-out request; the deadline includes time spent waiting for a slot"""
+        try:
+            return await asyncio.wait_for(
+                self._detect_async(semaphore, image_data, device_type, confidence_threshold),
+                timeout=self.fanout_deadline
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"CV service deadline exceeded for {device_type}")
+            return self._error_result('CV service deadline exceeded')
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}")
+            return self._error_result(f'Unexpected error: {str(e)}')
+    
+    async def _detect_async(self, semaphore: asyncio.Semaphore, image_data: str,
+                            device_type: str, confidence_threshold: float) -> Dict[str, Any]:
+        body = self._encode_body(image_data, device_type, confidence_threshold)
+        cache_key = ResultCache.make_key(self._image_view(body), self.cv_endpoint, self.model_version,
+                                         device_type, confidence_threshold)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'processing_time': 0, 'cache_hit': True}
+        
+        breaker = self.breakers[self.cv_endpoint]
+        async with semaphore:
+            if not breaker.allow_request():
+                return {**self._error_result('CV service circuit open'), 'circuit_open': True}
+            
+            start = time.perf_counter()
+            try:
+                response = await self._async_client.post(self.cv_endpoint, content=body)
+            except httpx.TimeoutException:
+                breaker.record(False, time.perf_counter() - start)
+                logger.error("CV service timeout")
+                return self._error_result('CV service timeout')
+            except httpx.HTTPError as e:
+                breaker.record(False, time.perf_counter() - start)
+                logger.error(f"CV service request error: {str(e)}")
+                return self._error_result(f'CV service request failed: {str(e)}')
+            except asyncio.CancelledError:
+                # Deadline hit mid-request: count it against the backend
+                breaker.record(False, time.perf_counter() - start)
+                raise
+            breaker.record(response.status_code < 500, time.perf_counter() - start)
+        
+        if response.status_code == 200:
+            return self._handle_success(response.json(), cache_key, device_type, confidence_threshold)
+        logger.error(f"CV service error: {response.status_code} - {truncate(response.text)}")
+        return self._error_result(f'CV service returned status {response.status_code}')
+    
+    def _encode_body(self, image_data: str, device_type: str,
+                     confidence_threshold: float) -> bytes:
+        """
+        Serialize the CV request exactly once; the client's base64 image is
+        forwarded as-is, never decoded and re-encoded
+        """
+        # image stays the first field: _image_view() slices it out of the body
+        payload = {
+            'image': image_data,
+            'device_type': device_type,
+            'confidence_threshold': confidence_threshold,
+            'timestamp': self._get_timestamp()
+        }
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    
+    @staticmethod
+    def _image_view(body: bytes) -> memoryview:
+        """
+        The JSON-encoded image inside a body from _encode_body, as a view (no
+        copy), without any data URL prefix so the same pixels hash the same
+        either way
+        """
+        start = len(b'{"image":"')
+        # Quotes inside JSON strings are escaped, so the last match is the field boundary
+        end = body.rfind(b'","device_type":')
+        if body.startswith(b'data:', start):
+            comma = body.find(b',', start, min(start + 256, end))
+            if comma != -1:
+                start = comma + 1
+        return memoryview(body)[start:end]
+    
+    def _handle_success(self, result: Dict[str, Any], cache_key: Tuple, device_type: str,
+                        confidence_threshold: float) -> Dict[str, Any]:
+        """Normalize a successful CV response and cache it"""
+        logger.info(f"CV service success: {len(result.get('detections', []))} detections")
+        
+        detection_result = {
+            'success': True,
+            'detections': result.get('detections', []),
+            'processing_time': result.get('processing_time', 0),
+            'model_version': result.get('model_version', 'unknown'),
+            'confidence_threshold': confidence_threshold,
+            'device_type': device_type
+        }
+        
+        # Only successful results are cached; failures should be retried
+        result_cache.put(cache_key, detection_result)
+        return {**detection_result, 'cache_hit': False}
+    
+    def _error_result(self, error: str) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': error,
+            'detections': [],
+            'fallback': True
+        }
     
     def get_fallback_detections(self, device_type: str = 'thermometer') -> List[Dict[str, Any]]:
         """
@@ -147,17 +618,124 @@ class CVServiceProxy:
         from datetime import datetime
         return datetime.utcnow().isoformat() + 'Z'
 
+def truncate(text: str, limit: int = 200) -> str:
+    """Shorten text for logging"""
+    return text if len(text) <= limit else f"{text[:limit]}... ({len(text)} chars)"
+
+def summarize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Loggable view of an API Gateway event without the (possibly multi-megabyte) body"""
+    body = event.get('body') or ''
+    return {
+        'httpMethod': event.get('httpMethod'),
+        'path': event.get('path'),
+        'body_bytes': len(body),
+        'isBase64Encoded': event.get('isBase64Encoded', False)
+    }
+
+def get_header(event: Dict[str, Any], name: str) -> str:
+    """Case-insensitive request header lookup"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+def parse_multipart(raw: bytes, content_type: str) -> Dict[str, bytes]:
+    """Form fields of a multipart/form-data body, keyed by field name"""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise ValueError('multipart body without a boundary')
+    
+    fields = {}
+    for part in raw.split(b'--' + match.group(1).encode('latin-1'))[1:]:
+        if part.startswith(b'--'):
+            break  # Closing delimiter
+        head, _, value = part.partition(b'\r\n\r\n')
+        name = re.search(rb'name="([^"]*)"', head)
+        if name:
+            fields[name.group(1).decode('utf-8')] = value[:-2] if value.endswith(b'\r\n') else value
+    return fields
+
+def string_list(value: Any) -> Optional[List[str]]:
+    """A list parameter as a list of strings, splitting comma-separated strings; None if malformed"""
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    return None
+
+def parse_request(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize a detection request to the JSON body shape
+    
+    Accepts a JSON body, a raw image body (image/* or application/octet-stream,
+    which API Gateway delivers base64-encoded with isBase64Encoded set) or a
+    multipart/form-data upload. For binary bodies the other parameters come
+    from the query string or form fields.
+    """
+    content_type = get_header(event, 'content-type')
+    media_type = content_type.split(';')[0].strip().lower()
+    body = event.get('body') or ''
+    is_base64 = event.get('isBase64Encoded', False)
+    
+    if media_type.startswith('image/') or media_type == 'application/octet-stream':
+        # API Gateway already base64-encoded the bytes, which is what the CV service takes
+        params = dict(event.get('queryStringParameters') or {})
+        params['image'] = body if is_base64 else base64.b64encode(body.encode('latin-1')).decode('ascii')
+    elif media_type == 'multipart/form-data':
+        raw = base64.b64decode(body) if is_base64 else body.encode('latin-1')
+        fields = parse_multipart(raw, content_type)
+        image = fields.pop('image', None) or fields.pop('file', None)
+        params = {name: value.decode('utf-8') for name, value in fields.items()}
+        if image:
+            params['image'] = base64.b64encode(image).decode('ascii')
+    else:
+        return json.loads(base64.b64decode(body) if is_base64 else (body or '{}'))
+    
+    # List parameters arrive as comma-separated strings outside of JSON
+    if 'device_types' in params:
+        params['device_types'] = string_list(params['device_types'])
+    return params
+
+def build_response(event: Dict[str, Any], headers: Dict[str, str],
+                   result: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON response, or MessagePack (float32 numbers) when the client accepts it"""
+    if 'msgpack' in get_header(event, 'accept'):
+        return {
+            'statusCode': 200,
+            'headers': {**headers, 'Content-Type': 'application/msgpack'},
+            'body': base64.b64encode(msgpack.packb(result, use_single_float=True)).decode('ascii'),
+            'isBase64Encoded': True
+        }
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(result)
+    }
+
+# Created on first use and reused across warm invocations
+_cv_service = None
+
+# Upper bound on image x device combinations in one fan-out request
+MAX_FANOUT_REQUESTS = int(os.environ.get('CV_FANOUT_MAX_REQUESTS', '12'))
+
+def get_cv_service() -> CVServiceProxy:
+    """Return the module-scope CV proxy, creating it on the first invocation"""
+    global _cv_service
+    if _cv_service is None:
+        _cv_service = CVServiceProxy()
+    return _cv_service
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler for CV service proxy
     """
-    logger.info(f"CV service event: {json.dumps(event)}")
+    logger.info(f"CV service event: {json.dumps(summarize_event(event))}")
     
     try:
         # Handle CORS
         headers = {
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization,Accept',
             'Access-Control-Allow-Methods': 'GET,POST,OPTIONS',
             'Content-Type': 'application/json'
         }
@@ -169,23 +747,83 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'CORS preflight'})
             }
         
+        if event.get('httpMethod') == 'GET':
+            # Cache and backend health metrics for monitoring
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': json.dumps({
+                    'cache': result_cache.stats(),
+                    'backend': get_cv_service().health()
+                })
+            }
+        
         if event.get('httpMethod') == 'POST':
-            # Parse request body
-            body = json.loads(event.get('body', '{}'))
+            # Parse request body (JSON, raw binary image or multipart upload)
+            body = parse_request(event)
             
             image_data = body.get('image')
             device_type = body.get('device_type', 'thermometer')
             confidence_threshold = float(body.get('confidence_threshold', 0.5))
             
-            if not image_data:
+            # Multi-device / multi-image requests fan out concurrently. JSON bodies
+            # may also send device_types as a comma-separated string
+            if image_data is not None and not isinstance(image_data, str):
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': 'image must be a base64 string'})
+                }
+            images = body.get('images')
+            if images is not None and not (isinstance(images, list) and all(isinstance(item, str) for item in images)):
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': 'images must be a list of base64 strings'})
+                }
+            device_types = body.get('device_types')
+            if device_types is not None:
+                device_types = string_list(device_types)
+                if device_types is None:
+                    return {
+                        'statusCode': 400,
+                        'headers': headers,
+                        'body': json.dumps({'error': 'device_types must be a list of strings'})
+                    }
+            images = images or ([image_data] if image_data else [])
+            device_types = device_types or [device_type]
+            
+            if not images:
                 return {
                     'statusCode': 400,
                     'headers': headers,
                     'body': json.dumps({'error': 'Image data is required'})
                 }
             
-            # Initialize CV service
-            cv_service = CVServiceProxy()
+            # Reuse the warm CV service (and its connection pool)
+            cv_service = get_cv_service()
+            
+            if 'images' in body or 'device_types' in body:
+                if len(images) * len(device_types) > MAX_FANOUT_REQUESTS:
+                    return {
+                        'statusCode': 400,
+                        'headers': headers,
+                        'body': json.dumps({'error': f'At most {MAX_FANOUT_REQUESTS} image/device combinations per request'})
+                    }
+                
+                result = cv_service.detect_many(images, device_types, confidence_threshold)
+                
+                if result['fallback']:
+                    result['detections'] = [
+                        {**detection, 'device_type': fallback_type, 'image_index': index}
+                        for index in range(len(images))
+                        for fallback_type in device_types
+                        for detection in cv_service.get_fallback_detections(fallback_type)
+                    ]
+                    result['fallback_used'] = True
+                    logger.info("Using fallback detections")
+                
+                return build_response(event, headers, result)
             
             # Detect devices
             result = cv_service.detect_devices(image_data, device_type, confidence_threshold)
@@ -196,11 +834,7 @@ def lambda_handler(event, context):
                 result['fallback_used'] = True
                 logger.info("Using fallback detections")
             
-            return {
-                'statusCode': 200,
-                'headers': headers,
-                'body': json.dumps(result)
-            }
+            return build_response(event, headers, result)
         
         return {
             'statusCode': 404,
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Local stub of the SIMIS CV service for exercising the Lambda proxy
+Answers every POST with a fixed detection payload over HTTP/1.1 keep-alive,
+with optional artificial latency and failure rate.
+
+Usage:
+    python stub_cv_server.py --port 8900 --delay-ms 20
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_DETECTIONS = [
+    {
+        'class': 'thermometer_display',
+        'confidence': 0.92,
+        'bbox': [120.0, 80.0, 220.0, 90.0]
+    },
+    {
+        'class': 'thermometer_button',
+        'confidence': 0.81,
+        'bbox': [160.0, 210.0, 40.0, 40.0]
+    }
+]
+
+def synthetic_detections(count: int):
+    """count distinct fake boxes, for exercising larger responses"""
+    return [
+        {
+            'class': STUB_DETECTIONS[i % len(STUB_DETECTIONS)]['class'],
+            'confidence': round(0.5 + (i % 50) / 100, 4),
+            'bbox': [float(10 * i), float(5 * i), 40.5 + i, 30.25 + i]
+        }
+        for i in range(count)
+    ]
+
+class StubCVHandler(BaseHTTPRequestHandler):
+    """Fixed-response CV endpoint; settings live on the server object"""
+    
+    protocol_version = 'HTTP/1.1'  # Keep connections open between requests
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        
+        if self.server.delay_ms:
+            time.sleep(self.server.delay_ms / 1000)
+        
+        if random.random() < self.server.fail_rate:
+            self._send(503, {'error': 'stub failure'})
+        else:
+            self._send(200, {
+                'detections': self.server.detections,
+                'processing_time': self.server.delay_ms / 1000,
+                'model_version': 'stub'
+            })
+    
+    def do_GET(self):
+        self._send(200, {'status': 'healthy'})
+    
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up (deadline or hedged request), nothing to deliver
+    
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+def start_stub_server(port: int = 0, delay_ms: float = 0, fail_rate: float = 0.0,
+                      detections: int = 0):
+    """Start the stub in a background thread; returns (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubCVHandler)
+    server.daemon_threads = True
+    server.delay_ms = delay_ms
+    server.fail_rate = fail_rate
+    server.detections = synthetic_detections(detections) if detections else STUB_DETECTIONS
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/detect'
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub SIMIS CV service')
+    parser.add_argument('--port', type=int, default=8900, help='Port to listen on')
+    parser.add_argument('--delay-ms', type=float, default=0, help='Artificial latency per request')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--detections', type=int, default=0, help='Return this many synthetic detections')
+    args = parser.parse_args()
+    
+    server, url = start_stub_server(args.port, args.delay_ms, args.fail_rate, args.detections)
+    print(f'Stub CV service listening on {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import base64
+import time
+
+import pytest
+
+import index
+from index import CircuitBreaker, CVServiceProxy
+from stub_cv_server import start_stub_server
+
+OPEN_SECONDS = 0.1
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(window=10, min_calls=4, failure_rate=0.5,
+                          slow_call_seconds=1.0, slow_call_rate=0.5, open_seconds=OPEN_SECONDS)
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(breaker.min_calls - 1):
+        breaker.record(False, 0.01)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+def test_stays_closed_below_failure_rate(breaker):
+    for success in (True, True, False, True, True, False, True):
+        breaker.record(success, 0.01)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.trips == 0
+
+def test_opens_on_failure_rate(breaker):
+    for success in (True, False, True, False):
+        breaker.record(success, 0.01)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()['rejected'] == 1
+    assert breaker.trips == 1
+
+def test_opens_on_slow_call_rate(breaker):
+    for latency in (0.01, 2.0, 0.01, 2.0):
+        breaker.record(True, latency)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_lets_one_probe_through(breaker):
+    trip(breaker)
+    time.sleep(OPEN_SECONDS)
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+def test_successful_probe_closes(breaker):
+    trip(breaker)
+    time.sleep(OPEN_SECONDS)
+    assert breaker.allow_request()
+
+    breaker.record(True, 0.01)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['window_calls'] == 0
+    assert breaker.allow_request()
+
+@pytest.mark.parametrize("success, latency", [(False, 0.01), (True, 2.0)])
+def test_failed_or_slow_probe_reopens(breaker, success, latency):
+    trip(breaker)
+    time.sleep(OPEN_SECONDS)
+    assert breaker.allow_request()
+
+    breaker.record(success, latency)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.trips == 2
+
+@pytest.fixture
+def failing_proxy(monkeypatch):
+    server, url = start_stub_server(fail_rate=1.0)
+    monkeypatch.setenv('CV_SERVICE_ENDPOINT', url)
+    monkeypatch.setenv('CV_SERVICE_RETRIES', '0')
+    monkeypatch.setenv('CV_BREAKER_MIN_CALLS', '3')
+    monkeypatch.setattr(index, 'result_cache', index.ResultCache(max_entries=0))
+    yield CVServiceProxy()
+    server.shutdown()
+
+def test_proxy_skips_backend_while_open(failing_proxy):
+    image = base64.b64encode(b'not really a jpeg').decode('ascii')
+
+    for _ in range(3):
+        result = failing_proxy.detect_devices(image)
+        assert not result['success']
+        assert 'circuit_open' not in result
+
+    result = failing_proxy.detect_devices(image)
+    assert result['circuit_open']
+    assert result['fallback']
+    stats = failing_proxy.health()['breakers'][failing_proxy.cv_endpoint]
+    assert stats['state'] == CircuitBreaker.OPEN
+    assert stats['rejected'] == 1
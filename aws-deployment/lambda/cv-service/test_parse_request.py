@@ -0,0 +1,86 @@
+import base64
+import json
+
+import msgpack
+import pytest
+
+from index import build_response, parse_multipart, parse_request
+
+JPEG = b'\xff\xd8\xff\xe0 fake jpeg \x00\x01\r\n--not-a-boundary'
+JPEG_B64 = base64.b64encode(JPEG).decode('ascii')
+
+def multipart(boundary, fields):
+    """multipart/form-data body; bytes values are sent as file uploads"""
+    body = b''
+    for name, value in fields.items():
+        head = f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"'
+        if isinstance(value, bytes):
+            head += '; filename="upload.jpg"\r\nContent-Type: image/jpeg'
+        else:
+            value = value.encode('utf-8')
+        body += head.encode('utf-8') + b'\r\n\r\n' + value + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode('utf-8')
+
+def test_json_body():
+    event = {'headers': {'Content-Type': 'application/json'},
+             'body': json.dumps({'image': JPEG_B64, 'device_type': 'bp_monitor'})}
+
+    assert parse_request(event) == {'image': JPEG_B64, 'device_type': 'bp_monitor'}
+
+def test_base64_json_body():
+    body = json.dumps({'image': JPEG_B64}).encode('utf-8')
+    event = {'body': base64.b64encode(body).decode('ascii'), 'isBase64Encoded': True}
+
+    assert parse_request(event) == {'image': JPEG_B64}
+
+def test_raw_image_body_passes_base64_through():
+    event = {
+        'headers': {'content-type': 'image/jpeg'},
+        'queryStringParameters': {'device_type': 'glucose_meter', 'device_types': 'thermometer, bp_monitor'},
+        'body': JPEG_B64,
+        'isBase64Encoded': True
+    }
+
+    params = parse_request(event)
+
+    assert params['image'] == JPEG_B64
+    assert params['device_type'] == 'glucose_meter'
+    assert params['device_types'] == ['thermometer', 'bp_monitor']
+
+@pytest.mark.parametrize("is_base64", [True, False])
+def test_multipart_upload(is_base64):
+    raw = multipart('b0undary', {'device_type': 'thermometer', 'image': JPEG})
+    event = {
+        'headers': {'Content-Type': 'multipart/form-data; boundary=b0undary'},
+        'body': base64.b64encode(raw).decode('ascii') if is_base64 else raw.decode('latin-1'),
+        'isBase64Encoded': is_base64
+    }
+
+    assert parse_request(event) == {'device_type': 'thermometer', 'image': JPEG_B64}
+
+def test_multipart_without_boundary():
+    with pytest.raises(ValueError):
+        parse_multipart(b'', 'multipart/form-data')
+
+def test_multipart_quoted_boundary_and_file_field():
+    raw = multipart('abc', {'file': JPEG})
+
+    assert parse_multipart(raw, 'multipart/form-data; boundary="abc"') == {'file': JPEG}
+
+def test_msgpack_response_when_accepted():
+    result = {'success': True, 'detections': [{'confidence': 0.92, 'bbox': [1.5, 2.0, 3.25, 4.0]}]}
+    event = {'headers': {'Accept': 'application/msgpack'}}
+
+    response = build_response(event, {'Content-Type': 'application/json'}, result)
+
+    assert response['headers']['Content-Type'] == 'application/msgpack'
+    assert response['isBase64Encoded']
+    decoded = msgpack.unpackb(base64.b64decode(response['body']))
+    assert decoded['detections'][0]['bbox'] == [1.5, 2.0, 3.25, 4.0]
+    assert decoded['detections'][0]['confidence'] == pytest.approx(0.92, rel=1e-6)
+
+def test_json_response_by_default():
+    response = build_response({'headers': {}}, {'Content-Type': 'application/json'}, {'success': True})
+
+    assert json.loads(response['body']) == {'success': True}
+    assert 'isBase64Encoded' not in response
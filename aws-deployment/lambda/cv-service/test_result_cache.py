@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from index import CVServiceProxy, ResultCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for TTL checks"""
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+def test_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put(('a',), {'n': 1})
+    cache.put(('b',), {'n': 2})
+    assert cache.get(('a',)) == {'n': 1}
+
+    cache.put(('c',), {'n': 3})
+
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == {'n': 1}
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire(clock):
+    cache = ResultCache(ttl_seconds=60)
+    cache.put(('a',), {'n': 1})
+
+    clock[0] += 59
+    assert cache.get(('a',)) == {'n': 1}
+    clock[0] += 2
+    assert cache.get(('a',)) is None
+    assert cache.stats()['entries'] == 0
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0)
+    cache.put(('a',), {'n': 1})
+
+    assert cache.get(('a',)) is None
+    assert cache.stats()['hit_rate'] == 0.0
+
+def test_key_covers_image_and_settings():
+    key = ResultCache.make_key(b'image', 'endpoint', 'v1', 'thermometer', 0.5)
+
+    assert key == ResultCache.make_key(memoryview(b'image'), 'endpoint', 'v1', 'thermometer', 0.5)
+    assert key != ResultCache.make_key(b'other', 'endpoint', 'v1', 'thermometer', 0.5)
+    assert key != ResultCache.make_key(b'image', 'endpoint', 'v1', 'thermometer', 0.25)
+
+@pytest.mark.parametrize("image", ['aGVsbG8=', 'data:image/jpeg;base64,aGVsbG8='])
+def test_image_view_slices_the_encoded_body(image):
+    proxy = CVServiceProxy.__new__(CVServiceProxy)
+    body = proxy._encode_body(image, 'thermometer', 0.5)
+
+    assert bytes(CVServiceProxy._image_view(body)) == b'aGVsbG8='
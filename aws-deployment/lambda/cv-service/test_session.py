@@ -0,0 +1,61 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from index import build_session
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """Answers every POST with the server's status and records the client port"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append((self.client_address[1], dict(self.headers)))
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    server.daemon_threads = True
+    server.status = 200
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/detect'
+    yield server
+    server.shutdown()
+
+def test_reuses_one_connection(server):
+    session = build_session(token='secret')
+
+    for _ in range(5):
+        assert session.post(server.url, data=b'{}', timeout=5).status_code == 200
+
+    assert len(server.requests) == 5
+    assert len({port for port, _ in server.requests}) == 1
+    assert server.requests[0][1]['Authorization'] == 'Bearer secret'
+
+@pytest.mark.parametrize("status", [503, 504])
+def test_does_not_retry_error_responses(server, status):
+    server.status = status
+    session = build_session(retries=2)
+
+    response = session.post(server.url, data=b'{}', timeout=5)
+
+    assert response.status_code == status
+    assert len(server.requests) == 1
+
+def test_retries_only_connection_failures():
+    retry = build_session(retries=3).get_adapter('http://cv.internal').max_retries
+
+    assert retry.connect == 3
+    assert retry.read == 0
+    assert retry.status == 0
+    assert 'POST' in retry.allowed_methods
@@ -0,0 +1,110 @@
+"""
+LlamaServerSupervisor against fake_llama_server.py, a chatty stand-in for
+the llama.cpp server (see benchmark_supervisor.py for throughput numbers)
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+from inference import LlamaServerSupervisor
+
+FAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_llama_server.py')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def make_supervisor():
+    supervisors = []
+
+    def make(*args, start_timeout=20):
+        port = free_port()
+        supervisor = LlamaServerSupervisor(
+            [sys.executable, FAKE_SERVER, '--host', '127.0.0.1', '--port', str(port), *args],
+            f"http://127.0.0.1:{port}/health", start_timeout=start_timeout
+        )
+        supervisor.HEALTH_FALLBACK_SECONDS = 0.2
+        supervisor.url = f"http://127.0.0.1:{port}"
+        supervisors.append(supervisor)
+        return supervisor
+
+    yield make
+    for supervisor in supervisors:
+        supervisor.stop()
+
+def complete(supervisor, prompt='hello', timeout=10):
+    return requests.post(f"{supervisor.url}/completion", json={"prompt": prompt, "n_predict": 4}, timeout=timeout)
+
+def test_pipes_drain_under_log_flood(make_supervisor):
+    # ~400 KB per stream per request, far beyond a 64 KB pipe buffer
+    supervisor = make_supervisor('--log-lines', '2000', '--line-bytes', '200', '--load-seconds', '0')
+    supervisor.start()
+
+    for i in range(5):
+        assert complete(supervisor, f"q{i}").status_code == 200
+
+    deadline = time.monotonic() + 5
+    while supervisor.line_counts["stderr"] < 6 * 2000 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert supervisor.line_counts["stdout"] >= 5 * 2000
+    assert supervisor.line_counts["stderr"] >= 6 * 2000
+    assert supervisor.restarts == 0
+
+def test_ready_waits_for_health(make_supervisor):
+    # The fake server logs "HTTP server listening" at once but answers 503 while loading
+    supervisor = make_supervisor('--log-lines', '10', '--load-seconds', '1.5')
+    started = threading.Thread(target=supervisor.start)
+    start = time.monotonic()
+    started.start()
+
+    time.sleep(0.8)
+    assert requests.get(supervisor.health_url, timeout=2).status_code == 503
+    assert not supervisor.ready
+
+    started.join(timeout=10)
+    assert supervisor.ready
+    assert time.monotonic() - start >= 1.5
+    assert requests.get(supervisor.health_url, timeout=2).status_code == 200
+
+def test_restarts_after_crash(make_supervisor):
+    supervisor = make_supervisor('--log-lines', '10', '--load-seconds', '0', '--crash-after', '2')
+    supervisor.start()
+    first_pid = supervisor.process.pid
+
+    assert complete(supervisor).status_code == 200
+    with pytest.raises(requests.RequestException):
+        complete(supervisor)
+
+    deadline = time.monotonic() + 10
+    while supervisor.restarts == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    supervisor.wait_ready(10)
+    assert supervisor.restarts == 1
+    assert supervisor.last_exit_code == 1
+    assert supervisor.process.pid != first_pid
+    assert complete(supervisor).status_code == 200
+
+def test_stop_then_start_launches_one_server(make_supervisor):
+    supervisor = make_supervisor('--log-lines', '10', '--load-seconds', '0')
+    supervisor.start()
+
+    # Holding the condition keeps the old watcher from seeing the exit until
+    # start() has launched the new server (wait_ready releases it)
+    with supervisor._cond:
+        supervisor.stop()
+        supervisor.start()
+    pid = supervisor.process.pid
+
+    # Past the first restart backoff: a stale watcher would have relaunched by now
+    time.sleep(1.5)
+    assert supervisor.restarts == 0
+    assert supervisor.process.pid == pid
+    assert supervisor.ready
@@ -1,80 +1,195 @@
 import gradio as gr
-import cv2
-import numpy as np
-from ultralytics import YOLO
-import base64
-import io
-from PIL import Image
+import os
 import json
 import time
 
-# Load the model
-model = YOLO("best.pt")
+import uvicorn
+from fastapi import FastAPI, Request
+from starlette.concurrency import run_in_threadpool
 
-def predict_image(image_data):
+from model_registry import get_model, resolve_backend
+from postprocess import extract_detections
+from image_ingest import ingest_image, image_scale, crop_roi
+from detection_cache import DetectionCache, content_hash, perceptual_hash
+from micro_batcher import MicroBatcher, NO_TRANSFORM
+
+# Load the model (CV_BACKEND=onnx serves best.onnx via onnxruntime)
+MODEL_PATH, _ = resolve_backend(os.getenv('CV_MODEL_PATH', 'best.pt'), os.getenv('CV_BACKEND', 'auto'))
+model = get_model(MODEL_PATH)
+
+def model_version(path):
+    """Identify the loaded weights so cached results never outlive a model update"""
+    try:
+        stat = os.stat(path)
+        return f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return path
+
+MODEL_VERSION = os.getenv('CV_MODEL_VERSION') or model_version(MODEL_PATH)
+
+# Result cache for repeated frames (CV_CACHE_SIZE=0 disables it;
+# CV_CACHE_NEAR_DUPLICATES=<bits> also matches near-identical frames by perceptual hash)
+near_duplicates = os.getenv('CV_CACHE_NEAR_DUPLICATES')
+cache = DetectionCache(
+    max_entries=int(os.getenv('CV_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.getenv('CV_CACHE_TTL', '300')),
+    max_distance=int(near_duplicates) if near_duplicates else None
+)
+
+# Micro-batching configuration
+BATCH_WINDOW_MS = float(os.getenv('CV_BATCH_WINDOW_MS', '10'))
+MAX_BATCH_SIZE = int(os.getenv('CV_MAX_BATCH_SIZE', '8'))
+
+# Downscale uploads so the longest side is at most this many pixels (0 = off)
+MAX_INPUT_SIDE = int(os.getenv('CV_MAX_INPUT_SIDE', '0'))
+
+def infer_batch(image_arrays, transforms=None, conf=0.5):
+    """
+    Run a single forward pass over a list of images.
+    Ultralytics letterboxes the list into one batch tensor and maps
+    boxes back to each image's own coordinates; transforms holds an
+    (offset, scale) pair per image to map crops/downscaled images back
+    to the original upload.
+    """
+    results = model(image_arrays, conf=conf, verbose=False)
+    transforms = transforms or [NO_TRANSFORM] * len(results)
+    return [
+        extract_detections(result, offset=offset, scale=scale)
+        for result, (offset, scale) in zip(results, transforms)
+    ]
+
+batcher = MicroBatcher(infer_batch, MAX_BATCH_SIZE, BATCH_WINDOW_MS)
+
+def predict_image(image_data, roi=None):
     """
     Predict objects in the image
+    
+    roi is an optional [x, y, width, height] box in original image coordinates
+    (typically the previous frame's detection) to restrict inference to.
     """
     try:
-        # Decode base64 image
-        if isinstance(image_data, str):
-            # Remove data URL prefix if present
-            if image_data.startswith('data:image'):
-                image_data = image_data.split(',')[1]
-            
-            # Decode base64
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-        else:
-            image = image_data
+        # Results depend on the model and detection settings as well as the pixels
+        namespace = (MODEL_VERSION, 0.5, MAX_INPUT_SIDE, tuple(roi) if roi else None)
         
-        # Convert to numpy array
-        image_array = np.array(image)
+        # Exact repeat: answer before decoding anything
+        digest = None
+        if cache.enabled and isinstance(image_data, (str, bytes, bytearray, memoryview)):
+            digest = content_hash(image_data)
+            cached = cache.get(namespace, digest)
+            if cached is not None:
+                return {**cached, "processing_time": 0, "decode_time": 0, "cache": "hit"}
         
-        # Run inference
+        # Decode base64 or raw bytes straight to a BGR array (downscaled if configured)
+        image_array, original_size, decode_ms = ingest_image(image_data, MAX_INPUT_SIDE)
+        scale = image_scale(image_array, original_size)
+        
+        phash = None
+        if cache.enabled:
+            # Arrays and PIL images can only be hashed once decoded
+            if digest is None:
+                digest = content_hash(image_array)
+                cached = cache.get(namespace, digest)
+                if cached is not None:
+                    return {**cached, "processing_time": 0, "decode_time": round(decode_ms, 2), "cache": "hit"}
+            
+            # Near-duplicate frame: reuse its detections
+            if cache.max_distance is not None:
+                phash = perceptual_hash(image_array)
+            cached = cache.get_similar(namespace, phash)
+            if cached is not None:
+                return {**cached, "processing_time": 0, "decode_time": round(decode_ms, 2), "cache": "near"}
+        
+        # Run inference (coalesced with any concurrent requests)
         start_time = time.time()
-        results = model(image_array, conf=0.5)
-        processing_time = time.time() - start_time
+        detections = None
+        if roi:
+            region, offset = crop_roi(image_array, roi, scale)
+            detections = batcher.submit(region, (offset, scale))
         
-        # Process results
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    x, y, w, h = x1, y1, x2 - x1, y2 - y1
-                    
-                    # Get class and confidence
-                    cls = int(box.cls[0].cpu().numpy())
-                    conf = float(box.conf[0].cpu().numpy())
-                    
-                    # Get class name
-                    class_name = model.names[cls]
-                    
-                    detections.append({
-                        "class": class_name,
-                        "confidence": conf,
-                        "bbox": [float(x), float(y), float(w), float(h)],
-                        "class_id": cls
-                    })
+        # No ROI, or the object left it - run on the whole frame
+        if not detections:
+            detections = batcher.submit(image_array, ((0, 0), scale))
+        processing_time = time.time() - start_time
         
         # Return results in the same format as your local API
-        return {
+        response = {
             "detections": detections,
             "processing_time": int(processing_time * 1000),  # Convert to milliseconds
-            "image_size": [image_array.shape[1], image_array.shape[0]]  # [width, height]
+            "decode_time": round(decode_ms, 2),
+            "image_size": list(original_size)  # [width, height]
         }
+        cache.put(namespace, digest, response, phash)
+        return {**response, "cache": "miss"}
         
     except Exception as e:
         return {
             "error": str(e),
             "detections": [],
             "processing_time": 0,
+            "decode_time": 0,
             "image_size": [0, 0]
         }
 
+def predict_batch(images):
+    """
+    Predict objects in a list of images (base64 strings or raw bytes) with one forward pass
+    """
+    if isinstance(images, str):
+        images = json.loads(images)
+    
+    results = [None] * len(images)
+    image_arrays = []
+    original_sizes = []
+    decode_times = []
+    indices = []
+    
+    # Decode everything up front; a bad image only fails its own slot
+    for i, image_data in enumerate(images):
+        try:
+            image_array, original_size, decode_ms = ingest_image(image_data, MAX_INPUT_SIDE)
+            image_arrays.append(image_array)
+            original_sizes.append(original_size)
+            decode_times.append(decode_ms)
+            indices.append(i)
+        except Exception as e:
+            results[i] = {
+                "error": str(e),
+                "detections": [],
+                "processing_time": 0,
+                "decode_time": 0,
+                "image_size": [0, 0]
+            }
+    
+    start_time = time.time()
+    try:
+        transforms = [
+            ((0, 0), image_scale(image_array, original_size))
+            for image_array, original_size in zip(image_arrays, original_sizes)
+        ]
+        batch_detections = batcher.submit_many(image_arrays, transforms) if image_arrays else []
+    except Exception as e:
+        return {
+            "error": str(e),
+            "results": [],
+            "batch_size": len(images),
+            "processing_time": 0
+        }
+    processing_time = int((time.time() - start_time) * 1000)
+    
+    for i, original_size, decode_ms, detections in zip(indices, original_sizes, decode_times, batch_detections):
+        results[i] = {
+            "detections": detections,
+            "processing_time": processing_time,
+            "decode_time": round(decode_ms, 2),
+            "image_size": list(original_size)
+        }
+    
+    return {
+        "results": results,
+        "batch_size": len(images),
+        "processing_time": processing_time
+    }
+
 def predict_api(image_data):
     """
     API endpoint for predictions
@@ -82,6 +197,53 @@ def predict_api(image_data):
     result = predict_image(image_data)
     return result
 
+async def read_upload(request):
+    """
+    Read an image upload from a multipart form, a raw binary body or a base64 text body
+    """
+    content_type = request.headers.get('content-type', '')
+    
+    if content_type.startswith('multipart/form-data'):
+        form = await request.form()
+        upload = form.get('image') or form.get('file')
+        if upload is None:
+            raise ValueError("Multipart upload must include an 'image' or 'file' field")
+        return await upload.read()
+    
+    body = await request.body()
+    if content_type.startswith(('application/octet-stream', 'image/')):
+        return body
+    
+    # Anything else is treated as base64 text (optionally a data URL)
+    return body.decode('ascii')
+
+# Plain HTTP API for binary uploads (no base64 or JSON overhead)
+api = FastAPI()
+
+@api.post("/detect")
+async def detect_upload(request: Request):
+    try:
+        image_data = await read_upload(request)
+        
+        # Optional ?roi=x,y,w,h carried over from the previous frame's detection
+        roi_param = request.query_params.get('roi')
+        roi = [float(value) for value in roi_param.split(',')] if roi_param else None
+    except Exception as e:
+        return {
+            "error": str(e),
+            "detections": [],
+            "processing_time": 0,
+            "decode_time": 0,
+            "image_size": [0, 0]
+        }
+    
+    # Inference blocks on the micro-batcher, so keep it off the event loop
+    return await run_in_threadpool(predict_image, image_data, roi)
+
+@api.get("/cache/stats")
+async def cache_stats():
+    return {"model_version": MODEL_VERSION, **cache.stats()}
+
 # Create Gradio interface with explicit API configuration
 iface = gr.Interface(
     fn=predict_api,
@@ -99,12 +261,33 @@ iface = gr.Interface(
     # Enable API for Hugging Face Spaces
     api_name="predict",
     # Additional API configuration
+    allow_flagging="never",
+    # Let concurrent requests reach the micro-batcher together
+    concurrency_limit=MAX_BATCH_SIZE
+)
+
+batch_iface = gr.Interface(
+    fn=predict_batch,
+    inputs=[
+        gr.JSON(label="List of Base64 Images")
+    ],
+    outputs=[
+        gr.JSON(label="Batch Detection Results")
+    ],
+    title="SIMIS AI Thermometer Detection (Batch)",
+    description="Detect thermometers in several images with a single forward pass.",
+    api_name="predict_batch",
     allow_flagging="never"
 )
 
+demo = gr.TabbedInterface([iface, batch_iface], ["Single Image", "Batch"])
+
 # For Hugging Face Spaces, we need to expose the function
 predict = predict_api
 
+# Serve the Gradio UI/API and the binary upload endpoint from one app
+app = gr.mount_gradio_app(api, demo, path="/")
+
 # Launch the app
 if __name__ == "__main__":
-    iface.launch()
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "7860")))
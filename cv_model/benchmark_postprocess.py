@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for detection post-processing
+Compares the old per-box loop with the vectorized postprocess module at 1, 10 and 300 boxes.
+
+Usage: python benchmark_postprocess.py [--iterations 2000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from postprocess import extract_detections
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+NAMES = {i: name for i, name in enumerate([
+    "thermometer (Lo error)",
+    "thermometer (measuring)",
+    "thermometer (no display found)",
+    "thermometer (off)",
+    "thermometer button",
+    "thermometer in ear",
+    "thermometer in mouth",
+    "thermometer in nose",
+    "thermometer on face"
+])}
+
+class FakeBoxes:
+    """Mimics ultralytics Boxes: column tensors plus per-box slicing on iteration"""
+
+    def __init__(self, data):
+        self.data = data
+        self.xyxy = data[:, :4]
+        self.conf = data[:, 4]
+        self.cls = data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield FakeBoxes(self.data[i:i + 1])
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.names = NAMES
+
+def make_result(num_boxes):
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 600, (num_boxes, 2))
+    wh = rng.uniform(10, 200, (num_boxes, 2))
+    data = np.column_stack([
+        xy, xy + wh,
+        rng.uniform(0.5, 1.0, num_boxes),
+        rng.integers(0, len(NAMES), num_boxes)
+    ]).astype(np.float32)
+    if torch is not None:
+        data = torch.from_numpy(data)
+    return FakeResult(FakeBoxes(data))
+
+def _cpu_numpy(values):
+    return values.cpu().numpy() if hasattr(values, 'cpu') else values
+
+def legacy_extract(result):
+    """The previous per-box implementation from app.py / detect_screen.py"""
+    detections = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = _cpu_numpy(box.xyxy[0])
+        cls = int(_cpu_numpy(box.cls[0]))
+        conf = float(_cpu_numpy(box.conf[0]))
+        detections.append({
+            "class": result.names[cls],
+            "confidence": conf,
+            "bbox": [float(x1), float(y1), float(x2 - x1), float(y2 - y1)],
+            "class_id": cls
+        })
+    return detections
+
+def time_per_frame(fn, result, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(result)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detection post-processing')
+    parser.add_argument('--iterations', type=int, default=2000, help='Frames per measurement')
+    args = parser.parse_args()
+
+    print(f"Backend: {'torch' if torch is not None else 'numpy'} tensors")
+    print(f"{'boxes':>6} {'per-box loop (us)':>18} {'vectorized (us)':>16} {'speedup':>8}")
+
+    for num_boxes in (1, 10, 300):
+        result = make_result(num_boxes)
+        iterations = max(args.iterations // max(num_boxes // 10, 1), 20)
+
+        legacy_us = time_per_frame(legacy_extract, result, iterations)
+        vectorized_us = time_per_frame(extract_detections, result, iterations)
+        print(f"{num_boxes:>6} {legacy_us:>18.1f} {vectorized_us:>16.1f} {legacy_us / vectorized_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
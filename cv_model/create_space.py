@@ -25,8 +25,9 @@ def create_space_with_model():
         # Copy the model weights
         shutil.copy("models/poc2/best.pt", upload_dir / "best.pt")
         
-        # Copy the Gradio app
-        shutil.copy("app.py", upload_dir / "app.py")
+        # Copy the Gradio app and the modules it imports
+        for filename in ["app.py", "model_registry.py", "postprocess.py", "image_ingest.py", "onnx_backend.py", "detection_cache.py"]:
+            shutil.copy(filename, upload_dir / filename)
         
         # Copy requirements
         shutil.copy("requirements.txt", upload_dir / "requirements.txt")
@@ -6,60 +6,72 @@ Can be used for both screen capture and image file detection
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import mss
 import argparse
+import base64
 import json
 import sys
 import os
+import socketserver
 from pathlib import Path
 
-def detect_in_image(model_path, image_path, conf_threshold=0.5):
-    """Detect objects in a single image file"""
+from model_registry import get_model, resolve_backend
+from postprocess import extract_detections
+from image_ingest import decode_image_bytes, ingest_image, image_scale, crop_roi
+from realtime_pipeline import DetectionPipeline, ScreenSource, CameraSource
+
+def load_image(image, max_side=0):
+    """
+    Decode an image exactly once from a file path, encoded bytes or array into a BGR array.
+    Returns (image, original_size); with max_side set the image is downscaled on decode.
+    """
+    if isinstance(image, np.ndarray):
+        img, original_size, _ = ingest_image(image, max_side)
+        return img, original_size
+    
+    if not isinstance(image, (bytes, bytearray, memoryview)):
+        if not os.path.exists(image):
+            raise FileNotFoundError(f"Image file not found: {image}")
+        with open(image, 'rb') as f:
+            image = f.read()
+    
+    return decode_image_bytes(image, max_side)
+
+def run_model(model, image, conf_threshold):
+    """Run inference with warnings suppressed for API calls"""
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return model(image, conf=conf_threshold, verbose=False)[0]
+
+def detect_in_image(model_path, image, conf_threshold=0.5, max_side=0, roi=None):
+    """
+    Detect objects in a single image (file path, encoded bytes or decoded array).
+    
+    max_side downscales large images before inference; roi ([x, y, width, height]
+    in original coordinates, e.g. the previous frame's detection) restricts
+    inference to that region. Boxes are always reported in original coordinates.
+    """
     try:
-        # Check if this is a Hugging Face model path
-        if '/' in model_path and not os.path.exists(model_path):
-            # It's a Hugging Face model, ensure we're authenticated
-            token = os.getenv('HUGGINGFACE_TOKEN') or os.getenv('HF_HUB_TOKEN')
-            if token:
-                print(f"Using Hugging Face model: {model_path}")
-            else:
-                print(f"Warning: No Hugging Face token found for private model: {model_path}")
+        # Load model (cached in the shared registry after the first call)
+        model = get_model(model_path)
         
-        # Load model
-        model = YOLO(model_path)
+        # Decode once and reuse the array for inference and dimensions
+        img, original_size = load_image(image, max_side)
+        scale = image_scale(img, original_size)
         
-        # Load image
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
+        detections = None
+        if roi:
+            region, offset = crop_roi(img, roi, scale)
+            results = run_model(model, region, conf_threshold)
+            detections = extract_detections(results, offset=offset, scale=scale)
         
-        # Run inference (suppress verbose output for API calls)
-        import warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            results = model(image_path, conf=conf_threshold, verbose=False)[0]
-        
-        # Extract detections
-        detections = []
-        if results.boxes is not None:
-            for box in results.boxes:
-                # Get box coordinates (x1, y1, x2, y2)
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                
-                # Convert to (x, y, width, height) format
-                x, y, width, height = x1, y1, x2 - x1, y2 - y1
-                
-                detection = {
-                    "class": results.names[int(box.cls[0])],
-                    "confidence": float(box.conf[0]),
-                    "bbox": [float(x), float(y), float(width), float(height)],
-                    "class_id": int(box.cls[0])
-                }
-                detections.append(detection)
+        # No ROI, or the object left it - run on the whole frame
+        if not detections:
+            results = run_model(model, img, conf_threshold)
+            detections = extract_detections(results, scale=scale)
         
         # Get image dimensions
-        img = cv2.imread(image_path)
-        image_size = [img.shape[1], img.shape[0]]  # [width, height]
+        image_size = list(original_size)  # [width, height]
         
         return {
             "detections": detections,
@@ -75,47 +87,125 @@ def detect_in_image(model_path, image_path, conf_threshold=0.5):
             "error": str(e)
         }
 
-def detect_screen_realtime(model_path, monitor_region=None, conf_threshold=0.5):
-    """Real-time screen detection (for future use)"""
-    model = YOLO(model_path)
-    sct = mss.mss()
+def handle_request(line, model_path, conf_threshold=0.5, max_side=0):
+    """Handle one newline-delimited JSON detection request and return the response dict"""
+    request = None
+    try:
+        request = json.loads(line)
+        if 'image_b64' in request:
+            # Inline image bytes, so callers don't need to write temp files
+            image = base64.b64decode(request['image_b64'])
+        else:
+            image = request['image']
+        conf = float(request.get('conf', conf_threshold))
+        side = int(request.get('max_side', max_side))
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        # A malformed line fails on its own; the warm worker keeps serving
+        result = {
+            "detections": [],
+            "image_size": [0, 0],
+            "success": False,
+            "error": f"Invalid request: {e}"
+        }
+    else:
+        result = detect_in_image(request.get('model', model_path), image, conf, side, request.get('roi'))
+    
+    # Echo the request id so callers can match responses to requests
+    if isinstance(request, dict) and 'id' in request:
+        result['id'] = request['id']
+    return result
+
+class DetectionRequestHandler(socketserver.StreamRequestHandler):
+    """Serve newline-delimited JSON requests over a Unix socket connection"""
     
-    if monitor_region is None:
-        monitor_region = {"top": 100, "left": 100, "width": 1280, "height": 720}
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode('utf-8').strip()
+            if not line:
+                continue
+            result = handle_request(line, self.server.model_path, self.server.conf_threshold,
+                                    self.server.max_side)
+            self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+def serve(model_path, conf_threshold=0.5, socket_path=None, max_side=0):
+    """
+    Long-lived worker mode: load the model once, then answer one JSON request per line.
     
-    while True:
-        # Capture screen region
-        screenshot = sct.grab(monitor_region)
-        
-        # Convert to NumPy array
-        frame = np.array(screenshot)
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-        
-        # Run inference
-        results = model(frame, conf=conf_threshold)[0]
-        
-        # Annotate frame
-        annotated = results.plot()
-        
-        # Display result
-        cv2.imshow("YOLOv8 Screen Detection", annotated)
+    Requests look like {"id": 1, "image": "path/to/image.jpg", "conf": 0.5} (or carry
+    base64 bytes in "image_b64" instead of "image"), optionally with "max_side" and a
+    "roi" box from the previous frame. Each response is written as a single JSON line. Reads stdin/stdout unless socket_path is set.
+    """
+    get_model(model_path)
+    
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
         
-        # Exit on 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        # Single-threaded server: the model is not safe to share between threads
+        with socketserver.UnixStreamServer(socket_path, DetectionRequestHandler) as server:
+            server.model_path = model_path
+            server.conf_threshold = conf_threshold
+            server.max_side = max_side
+            print(f"Detection worker listening on {socket_path}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(socket_path)
+        return
+    
+    # Signal readiness so the caller knows the model is warm
+    print(json.dumps({"ready": True, "model": model_path}), flush=True)
     
-    cv2.destroyAllWindows()
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        result = handle_request(line, model_path, conf_threshold, max_side)
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
+
+def detect_screen_realtime(model_path, monitor_region=None, conf_threshold=0.5, headless=False, camera=None,
+                           motion_threshold=None, keyframe_interval=1):
+    """
+    Real-time screen (or webcam) detection with capture, inference and
+    display/output running as separate pipeline stages. motion_threshold
+    skips inference on unchanged frames; keyframe_interval > 1 tracks boxes
+    between keyframes instead of running the model on every frame.
+    """
+    model = get_model(model_path)
+    source = CameraSource(camera) if camera is not None else ScreenSource(monitor_region)
+    DetectionPipeline(model, source, conf_threshold, headless=headless,
+                      motion_threshold=motion_threshold, keyframe_interval=keyframe_interval).run()
 
 def main():
     parser = argparse.ArgumentParser(description='YOLOv8 Detection for SIMIS')
     parser.add_argument('--model', required=True, help='Path to YOLOv8 model file')
-    parser.add_argument('--image', help='Path to image file for detection')
+    parser.add_argument('--backend', choices=['auto', 'torch', 'onnx'], default='auto',
+                       help='Inference backend (onnx uses the exported .onnx next to the weights)')
+    parser.add_argument('--image', help="Path to image file for detection ('-' reads image bytes from stdin)")
+    parser.add_argument('--image-fd', type=int, help='File descriptor to read image bytes from')
     parser.add_argument('--screen', action='store_true', help='Run real-time screen detection')
+    parser.add_argument('--headless', action='store_true',
+                       help='With --screen, print JSON detections per frame instead of opening a window')
+    parser.add_argument('--camera', type=int, help='With --screen, capture this webcam index instead of the screen')
+    parser.add_argument('--motion-threshold', type=float,
+                       help='With --screen, skip inference while the mean frame change stays below this (0-255 scale, e.g. 4)')
+    parser.add_argument('--keyframe-interval', type=int, default=1,
+                       help='With --screen, run full inference every N frames and track boxes in between')
+    parser.add_argument('--serve', action='store_true',
+                       help='Keep the model loaded and answer newline-delimited JSON requests on stdin')
+    parser.add_argument('--socket', help='Unix socket path to listen on in --serve mode instead of stdin')
     parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold')
+    parser.add_argument('--max-side', type=int, default=0,
+                       help='Downscale images so the longest side is at most this many pixels (0 = off)')
+    parser.add_argument('--roi', type=float, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+                       help='Only search this region (original image coordinates)')
     parser.add_argument('--output', choices=['json', 'display'], default='json', 
                        help='Output format: json for API, display for visualization')
     
     args = parser.parse_args()
+    args.model, _ = resolve_backend(args.model, args.backend)
     
     # Validate model path (skip for Hugging Face models)
     if not os.path.exists(args.model) and not ('/' in args.model and not args.model.startswith('/')):
@@ -126,16 +216,23 @@ def main():
         sys.exit(1)
     
     try:
-        if args.image:
-            # Image detection mode
-            result = detect_in_image(args.model, args.image, args.conf)
+        if args.image or args.image_fd is not None:
+            # Image detection mode - read from a path, stdin or a file descriptor
+            if args.image_fd is not None:
+                with os.fdopen(args.image_fd, 'rb') as f:
+                    image = f.read()
+            elif args.image == '-':
+                image = sys.stdin.buffer.read()
+            else:
+                image = args.image
             
             if args.output == 'json':
+                result = detect_in_image(args.model, image, args.conf, args.max_side, args.roi)
                 print(json.dumps(result))
             else:
                 # Display mode - show image with detections
-                model = YOLO(args.model)
-                results = model(args.image, conf=args.conf)[0]
+                model = get_model(args.model)
+                results = model(load_image(image)[0], conf=args.conf)[0]
                 annotated = results.plot()
                 cv2.imshow("Detection Results", annotated)
                 cv2.waitKey(0)
@@ -143,11 +240,18 @@ def main():
                 
         elif args.screen:
             # Screen detection mode
-            detect_screen_realtime(args.model, conf_threshold=args.conf)
+            detect_screen_realtime(args.model, conf_threshold=args.conf,
+                                   headless=args.headless, camera=args.camera,
+                                   motion_threshold=args.motion_threshold,
+                                   keyframe_interval=args.keyframe_interval)
+            
+        elif args.serve:
+            # Persistent worker mode
+            serve(args.model, conf_threshold=args.conf, socket_path=args.socket, max_side=args.max_side)
             
         else:
             print(json.dumps({
-                "error": "Please specify either --image or --screen",
+                "error": "Please specify either --image, --screen or --serve",
                 "success": False
             }))
             sys.exit(1)
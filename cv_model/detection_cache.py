@@ -0,0 +1,122 @@
+"""
+Detection result cache for SIMIS
+Content-addressed LRU cache with TTL in front of detection. Exact lookups
+hash the upload before it is decoded; an optional perceptual-hash tier
+matches near-duplicate frames after decode. Entries are namespaced by model
+version and detection settings so a model or threshold change never serves
+stale results.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+def content_hash(data):
+    """Exact hash of an upload (base64 text, encoded bytes or a decoded array)"""
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    elif isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def perceptual_hash(image):
+    """64-bit difference hash (dHash) of a BGR image"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+class DetectionCache:
+    """
+    LRU cache of detection responses with a TTL.
+
+    max_distance enables the near-duplicate tier: a lookup by perceptual
+    hash hits any live entry in the same namespace within that many bits.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=300, max_distance=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (namespace, digest) -> (expires_at, phash, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, namespace, digest):
+        """Exact lookup; returns the cached value or None"""
+        key = (namespace, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._entries[key]
+                self.expirations += 1
+            return None
+
+    def get_similar(self, namespace, phash):
+        """Near-duplicate lookup by perceptual hash; records a miss when nothing matches"""
+        if self.max_distance is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            # Newest entries first: consecutive frames are the likeliest matches
+            for key in reversed(self._entries):
+                expires_at, entry_phash, value = self._entries[key]
+                if key[0] != namespace or entry_phash is None or expires_at <= now:
+                    continue
+                if bin(entry_phash ^ phash).count('1') <= self.max_distance:
+                    self._entries.move_to_end(key)
+                    self.near_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, namespace, digest, value, phash=None):
+        """Store a value, evicting least recently used entries over max_entries"""
+        if not self.enabled:
+            return
+        key = (namespace, digest)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, phash, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
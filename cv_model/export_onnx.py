@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Export a SIMIS YOLOv8 model to ONNX for the onnxruntime backend
+Optionally INT8-quantizes it with a calibration set drawn from data/ captures
+and compares its detections against the PyTorch model on a held-out folder.
+
+Usage:
+    python export_onnx.py --model models/poc2/best.pt
+    python export_onnx.py --model models/poc2/best.pt --int8 --calibration-dir data/thermometer_poc2
+    python export_onnx.py --model models/poc2/best.pt --compare data/holdout
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from onnx_backend import OnnxDetector, preprocess
+from postprocess import extract_detections
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png')
+
+def list_images(folder):
+    """All images under a folder, sorted for reproducibility"""
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(folder, '**', pattern), recursive=True))
+    return sorted(paths)
+
+def export_onnx(model_path, imgsz=640, opset=12):
+    """Export weights with ultralytics; returns the .onnx path (written next to the weights)"""
+    from ultralytics import YOLO
+    return YOLO(model_path).export(format='onnx', imgsz=imgsz, opset=opset, simplify=True)
+
+def quantize_int8(onnx_path, calibration_dir, output_path, limit=200, imgsz=640):
+    """Statically quantize an ONNX model to INT8 using real captures for calibration"""
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    class CaptureCalibrationReader(CalibrationDataReader):
+        """Feeds letterboxed calibration images one at a time"""
+
+        def __init__(self, paths, input_name):
+            self.paths = iter(paths)
+            self.input_name = input_name
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    batch, _ = preprocess([image], (imgsz, imgsz))
+                    return {self.input_name: batch}
+            return None
+
+    paths = list_images(calibration_dir)
+    if not paths:
+        raise FileNotFoundError(f"No calibration images found in {calibration_dir}")
+    random.Random(0).shuffle(paths)
+    paths = paths[:limit]
+    print(f"Calibrating with {len(paths)} images from {calibration_dir}")
+
+    input_name = onnx.load(onnx_path, load_external_data=False).graph.input[0].name
+    quantize_static(
+        model_input=onnx_path,
+        model_output=output_path,
+        calibration_data_reader=CaptureCalibrationReader(paths, input_name),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+
+    # Carry over the class names and other export metadata
+    source, quantized = onnx.load(onnx_path), onnx.load(output_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, output_path)
+    return output_path
+
+def box_iou(a, b):
+    """IoU between two [x, y, width, height] boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2 = min(a[0] + a[2], b[0] + b[2])
+    y2 = min(a[1] + a[3], b[1] + b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Greedily match same-class detections; returns the IoU of each match"""
+    ious = []
+    unmatched = list(candidate)
+    for ref in sorted(reference, key=lambda d: -d["confidence"]):
+        best, best_iou = None, iou_threshold
+        for cand in unmatched:
+            if cand["class_id"] == ref["class_id"]:
+                iou = box_iou(ref["bbox"], cand["bbox"])
+                if iou >= best_iou:
+                    best, best_iou = cand, iou
+        if best is not None:
+            unmatched.remove(best)
+            ious.append(best_iou)
+    return ious
+
+def compare(model_path, onnx_path, folder, conf=0.5):
+    """Compare ONNX detections and latency against the PyTorch model on held-out images"""
+    from ultralytics import YOLO
+
+    paths = list_images(folder)
+    if not paths:
+        raise FileNotFoundError(f"No images found in {folder}")
+
+    torch_model = YOLO(model_path)
+    onnx_model = OnnxDetector(onnx_path)
+
+    torch_count = onnx_count = 0
+    ious = []
+    torch_ms = []
+    onnx_ms = []
+
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+
+        start = time.perf_counter()
+        # Same NMS IoU on both sides, so only the backend differs
+        torch_detections = extract_detections(
+            torch_model(image, conf=conf, iou=onnx_model.iou_threshold, verbose=False)[0]
+        )
+        torch_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        onnx_detections = extract_detections(onnx_model(image, conf=conf)[0])
+        onnx_ms.append((time.perf_counter() - start) * 1000)
+
+        torch_count += len(torch_detections)
+        onnx_count += len(onnx_detections)
+        ious.extend(match_detections(torch_detections, onnx_detections))
+
+    matched = len(ious)
+    return {
+        "images": len(torch_ms),
+        "torch_detections": torch_count,
+        "onnx_detections": onnx_count,
+        "matched": matched,
+        "recall_vs_torch": round(matched / torch_count, 4) if torch_count else 1.0,
+        "precision_vs_torch": round(matched / onnx_count, 4) if onnx_count else 1.0,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "torch_ms_mean": round(float(np.mean(torch_ms)), 2) if torch_ms else None,
+        "onnx_ms_mean": round(float(np.mean(onnx_ms)), 2) if onnx_ms else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Export SIMIS YOLOv8 weights to ONNX')
+    parser.add_argument('--model', required=True, help='Path to YOLOv8 .pt weights')
+    parser.add_argument('--imgsz', type=int, default=640, help='Export input size')
+    parser.add_argument('--int8', action='store_true', help='Also write an INT8-quantized model')
+    parser.add_argument('--calibration-dir', default='data',
+                        help='Folder of captures used to calibrate INT8 quantization')
+    parser.add_argument('--calibration-size', type=int, default=200,
+                        help='Maximum number of calibration images')
+    parser.add_argument('--compare', metavar='HOLDOUT_DIR',
+                        help='Compare the exported model against PyTorch on this folder')
+    parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold for --compare')
+
+    args = parser.parse_args()
+
+    onnx_path = export_onnx(args.model, args.imgsz)
+    print(f"Exported ONNX model: {onnx_path}")
+
+    if args.int8:
+        int8_path = os.path.splitext(onnx_path)[0] + '.int8.onnx'
+        quantize_int8(onnx_path, args.calibration_dir, int8_path, args.calibration_size, args.imgsz)
+        print(f"Wrote INT8 model: {int8_path}")
+        onnx_path = int8_path
+
+    if args.compare:
+        report = compare(args.model, onnx_path, args.compare, args.conf)
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Image ingest for SIMIS detection APIs
+Decodes base64 or raw binary uploads straight into BGR NumPy arrays with as
+few intermediate copies as possible, normalizing grayscale, alpha and
+palette images to 3 channels. Large images can be downscaled during decode
+and cropped to a region of interest before inference.
+"""
+
+import binascii
+import io
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Decode at 1/8, 1/4 or 1/2 resolution (JPEG uses DCT scaling, so this skips most of the work)
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# EXIF orientations that rotate the image by 90 degrees (imdecode applies them)
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+EXIF_ORIENTATION = 0x0112
+
+def read_image_size(data):
+    """
+    Read (width, height) from the image header without decoding pixels,
+    as oriented by its EXIF tag (the way cv2.imdecode returns it)
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+                return height, width
+            return width, height
+    except Exception:
+        return None
+
+def downscale(image, max_side):
+    """Shrink an array so its longest side is at most max_side"""
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if not max_side or longest <= max_side:
+        return image
+    ratio = max_side / longest
+    size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+def decode_image_bytes(data, max_side=0):
+    """
+    Decode encoded image bytes (JPEG/PNG/...) into a BGR array.
+
+    With max_side set, the image is decoded at the smallest reduced
+    resolution that still covers max_side and then resized down to it.
+    Returns (image, original_size) where original_size is (width, height).
+    """
+    # frombuffer wraps the bytes without copying; IMREAD_COLOR normalizes
+    # grayscale, alpha and palette images to 3-channel BGR during decode
+    buffer = np.frombuffer(memoryview(data), dtype=np.uint8)
+
+    flag = cv2.IMREAD_COLOR
+    original_size = read_image_size(data) if max_side else None
+    if original_size:
+        for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+            if max(original_size) / factor >= max_side:
+                flag = reduced_flag
+                break
+
+    image = cv2.imdecode(buffer, flag)
+    if image is None:
+        raise ValueError("Could not decode image data")
+
+    if original_size is None:
+        original_size = (image.shape[1], image.shape[0])
+    return downscale(image, max_side), original_size
+
+def decode_base64_image(data, max_side=0):
+    """Decode a base64 string or data URL into a BGR array; returns (image, original_size)"""
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    view = memoryview(data)
+
+    # Skip a data URL prefix by slicing the view instead of splitting the string
+    if view[:5] == b'data:':
+        comma = data.find(b',', 0, 256)
+        if comma < 0:
+            raise ValueError("Malformed data URL")
+        view = view[comma + 1:]
+
+    return decode_image_bytes(binascii.a2b_base64(view), max_side)
+
+def normalize_array(image):
+    """Convert a decoded array to 3-channel BGR"""
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return image
+
+def ingest_image(image_data, max_side=0):
+    """
+    Decode any supported upload into a BGR array.
+
+    Accepts base64 strings (with or without a data URL prefix), raw encoded
+    bytes, PIL images or NumPy arrays. With max_side set, the result is
+    downscaled so its longest side is at most max_side.
+    Returns (image, original_size, decode_ms).
+    """
+    start_time = time.perf_counter()
+
+    if isinstance(image_data, str):
+        image, original_size = decode_base64_image(image_data, max_side)
+    elif isinstance(image_data, (bytes, bytearray, memoryview)):
+        image, original_size = decode_image_bytes(image_data, max_side)
+    else:
+        if isinstance(image_data, Image.Image):
+            # PIL images are RGB(A)/palette; the model expects BGR arrays
+            image = cv2.cvtColor(np.asarray(image_data.convert('RGB')), cv2.COLOR_RGB2BGR)
+        elif isinstance(image_data, np.ndarray):
+            image = normalize_array(image_data)
+        else:
+            raise TypeError(f"Unsupported image input: {type(image_data).__name__}")
+        original_size = (image.shape[1], image.shape[0])
+        image = downscale(image, max_side)
+
+    decode_ms = (time.perf_counter() - start_time) * 1000
+    return image, original_size, decode_ms
+
+def image_scale(image, original_size):
+    """(x, y) factors that map coordinates in image back to the original image"""
+    return (original_size[0] / image.shape[1], original_size[1] / image.shape[0])
+
+def crop_roi(image, roi, scale=(1.0, 1.0), margin=0.25):
+    """
+    Crop image to a region of interest given in original-image coordinates.
+
+    roi is [x, y, width, height] (e.g. the previous frame's detection box),
+    grown by margin times its size on each side. Returns (crop, offset)
+    where offset is the crop's top-left corner in image coordinates; the
+    crop is a view, not a copy.
+    """
+    height, width = image.shape[:2]
+    x, y, w, h = roi
+    x, w = x / scale[0], w / scale[0]
+    y, h = y / scale[1], h / scale[1]
+
+    x0 = max(0, int(x - w * margin))
+    y0 = max(0, int(y - h * margin))
+    x1 = min(width, int(np.ceil(x + w * (1 + margin))))
+    y1 = min(height, int(np.ceil(y + h * (1 + margin))))
+
+    # Ignore degenerate or off-screen regions
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return image, (0, 0)
+    return image[y0:y1, x0:x1], (x0, y0)
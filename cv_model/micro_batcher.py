@@ -0,0 +1,74 @@
+"""
+Micro-batching for SIMIS detection
+Concurrent single-image requests that arrive within a short window are
+coalesced into one forward pass, which runs on a single batcher thread
+because the model is not thread-safe.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Identity mapping from model coordinates back to the uploaded image
+NO_TRANSFORM = ((0, 0), (1.0, 1.0))
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-image requests that arrive within a short
+    window into one batched forward pass
+    """
+    
+    def __init__(self, run_batch, max_batch_size=8, window_ms=10):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+    
+    def submit(self, image_array, transform=NO_TRANSFORM):
+        """Queue an image and block until its detections are ready"""
+        return self.submit_many([image_array], [transform])[0]
+    
+    def submit_many(self, image_arrays, transforms):
+        """
+        Queue several images as one job (kept together in one forward pass)
+        and block until their detections are ready. The model is not
+        thread-safe, so every inference goes through the batcher thread.
+        """
+        future = Future()
+        self._queue.put((image_arrays, transforms, future))
+        return future.result()
+    
+    def _loop(self):
+        while True:
+            jobs = [self._queue.get()]
+            size = len(jobs[0][0])
+            
+            # Collect more requests until the window closes or the batch is full
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                size += len(job[0])
+            
+            try:
+                results = self.run_batch(
+                    [image for images, _, _ in jobs for image in images],
+                    [transform for _, transforms, _ in jobs for transform in transforms]
+                )
+            except Exception as e:
+                for _, _, future in jobs:
+                    future.set_exception(e)
+            else:
+                start = 0
+                for images, _, future in jobs:
+                    future.set_result(results[start:start + len(images)])
+                    start += len(images)
@@ -0,0 +1,126 @@
+"""
+Process-wide YOLO model registry for SIMIS
+Caches loaded models keyed by (path or Hugging Face id, device, precision) and
+evicts the least recently used ones when the memory budget is exceeded.
+.onnx models run on the onnxruntime backend; everything else on ultralytics.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Memory budget for cached models, in megabytes (0 = unlimited)
+DEFAULT_BUDGET_MB = float(os.getenv('CV_MODEL_CACHE_MB', '1024'))
+
+def _estimate_model_bytes(model, model_path):
+    """Estimate the resident size of a loaded model"""
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters())
+    except Exception:
+        # Fall back to the weights file size for models we can't introspect
+        return os.path.getsize(model_path) if os.path.exists(model_path) else 0
+
+def resolve_backend(model_path, backend='auto'):
+    """
+    Pick the weights file and backend for a model path.
+    backend='onnx' with .pt weights uses the exported .onnx file next to them.
+    """
+    if backend == 'onnx' and not model_path.endswith('.onnx'):
+        model_path = os.path.splitext(model_path)[0] + '.onnx'
+    elif backend == 'auto':
+        backend = 'onnx' if model_path.endswith('.onnx') else 'torch'
+    return model_path, backend
+
+class ModelRegistry:
+    """LRU cache of loaded YOLO models bounded by an approximate memory budget"""
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._models = OrderedDict()  # key -> (model, size_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_path, device='cpu', precision='fp32', backend='auto'):
+        """Return a cached model, loading it on first use"""
+        model_path, backend = resolve_backend(model_path, backend)
+        key = (model_path, device, precision)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            model = self._load(model_path, device, precision, backend)
+            self._models[key] = (model, _estimate_model_bytes(model, model_path))
+            self._evict()
+            return model
+
+    def _load(self, model_path, device, precision, backend):
+        """Load model weights and place them on the requested device/precision"""
+        if backend == 'onnx':
+            # Imported lazily so the ONNX path never pays for importing torch
+            from onnx_backend import OnnxDetector
+            return OnnxDetector(model_path)
+
+        # Check if this is a Hugging Face model path
+        if '/' in model_path and not os.path.exists(model_path):
+            # It's a Hugging Face model, ensure we're authenticated
+            # (log to stderr so stdout stays valid JSON for API callers)
+            token = os.getenv('HUGGINGFACE_TOKEN') or os.getenv('HF_HUB_TOKEN')
+            if token:
+                print(f"Using Hugging Face model: {model_path}", file=sys.stderr)
+            else:
+                print(f"Warning: No Hugging Face token found for private model: {model_path}", file=sys.stderr)
+
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        if device != 'cpu':
+            model.to(device)
+        if precision == 'fp16':
+            model.model.half()
+        return model
+
+    def _evict(self):
+        """Drop least recently used models until we fit in the budget"""
+        if self.budget_bytes <= 0:
+            return
+
+        # Always keep the most recently used model, even if it alone exceeds the budget
+        while len(self._models) > 1 and self.memory_bytes > self.budget_bytes:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted model from registry: {key[0]} ({key[1]}, {key[2]})", file=sys.stderr)
+
+    @property
+    def memory_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def clear(self):
+        """Unload all cached models"""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            return {
+                "models": [list(key) for key in self._models],
+                "memory_mb": round(self.memory_bytes / (1024 * 1024), 1),
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+# Shared registry used by all CV entry points in this process
+registry = ModelRegistry()
+
+def get_model(model_path, device='cpu', precision='fp32', backend='auto'):
+    """Get a model from the shared registry"""
+    return registry.get(model_path, device, precision, backend)
@@ -0,0 +1,176 @@
+"""
+ONNX Runtime backend for SIMIS YOLOv8 detectors
+Runs an exported YOLOv8 ONNX model with NumPy letterbox and NMS, without
+importing torch. Detectors are called like ultralytics models and return
+results with the same boxes/names/plot() surface, so existing call sites
+work unchanged.
+"""
+
+import ast
+import json
+import os
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from postprocess import ArrayBoxes, ArrayResult
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+# Execution providers in order of preference (OpenVINO needs onnxruntime-openvino)
+PREFERRED_PROVIDERS = ['OpenVINOExecutionProvider', 'CPUExecutionProvider']
+
+# Offset added per class so class-aware NMS can run as one pass
+CLASS_OFFSET = 7680
+
+# NMS IoU used by ultralytics' predict() when none is passed; the PyTorch call
+# sites rely on it, so the ONNX backend matches it to return the same results
+DEFAULT_IOU = 0.7
+
+def letterbox(image, new_shape=(640, 640), color=(114, 114, 114)):
+    """
+    Resize keeping aspect ratio and pad to new_shape (height, width).
+    Returns (padded, ratio, (pad_left, pad_top)).
+    """
+    height, width = image.shape[:2]
+    ratio = min(new_shape[0] / height, new_shape[1] / width)
+    resized_w, resized_h = round(width * ratio), round(height * ratio)
+    if (resized_w, resized_h) != (width, height):
+        image = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+
+    # Split padding between both sides, as ultralytics does
+    pad_x = (new_shape[1] - resized_w) / 2
+    pad_y = (new_shape[0] - resized_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, ratio, (left, top)
+
+def preprocess(images, input_shape):
+    """Letterbox BGR images into one NCHW float32 RGB batch; returns (batch, [(ratio, pad)])"""
+    batch = np.empty((len(images), 3, input_shape[0], input_shape[1]), dtype=np.float32)
+    transforms = []
+    for i, image in enumerate(images):
+        padded, ratio, pad = letterbox(image, input_shape)
+        batch[i] = padded[:, :, ::-1].transpose(2, 0, 1)
+        transforms.append((ratio, pad))
+    batch /= 255.0
+    return batch, transforms
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression over xyxy boxes; returns kept indices by descending score"""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+def decode_output(output, ratio, pad, original_shape, conf_threshold, iou_threshold, max_det=300):
+    """
+    Decode one raw YOLOv8 output of shape (4 + num_classes, anchors) into
+    (xyxy, conf, cls) arrays in original image coordinates.
+    """
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    conf = class_scores[np.arange(len(cls)), cls]
+
+    mask = conf > conf_threshold
+    predictions, cls, conf = predictions[mask], cls[mask], conf[mask]
+
+    # (cx, cy, w, h) -> (x1, y1, x2, y2)
+    xyxy = np.empty((len(predictions), 4), dtype=np.float32)
+    xyxy[:, :2] = predictions[:, :2] - predictions[:, 2:4] / 2
+    xyxy[:, 2:] = predictions[:, :2] + predictions[:, 2:4] / 2
+
+    keep = nms(xyxy + cls[:, None] * CLASS_OFFSET, conf, iou_threshold)[:max_det]
+    xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+    # Undo letterbox padding and scaling
+    xyxy[:, [0, 2]] -= pad[0]
+    xyxy[:, [1, 3]] -= pad[1]
+    xyxy /= ratio
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, original_shape[1])
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, original_shape[0])
+    return xyxy, conf.astype(np.float32), cls.astype(np.float32)
+
+class OnnxDetector:
+    """YOLOv8 detector running on ONNX Runtime"""
+
+    def __init__(self, model_path, providers=None, iou_threshold=None):
+        available = ort.get_available_providers()
+        providers = providers or [p for p in PREFERRED_PROVIDERS if p in available]
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, providers=providers)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+
+        # Dynamic dimensions come back as strings
+        self.input_shape = (height, width) if isinstance(height, int) and isinstance(width, int) else (640, 640)
+        self.fixed_batch = batch if isinstance(batch, int) else None
+
+        config = self._read_config()
+        self.names = self._read_names(config)
+        self.iou_threshold = DEFAULT_IOU if iou_threshold is None else iou_threshold
+
+    def _read_config(self):
+        if os.path.exists(CONFIG_PATH):
+            with open(CONFIG_PATH) as f:
+                return json.load(f)
+        return {}
+
+    def _read_names(self, config):
+        """Class names from the export metadata, falling back to config.json"""
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if 'names' in metadata:
+            return ast.literal_eval(metadata['names'])
+        return dict(enumerate(config.get('classes', [])))
+
+    @staticmethod
+    def _load(image):
+        """Read an image path into a BGR array (arrays pass through)"""
+        if not isinstance(image, str):
+            return image
+        array = cv2.imread(image)
+        if array is None:
+            raise FileNotFoundError(f"Could not read image: {image}")
+        return array
+
+    def __call__(self, source, conf=0.25, iou=None, verbose=False, **kwargs):
+        """Run detection on an image path, BGR array or a list of them"""
+        images = source if isinstance(source, list) else [source]
+        images = [self._load(image) for image in images]
+        if iou is None:
+            iou = self.iou_threshold
+
+        # Models exported with a static batch size run one chunk at a time
+        chunk = self.fixed_batch or len(images)
+        results = []
+        for start in range(0, len(images), chunk):
+            chunk_images = images[start:start + chunk]
+            batch, transforms = preprocess(chunk_images, self.input_shape)
+            if self.fixed_batch and len(batch) < self.fixed_batch:
+                padding = np.zeros((self.fixed_batch - len(batch), *batch.shape[1:]), dtype=batch.dtype)
+                batch = np.concatenate([batch, padding])
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+
+            for image, output, (ratio, pad) in zip(chunk_images, outputs, transforms):
+                xyxy, scores, cls = decode_output(output, ratio, pad, image.shape, conf, iou)
+                results.append(ArrayResult(ArrayBoxes(xyxy, scores, cls), self.names, image))
+        return results
@@ -0,0 +1,125 @@
+"""
+Detection post-processing for SIMIS
+Converts ultralytics boxes to our detection schema with one device->host
+copy per tensor instead of one per box.
+"""
+
+import numpy as np
+
+def _to_numpy(values):
+    """Move a torch tensor (or anything array-like) to a NumPy array"""
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+class ArrayBoxes:
+    """NumPy-backed stand-in for ultralytics Boxes"""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.xyxy)
+
+class ArrayResult:
+    """Stand-in for an ultralytics Results object, for detections not produced by ultralytics"""
+
+    def __init__(self, boxes, names, orig_img):
+        self.boxes = boxes
+        self.names = names
+        self.orig_img = orig_img
+
+    def plot(self):
+        """Draw boxes and labels on a copy of the input image"""
+        import cv2
+
+        annotated = self.orig_img.copy()
+        for (x1, y1, x2, y2), conf, cls in zip(self.boxes.xyxy, self.boxes.conf, self.boxes.cls):
+            top_left, bottom_right = (int(x1), int(y1)), (int(x2), int(y2))
+            cv2.rectangle(annotated, top_left, bottom_right, (0, 255, 0), 2)
+            label = f"{self.names[int(cls)]} {conf:.2f}"
+            cv2.putText(annotated, label, (top_left[0], max(top_left[1] - 5, 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
+        return annotated
+
+def boxes_to_xyxy(boxes):
+    """Raw (xyxy, conf, cls) NumPy arrays for a result's boxes"""
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32), np.zeros((0,), dtype=np.float32)
+    return (
+        _to_numpy(boxes.xyxy).astype(np.float32),
+        _to_numpy(boxes.conf).astype(np.float32),
+        _to_numpy(boxes.cls).astype(np.float32)
+    )
+
+def boxes_to_arrays(boxes, offset=(0, 0), scale=(1.0, 1.0)):
+    """
+    Columnar form of a result's boxes.
+
+    Returns a dict of NumPy arrays: bbox (N x 4, x/y/width/height),
+    confidence (N,) and class_id (N,). Boxes are shifted by offset and then
+    multiplied by scale, mapping crop/downscaled coordinates back to the
+    original image.
+    """
+    if boxes is None or len(boxes) == 0:
+        return {
+            "bbox": np.zeros((0, 4), dtype=np.float32),
+            "confidence": np.zeros((0,), dtype=np.float32),
+            "class_id": np.zeros((0,), dtype=np.int64)
+        }
+
+    xyxy = _to_numpy(boxes.xyxy).astype(np.float32, copy=False)
+
+    # Convert (x1, y1, x2, y2) to (x, y, width, height) in one array op
+    bbox = xyxy.copy()
+    bbox[:, 2:] -= xyxy[:, :2]
+
+    if offset != (0, 0) or scale != (1.0, 1.0):
+        bbox[:, :2] += offset
+        bbox *= np.array([scale[0], scale[1], scale[0], scale[1]], dtype=np.float32)
+
+    return {
+        "bbox": bbox,
+        "confidence": _to_numpy(boxes.conf).astype(np.float32, copy=False),
+        "class_id": _to_numpy(boxes.cls).astype(np.int64)
+    }
+
+def arrays_to_detections(arrays, names):
+    """Build the detection dict list from columnar arrays"""
+    # tolist() converts to Python floats/ints in C, avoiding per-element numpy scalars
+    bboxes = arrays["bbox"].tolist()
+    confidences = arrays["confidence"].tolist()
+    class_ids = arrays["class_id"].tolist()
+
+    return [
+        {
+            "class": names[class_id],
+            "confidence": confidence,
+            "bbox": bbox,
+            "class_id": class_id
+        }
+        for bbox, confidence, class_id in zip(bboxes, confidences, class_ids)
+    ]
+
+def extract_detections(result, columnar=False, offset=(0, 0), scale=(1.0, 1.0)):
+    """
+    Convert one ultralytics result into detections.
+
+    Returns the list-of-dicts schema used by our APIs, or the columnar
+    array dict from boxes_to_arrays when columnar=True.
+    """
+    arrays = boxes_to_arrays(result.boxes, offset, scale)
+    if columnar:
+        return arrays
+    return arrays_to_detections(arrays, result.names)
+
+def roi_from_detections(detections):
+    """Union [x, y, width, height] of all detection boxes, or None if there are none"""
+    if not detections:
+        return None
+    bboxes = np.array([detection["bbox"] for detection in detections], dtype=np.float32)
+    x0, y0 = bboxes[:, :2].min(axis=0)
+    x1, y1 = (bboxes[:, :2] + bboxes[:, 2:]).max(axis=0)
+    return [float(x0), float(y0), float(x1 - x0), float(y1 - y0)]
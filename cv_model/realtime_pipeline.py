@@ -0,0 +1,293 @@
+"""
+Pipelined real-time detection for SIMIS
+Capture, inference and render/output run as separate stages connected by
+single-slot queues, so the frame rate is bounded by the slowest stage
+instead of the sum of all of them. When inference falls behind, stale
+frames are dropped rather than queued.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from postprocess import extract_detections, boxes_to_xyxy, ArrayBoxes, ArrayResult
+from tracking import MotionGate, IoUTracker
+
+DEFAULT_MONITOR_REGION = {"top": 100, "left": 100, "width": 1280, "height": 720}
+
+# Passed down the stages when the source ends, so frames already queued are still handled
+END_OF_STREAM = object()
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def put_final(self, item, stop):
+        """Enqueue without dropping anything, waiting for the consumer; gives up once stop is set"""
+        while not stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self, timeout=None):
+        """Raises queue.Empty if nothing arrives within timeout"""
+        return self._queue.get(timeout=timeout)
+
+class StageTimer:
+    """Exponential moving averages of a stage's latency and rate"""
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.latency_ms = 0.0
+        self.fps = 0.0
+        self.count = 0
+        self._last = None
+
+    def record(self, latency_ms):
+        now = time.perf_counter()
+        if self.count == 0:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.alpha * (latency_ms - self.latency_ms)
+
+        if self._last is not None and now > self._last:
+            rate = 1.0 / (now - self._last)
+            self.fps = rate if self.fps == 0 else self.fps + self.alpha * (rate - self.fps)
+        self._last = now
+        self.count += 1
+
+class ScreenSource:
+    """Grabs a screen region with mss"""
+
+    def __init__(self, monitor_region=None):
+        self.monitor_region = monitor_region or DEFAULT_MONITOR_REGION
+        self._sct = None
+
+    def read(self):
+        # mss handles are bound to the thread that creates them, so open lazily in the capture thread
+        if self._sct is None:
+            import mss
+            self._sct = mss.mss()
+        frame = np.asarray(self._sct.grab(self.monitor_region))
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+
+class CameraSource:
+    """Reads frames from a webcam; returns None when the stream ends"""
+
+    def __init__(self, camera_index=0, width=None, height=None):
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self._cap = None
+
+    def read(self):
+        if self._cap is None:
+            self._cap = cv2.VideoCapture(self.camera_index)
+            if self.width and self.height:
+                self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            if not self._cap.isOpened():
+                raise RuntimeError(f"Cannot open webcam (index {self.camera_index})")
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+
+class DetectionPipeline:
+    """
+    Capture thread -> inference thread -> output stage.
+
+    The output stage runs on the calling thread (GUI windows must live on the
+    main thread) and either displays annotated frames or, when headless,
+    writes one JSON line of detections and timing stats per frame.
+
+    With motion_threshold set, frames that barely differ from the last
+    inferred frame reuse its detections. With keyframe_interval > 1, full
+    inference runs on every Nth frame and boxes are tracked in between.
+    Inference is still forced at least every max_skip frames.
+    """
+
+    def __init__(self, model, source, conf_threshold=0.5, headless=False, output=None,
+                 window_name="YOLOv8 Screen Detection", motion_threshold=None,
+                 keyframe_interval=1, max_skip=30):
+        self.model = model
+        self.source = source
+        self.conf_threshold = conf_threshold
+        self.headless = headless
+        self.output = output or sys.stdout
+        self.window_name = window_name
+
+        self.gate = MotionGate(motion_threshold) if motion_threshold is not None else None
+        self.tracker = IoUTracker()
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.max_skip = max_skip
+        self.frame_counts = {"inferred": 0, "tracked": 0, "skipped": 0}
+
+        self.frames = LatestQueue(1)
+        self.results = LatestQueue(1)
+        self.stats = {
+            "capture": StageTimer(),
+            "inference": StageTimer(),
+            "output": StageTimer(),
+            "end_to_end": StageTimer()
+        }
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """Current FPS, per-stage latency and dropped frame counts"""
+        return {
+            "fps": round(self.stats["output"].fps, 1),
+            "latency_ms": {name: round(timer.latency_ms, 2) for name, timer in self.stats.items()},
+            "dropped_frames": self.frames.dropped + self.results.dropped,
+            "frames": dict(self.frame_counts)
+        }
+
+    def _capture_loop(self):
+        frame_id = 0
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                frame = self.source.read()
+                if frame is None:
+                    break
+                self.stats["capture"].record((time.perf_counter() - start) * 1000)
+                self.frames.put((frame_id, start, frame))
+                frame_id += 1
+        except Exception as e:
+            print(f"Capture stopped: {e}", file=sys.stderr)
+        finally:
+            self.source.close()
+            self.frames.put_final(END_OF_STREAM, self._stop)
+
+    def _inference_loop(self):
+        names = None
+        since_keyframe = self.max_skip
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = self.frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is END_OF_STREAM:
+                    break
+                frame_id, captured_at, frame = item
+
+                start = time.perf_counter()
+                changed = self.gate.changed(frame) if self.gate else True
+
+                if names is not None and since_keyframe < self.max_skip and not changed:
+                    # Essentially the same picture: reuse the last boxes as they are
+                    xyxy, conf, cls = self.tracker.predict(self.tracker.updated_at)
+                    result = ArrayResult(ArrayBoxes(xyxy, conf, cls), names, frame)
+                    self.frame_counts["skipped"] += 1
+                elif (names is not None and since_keyframe < self.keyframe_interval - 1
+                      and (len(self.tracker) or not (self.gate and changed))):
+                    # Between keyframes: extrapolate tracked boxes. An empty scene waits for
+                    # the next keyframe too, unless the motion gate sees something change
+                    xyxy, conf, cls = self.tracker.predict(captured_at)
+                    result = ArrayResult(ArrayBoxes(xyxy, conf, cls), names, frame)
+                    self.frame_counts["tracked"] += 1
+                else:
+                    result = self.model(frame, conf=self.conf_threshold, verbose=False)[0]
+                    self.stats["inference"].record((time.perf_counter() - start) * 1000)
+                    self.tracker.update(*boxes_to_xyxy(result.boxes), captured_at)
+                    if self.gate:
+                        self.gate.reset(frame)
+                    names = result.names
+                    self.frame_counts["inferred"] += 1
+                    since_keyframe = -1
+
+                since_keyframe += 1
+                self.results.put((frame_id, captured_at, frame, result))
+        except Exception as e:
+            print(f"Inference stopped: {e}", file=sys.stderr)
+        finally:
+            self.results.put_final(END_OF_STREAM, self._stop)
+
+    def _emit(self, frame_id, frame, result):
+        if self.headless:
+            record = {
+                "frame": frame_id,
+                "timestamp": time.time(),
+                "detections": extract_detections(result),
+                **self.snapshot()
+            }
+            self.output.write(json.dumps(record) + '\n')
+            self.output.flush()
+            return
+
+        annotated = result.plot()
+        stats = self.snapshot()
+        overlay = (f"{stats['fps']:.1f} FPS | inference {stats['latency_ms']['inference']:.0f} ms"
+                   f" | e2e {stats['latency_ms']['end_to_end']:.0f} ms")
+        cv2.putText(annotated, overlay, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2, cv2.LINE_AA)
+        cv2.imshow(self.window_name, annotated)
+
+    def run(self):
+        """Run until the source ends, 'q' is pressed or stop() is called"""
+        threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._inference_loop, daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = self.results.get(timeout=0.05)
+                except queue.Empty:
+                    item = None
+                if item is END_OF_STREAM:
+                    break
+
+                if item is not None:
+                    frame_id, captured_at, frame, result = item
+                    start = time.perf_counter()
+                    self._emit(frame_id, frame, result)
+                    now = time.perf_counter()
+                    self.stats["output"].record((now - start) * 1000)
+                    self.stats["end_to_end"].record((now - captured_at) * 1000)
+
+                # Exit on 'q' (also keeps the window responsive while waiting)
+                if not self.headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=2)
+            if not self.headless:
+                cv2.destroyAllWindows()
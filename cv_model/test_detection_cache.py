@@ -0,0 +1,84 @@
+import base64
+import time
+
+import numpy as np
+import pytest
+
+from detection_cache import DetectionCache, content_hash, perceptual_hash
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for TTL checks"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+@pytest.fixture
+def frame():
+    return np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+
+def test_evicts_least_recently_used():
+    cache = DetectionCache(max_entries=2)
+    cache.put("v1", "a", "A")
+    cache.put("v1", "b", "B")
+    assert cache.get("v1", "a") == "A"
+
+    cache.put("v1", "c", "C")
+
+    assert cache.get("v1", "b") is None
+    assert cache.get("v1", "a") == "A"
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire(clock):
+    cache = DetectionCache(ttl_seconds=30)
+    cache.put("v1", "a", "A")
+
+    clock[0] += 29
+    assert cache.get("v1", "a") == "A"
+    clock[0] += 2
+    assert cache.get("v1", "a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+def test_namespaces_are_isolated():
+    cache = DetectionCache()
+    cache.put(("v1", 0.5), "a", "A")
+
+    assert cache.get(("v1", 0.25), "a") is None
+    assert cache.get(("v2", 0.5), "a") is None
+
+def test_disabled_cache_stores_nothing():
+    cache = DetectionCache(max_entries=0)
+    cache.put("v1", "a", "A")
+
+    assert not cache.enabled
+    assert cache.get("v1", "a") is None
+
+def test_near_duplicate_frames_match(frame):
+    cache = DetectionCache(max_distance=6)
+    cache.put("v1", content_hash(frame), "A", phash=perceptual_hash(frame))
+
+    noisy = np.clip(frame.astype(np.int16) + 2, 0, 255).astype(np.uint8)
+    assert cache.get("v1", content_hash(noisy)) is None
+    assert cache.get_similar("v1", perceptual_hash(noisy)) == "A"
+    assert cache.get_similar("v2", perceptual_hash(noisy)) is None
+
+    different = np.random.default_rng(1).integers(0, 255, frame.shape, dtype=np.uint8)
+    assert cache.get_similar("v1", perceptual_hash(different)) is None
+    assert cache.stats()["near_hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_similar_lookup_needs_max_distance(frame):
+    cache = DetectionCache()
+    cache.put("v1", "a", "A", phash=perceptual_hash(frame))
+
+    assert cache.get_similar("v1", perceptual_hash(frame)) is None
+    assert cache.stats()["misses"] == 1
+
+def test_content_hash_matches_across_input_types():
+    data = b"\x89PNG fake image bytes"
+    encoded = base64.b64encode(data)
+
+    assert content_hash(encoded.decode("ascii")) == content_hash(encoded)
+    assert content_hash(memoryview(data)) == content_hash(data)
+    assert content_hash(np.frombuffer(data, dtype=np.uint8)) == content_hash(data)
@@ -0,0 +1,38 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_ingest import EXIF_ORIENTATION, image_scale, ingest_image
+
+@pytest.fixture
+def rotated_jpeg():
+    """1200x400 JPEG stored sideways with EXIF orientation 6 (displayed as 400x1200)"""
+    image = Image.fromarray(np.random.default_rng(0).integers(0, 255, (400, 1200, 3), dtype=np.uint8))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("max_side", [0, 320])
+def test_exif_rotated_size(rotated_jpeg, max_side):
+    image, original_size, _ = ingest_image(rotated_jpeg, max_side)
+
+    assert original_size == (400, 1200)
+    if max_side:
+        assert max(image.shape[:2]) == max_side
+    scale_x, scale_y = image_scale(image, original_size)
+    assert scale_x == pytest.approx(scale_y, rel=0.02)
+
+def test_downscale_keeps_aspect_ratio():
+    image = Image.new('RGB', (1200, 400), (10, 20, 30))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+
+    decoded, original_size, _ = ingest_image(buffer.getvalue(), 300)
+
+    assert original_size == (1200, 400)
+    assert decoded.shape == (100, 300, 3)
+    assert image_scale(decoded, original_size) == (4.0, 4.0)
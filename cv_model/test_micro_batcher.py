@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from micro_batcher import MicroBatcher, NO_TRANSFORM
+
+class RecordingModel:
+    """run_batch stand-in: 'detects' each image as (image, transform) and records batch sizes"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, images, transforms):
+        with self.lock:
+            self.batches.append(len(images))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [(image, transform) for image, transform in zip(images, transforms)]
+
+def submit_concurrently(batcher, images):
+    with ThreadPoolExecutor(len(images)) as pool:
+        return list(pool.map(batcher.submit, images))
+
+def test_concurrent_requests_share_a_batch():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, window_ms=200)
+
+    results = submit_concurrently(batcher, list(range(4)))
+
+    assert results == [(i, NO_TRANSFORM) for i in range(4)]
+    assert model.batches == [4]
+
+def test_batch_size_is_capped():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=3, window_ms=200)
+
+    results = submit_concurrently(batcher, list(range(7)))
+
+    assert results == [(i, NO_TRANSFORM) for i in range(7)]
+    assert sum(model.batches) == 7
+    assert max(model.batches) <= 3
+
+def test_submit_many_keeps_images_together():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=2, window_ms=0)
+    transforms = [((10, 20), (2.0, 2.0)), NO_TRANSFORM, ((0, 5), (1.0, 1.0))]
+
+    results = batcher.submit_many(["a", "b", "c"], transforms)
+
+    assert results == list(zip(["a", "b", "c"], transforms))
+    assert model.batches == [3]
+
+def test_errors_reach_every_waiter():
+    batcher = MicroBatcher(RecordingModel(fail=True), max_batch_size=8, window_ms=100)
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(batcher.submit, i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(timeout=5)
+
+    # The batcher thread survives a failed batch
+    batcher.run_batch = RecordingModel()
+    assert batcher.submit("next") == ("next", NO_TRANSFORM)
@@ -0,0 +1,99 @@
+import pytest
+
+from model_registry import ModelRegistry, resolve_backend
+
+MB = 1024 * 1024
+
+class FakeTensor:
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+
+    def numel(self):
+        return self.size_bytes // 4
+
+    def element_size(self):
+        return 4
+
+class FakeModel:
+    """Stands in for a loaded YOLO model; the registry sizes it from its parameters"""
+
+    def __init__(self, path, size_mb):
+        self.path = path
+        self.model = self
+        self.size_mb = size_mb
+
+    def parameters(self):
+        return [FakeTensor(self.size_mb * MB)]
+
+class FakeRegistry(ModelRegistry):
+    """Registry that 'loads' models of the sizes given in sizes_mb"""
+
+    def __init__(self, budget_mb, sizes_mb):
+        super().__init__(budget_mb)
+        self.sizes_mb = sizes_mb
+        self.loads = []
+
+    def _load(self, model_path, device, precision, backend):
+        self.loads.append((model_path, device, precision, backend))
+        return FakeModel(model_path, self.sizes_mb[model_path])
+
+def loaded(registry):
+    return [key[0] for key in registry.stats()["models"]]
+
+def test_caches_by_path_device_and_precision():
+    registry = FakeRegistry(100, {"a.pt": 10})
+
+    first = registry.get("a.pt")
+    assert registry.get("a.pt") is first
+    assert registry.get("a.pt", precision="fp16") is not first
+    assert len(registry.loads) == 2
+    assert registry.stats()["hits"] == 1
+
+def test_evicts_least_recently_used_over_budget():
+    registry = FakeRegistry(100, {"a.pt": 40, "b.pt": 40, "c.pt": 40})
+    registry.get("a.pt")
+    registry.get("b.pt")
+    registry.get("a.pt")
+
+    registry.get("c.pt")
+
+    assert loaded(registry) == ["a.pt", "c.pt"]
+    assert registry.stats()["memory_mb"] == 80
+    assert registry.evictions == 1
+
+def test_keeps_newest_model_even_over_budget():
+    registry = FakeRegistry(100, {"a.pt": 40, "huge.pt": 150})
+    registry.get("a.pt")
+
+    registry.get("huge.pt")
+
+    assert loaded(registry) == ["huge.pt"]
+
+def test_unlimited_budget_never_evicts():
+    registry = FakeRegistry(0, {"a.pt": 400, "b.pt": 400})
+    registry.get("a.pt")
+    registry.get("b.pt")
+
+    assert loaded(registry) == ["a.pt", "b.pt"]
+
+def test_size_falls_back_to_weights_file(tmp_path):
+    weights = tmp_path / "detector.onnx"
+    weights.write_bytes(bytes(3 * MB))
+
+    class FileRegistry(ModelRegistry):
+        def _load(self, model_path, device, precision, backend):
+            return object()
+
+    registry = FileRegistry(100)
+    registry.get(str(weights))
+
+    assert registry.stats()["memory_mb"] == 3
+
+@pytest.mark.parametrize("path, backend, expected", [
+    ("models/best.pt", "auto", ("models/best.pt", "torch")),
+    ("models/best.onnx", "auto", ("models/best.onnx", "onnx")),
+    ("models/best.pt", "onnx", ("models/best.onnx", "onnx")),
+    ("models/best.pt", "torch", ("models/best.pt", "torch")),
+])
+def test_resolve_backend(path, backend, expected):
+    assert resolve_backend(path, backend) == expected
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from postprocess import ArrayBoxes, ArrayResult, extract_detections, roi_from_detections
+
+NAMES = {0: "thermometer_display", 1: "thermometer_button"}
+
+@pytest.fixture
+def result():
+    boxes = ArrayBoxes(
+        xyxy=np.array([[10, 20, 110, 70], [5, 5, 25, 45]], dtype=np.float32),
+        conf=np.array([0.9, 0.4], dtype=np.float32),
+        cls=np.array([0, 1], dtype=np.float32)
+    )
+    return ArrayResult(boxes, NAMES, np.zeros((100, 200, 3), dtype=np.uint8))
+
+def test_detections_schema(result):
+    detections = extract_detections(result)
+
+    assert detections == [
+        {"class": "thermometer_display", "confidence": pytest.approx(0.9), "bbox": [10.0, 20.0, 100.0, 50.0], "class_id": 0},
+        {"class": "thermometer_button", "confidence": pytest.approx(0.4), "bbox": [5.0, 5.0, 20.0, 40.0], "class_id": 1},
+    ]
+    # Plain Python numbers, so the result serializes as JSON
+    assert type(detections[0]["confidence"]) is float
+    assert type(detections[0]["class_id"]) is int
+
+def test_offset_then_scale(result):
+    arrays = extract_detections(result, columnar=True, offset=(100, 50), scale=(2.0, 0.5))
+
+    np.testing.assert_allclose(arrays["bbox"][0], [220.0, 35.0, 200.0, 25.0])
+    assert arrays["class_id"].dtype == np.int64
+
+def test_no_boxes():
+    empty = ArrayResult(ArrayBoxes(np.zeros((0, 4)), np.zeros(0), np.zeros(0)), NAMES, None)
+
+    assert extract_detections(empty) == []
+    assert extract_detections(empty, columnar=True)["bbox"].shape == (0, 4)
+    assert extract_detections(ArrayResult(None, NAMES, None)) == []
+
+def test_roi_from_detections(result):
+    assert roi_from_detections(extract_detections(result)) == [5.0, 5.0, 105.0, 65.0]
+    assert roi_from_detections([]) is None
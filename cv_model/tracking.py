@@ -0,0 +1,94 @@
+"""
+Change detection and box tracking for SIMIS real-time detection
+MotionGate decides when a frame is unchanged enough to reuse the last
+detections, and IoUTracker carries boxes forward between keyframes with a
+constant-velocity model so full inference only runs every few frames.
+"""
+
+import cv2
+import numpy as np
+
+class MotionGate:
+    """Cheap change detector comparing tiny grayscale thumbnails"""
+
+    def __init__(self, threshold=4.0, size=(64, 36)):
+        self.threshold = threshold
+        self.size = size
+        self._reference = None
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def changed(self, frame):
+        """Mean absolute difference from the reference frame exceeds the threshold"""
+        if self._reference is None:
+            return True
+        return np.abs(self._thumbnail(frame) - self._reference).mean() > self.threshold
+
+    def reset(self, frame):
+        """Make frame the new reference (call after running inference on it)"""
+        self._reference = self._thumbnail(frame)
+
+def box_iou_matrix(a, b):
+    """Pairwise IoU between two sets of xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+class IoUTracker:
+    """
+    Matches keyframe detections to existing tracks by IoU (same class only)
+    and extrapolates each track with a smoothed constant velocity in between.
+    """
+
+    def __init__(self, iou_threshold=0.3, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.smoothing = smoothing
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.conf = np.zeros((0,), dtype=np.float32)
+        self.cls = np.zeros((0,), dtype=np.float32)
+        self.updated_at = 0.0
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def update(self, xyxy, conf, cls, timestamp):
+        """Replace tracks with keyframe detections, inheriting velocity from matched tracks"""
+        velocity = np.zeros_like(xyxy)
+        elapsed = timestamp - self.updated_at
+
+        if len(self.boxes) and len(xyxy) and elapsed > 0:
+            predicted = self.boxes + self.velocity * elapsed
+            iou = box_iou_matrix(xyxy, predicted)
+            iou[cls[:, None] != self.cls[None, :]] = 0
+
+            # Greedy matching, best overlaps first
+            used_dets, used_tracks = set(), set()
+            for det, track in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[det, track] < self.iou_threshold:
+                    break
+                if det in used_dets or track in used_tracks:
+                    continue
+                used_dets.add(det)
+                used_tracks.add(track)
+                observed = (xyxy[det] - self.boxes[track]) / elapsed
+                velocity[det] = self.smoothing * observed + (1 - self.smoothing) * self.velocity[track]
+
+        # Detections are authoritative on keyframes: unmatched tracks are dropped
+        self.boxes = xyxy.astype(np.float32)
+        self.velocity = velocity.astype(np.float32)
+        self.conf = conf.astype(np.float32)
+        self.cls = cls.astype(np.float32)
+        self.updated_at = timestamp
+
+    def predict(self, timestamp):
+        """Extrapolated (xyxy, conf, cls) at timestamp"""
+        boxes = self.boxes + self.velocity * (timestamp - self.updated_at)
+        return boxes, self.conf, self.cls
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 """
-Script to update the Hugging Face Space with the corrected app.py
+Script to update the Hugging Face Space with the corrected app.py and its modules
 """
 
 import os
 from huggingface_hub import HfApi
 from pathlib import Path
 
+# Python files the Gradio app needs at runtime
+SPACE_FILES = ["app.py", "model_registry.py", "postprocess.py", "image_ingest.py", "onnx_backend.py", "detection_cache.py"]
+
 def update_space():
     # Configuration
     space_name = "simisai-cv-model"
@@ -19,14 +22,15 @@ def update_space():
         
         print(f"Updating Space: {space_id}")
         
-        # Upload the updated app.py
-        print("Uploading updated app.py...")
-        api.upload_file(
-            path_or_fileobj="app.py",
-            path_in_repo="app.py",
-            repo_id=space_id,
-            repo_type="space"
-        )
+        # Upload the updated app.py and the modules it imports
+        for filename in SPACE_FILES:
+            print(f"Uploading updated {filename}...")
+            api.upload_file(
+                path_or_fileobj=filename,
+                path_in_repo=filename,
+                repo_id=space_id,
+                repo_type="space"
+            )
         
         print("✅ Space updated successfully!")
         print(f"🌐 Your Space will rebuild automatically")
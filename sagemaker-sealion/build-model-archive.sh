@@ -0,0 +1,55 @@
+#!/bin/bash
+
+# Build the TorchServe model archive (.mar) for the SEA-LION endpoint.
+# The handler imports its sibling modules and reads the pre-generated
+# guidance from the model directory, so both are packaged as extra files
+# next to the GGUF model.
+#
+# Usage: ./build-model-archive.sh path/to/model.gguf [export-dir] [version]
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+CONTAINER_DIR="$SCRIPT_DIR/container"
+REPO_DIR="$(dirname "$SCRIPT_DIR")"
+
+MODEL_FILE="$1"
+EXPORT_DIR="${2:-$SCRIPT_DIR/model-store}"
+VERSION="${3:-1.2}"
+
+if [ -z "$MODEL_FILE" ] || [ ! -f "$MODEL_FILE" ]; then
+    echo "Usage: $0 path/to/model.gguf [export-dir] [version]"
+    exit 1
+fi
+
+if ! command -v torch-model-archiver &> /dev/null; then
+    echo "torch-model-archiver not found (pip install torch-model-archiver)"
+    exit 1
+fi
+
+# Modules imported by torchserve_handler.py
+EXTRA_FILES="$CONTAINER_DIR/generation.py,$CONTAINER_DIR/completion_cache.py,$CONTAINER_DIR/guidance_index.py"
+
+# Pre-generated guidance (guidance_index.CONTENT_FILES), read from the model directory
+for content in phase1-content.json phase2-content.json; do
+    if [ ! -f "$REPO_DIR/$content" ]; then
+        echo "Missing guidance content: $REPO_DIR/$content"
+        exit 1
+    fi
+    EXTRA_FILES="$EXTRA_FILES,$REPO_DIR/$content"
+done
+
+EXTRA_FILES="$EXTRA_FILES,$MODEL_FILE"
+
+mkdir -p "$EXPORT_DIR"
+echo "Building sealion.mar (version $VERSION) in $EXPORT_DIR..."
+torch-model-archiver \
+    --model-name sealion \
+    --version "$VERSION" \
+    --handler "$CONTAINER_DIR/torchserve_handler.py" \
+    --extra-files "$EXTRA_FILES" \
+    --requirements-file "$CONTAINER_DIR/torchserve_requirements.txt" \
+    --export-path "$EXPORT_DIR" \
+    --force
+
+echo "Done: $EXPORT_DIR/sealion.mar"
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Measure time-to-first-token with and without the system-prompt KV cache
+Runs the same set of questions through a GGUF model twice: once relying on
+llama.cpp's own reuse of the longest common prefix with the previous prompt
+(the baseline the handlers would have without the cache) and once through
+PrefixStateCache. Any small chat GGUF works, e.g. a Q4 TinyLlama or
+Qwen2-0.5B build.
+
+Usage:
+    python benchmark_prefix_cache.py --model models/qwen2-0_5b-instruct-q4_k_m.gguf
+"""
+
+import argparse
+import statistics
+
+from llama_cpp import Llama
+
+from generation import GenerationStats, PrefixStateCache, format_prompt, split_system_prefix, stream_completion, tokenize_prompt
+
+QUESTIONS = [
+    "How do I put on a blood pressure cuff?",
+    "My thermometer shows Lo, what does that mean?",
+    "Bagaimana cara memakai manset tekanan darah?",
+    "How long should I wait between two readings?",
+    "The glucose meter says E-3, what should I do?",
+    "Can I measure blood pressure right after exercise?"
+]
+
+def run(llm, prompts, prefix_cache, max_tokens):
+    ttfts = []
+    for prompt in prompts:
+        stats = GenerationStats()
+        for _ in stream_completion(llm, prompt, stats, prefix_cache, max_tokens=max_tokens, temperature=0):
+            pass
+        ttfts.append(stats.as_dict()["ttft_ms"])
+    return ttfts
+
+def main():
+    parser = argparse.ArgumentParser(description='System prompt KV cache TTFT benchmark')
+    parser.add_argument('--model', required=True, help='Path to a GGUF model')
+    parser.add_argument('--max-tokens', type=int, default=8, help='Tokens generated per request')
+    parser.add_argument('--threads', type=int, default=4, help='llama.cpp threads')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over the question set')
+    args = parser.parse_args()
+    
+    llm = Llama(model_path=args.model, n_ctx=2048, n_threads=args.threads, verbose=False)
+    prompts = [format_prompt(question) for question in QUESTIONS] * args.rounds
+    prefix_cache = PrefixStateCache(llm)
+    
+    # Warm up, then measure both modes on the same prompts
+    run(llm, prompts[:1], None, args.max_tokens)
+    results = {
+        "llama.cpp reuse": run(llm, prompts, None, args.max_tokens),
+        "prefix cache": run(llm, prompts, prefix_cache, args.max_tokens)
+    }
+    
+    prefix_tokens = len(tokenize_prompt(llm, split_system_prefix(format_prompt(""))))
+    print(f"System prefix: {prefix_tokens} tokens, {len(prompts)} requests per mode")
+    for name, ttfts in results.items():
+        print(f"{name:>15}: TTFT mean {statistics.mean(ttfts):7.1f} ms | "
+              f"median {statistics.median(ttfts):7.1f} ms")
+    print(f"Prefix cache: {prefix_cache.stats()}")
+
+if __name__ == '__main__':
+    main()
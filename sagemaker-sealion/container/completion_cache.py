@@ -0,0 +1,169 @@
+"""
+Exact-match completion cache for the SEA-LION handlers
+Chat traffic repeats the same device questions, so identical requests are
+answered from a memory LRU (and optionally an on-disk tier that survives
+restarts) instead of regenerating on CPU. Keys cover the normalized prompt,
+the sampling parameters and a fingerprint of the model file. Only
+deterministic requests (temperature 0) or requests that opt in are cached.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Bytes hashed from each end of the model file; GGUF metadata and tensor
+# layout live at the start, so this tells builds apart without reading 16 GB
+FINGERPRINT_CHUNK = 1024 * 1024
+
+# The disk tier may grow this fraction past max_disk_entries before it is trimmed
+DISK_TRIM_SLACK = 0.1
+
+def model_fingerprint(model_path):
+    """Cheap identity of a model file: size, mtime and hashes of both ends"""
+    stat = os.stat(model_path)
+    digest = hashlib.sha256(f"{stat.st_size}:{int(stat.st_mtime)}".encode())
+    with open(model_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if stat.st_size > 2 * FINGERPRINT_CHUNK:
+            f.seek(-FINGERPRINT_CHUNK, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()[:16]
+
+def normalize_prompt(prompt):
+    """Collapse whitespace runs so trivially different prompts share an entry"""
+    return re.sub(r'[ \t]+', ' ', prompt.replace('\r\n', '\n')).strip()
+
+def should_cache(temperature, requested=None):
+    """Cache deterministic requests by default; the client's 'cache' flag overrides"""
+    if requested is not None:
+        if isinstance(requested, str):
+            return requested.strip().lower() in ('1', 'true', 'yes', 'on')
+        return bool(requested)
+    # No temperature means the handler's sampling default, which is never 0
+    if temperature is None:
+        return False
+    return float(temperature) == 0.0
+
+class CompletionCache:
+    """LRU + TTL memory cache with an optional SQLite tier on disk"""
+
+    def __init__(self, fingerprint, max_entries=512, ttl_seconds=86400,
+                 disk_path=None, max_disk_entries=10000):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._disk_high_water = max_disk_entries + max(1, int(max_disk_entries * DISK_TRIM_SLACK))
+        self._disk_rows = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS completions "
+                             "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._trim_disk()
+            self._db.commit()
+
+    def key(self, prompt, **params):
+        """Cache key for a prompt and its sampling parameters"""
+        material = json.dumps({
+            "model": self.fingerprint,
+            "prompt": normalize_prompt(prompt),
+            "params": params
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Cached value or None; disk hits are promoted to memory"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM completions WHERE key = ?",
+                                       (key,)).fetchone()
+                if row is not None and row[1] > time.time():
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+                                 (key, json.dumps(value), expires_at))
+                # Over-counts replaced rows, which only brings the next trim forward
+                self._disk_rows += 1
+                if self._disk_rows > self._disk_high_water:
+                    self._trim_disk()
+                self._db.commit()
+
+    def _trim_disk(self):
+        """Drop expired rows, then the oldest ones beyond max_disk_entries"""
+        self._db.execute("DELETE FROM completions WHERE expires_at < ?", (time.time(),))
+        self._db.execute("DELETE FROM completions WHERE key NOT IN "
+                         "(SELECT key FROM completions ORDER BY expires_at DESC LIMIT ?)",
+                         (self.max_disk_entries,))
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk": self._db is not None
+            }
+
+def completion_cache_from_env(model_path):
+    """Build the cache from COMPLETION_CACHE_* settings (None when disabled)"""
+    max_entries = int(os.environ.get('COMPLETION_CACHE_SIZE', '512'))
+    if max_entries <= 0:
+        return None
+    cache = CompletionCache(
+        model_fingerprint(model_path),
+        max_entries=max_entries,
+        ttl_seconds=float(os.environ.get('COMPLETION_CACHE_TTL', '86400')),
+        disk_path=os.environ.get('COMPLETION_CACHE_DB') or None,
+        max_disk_entries=int(os.environ.get('COMPLETION_CACHE_DISK_SIZE', '10000'))
+    )
+    logger.info(f"Completion cache enabled for model {cache.fingerprint}: {cache.stats()}")
+    return cache
@@ -0,0 +1,179 @@
+"""
+Shared generation helpers for the SEA-LION llama.cpp handlers
+Keeps the evaluated KV state of shared prompt prefixes (system prompts) so
+each request only evaluates its own tokens, and times generation so every
+response can report time-to-first-token and tokens/sec.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are SEA-LION, an advanced AI assistant specialized in medical device troubleshooting and ASEAN language support. Provide helpful, accurate, and concise responses."
+
+STOP_TOKENS = ["</s>", "<|end_of_text|>"]
+
+# End of the first (system) turn in the chat templates we serve
+SYSTEM_TURN_ENDINGS = ("<|im_end|>\n", "<end_of_turn>\n")
+
+def format_prompt(user_input, system_prompt=SYSTEM_PROMPT):
+    """Format the user input into a SEA-LION chat prompt"""
+    return f"""<|im_start|>system
+{system_prompt}
+<|im_end|>
+<|im_start|>user
+{user_input}
+<|im_end|>
+<|im_start|>assistant
+"""
+
+def split_system_prefix(prompt):
+    """The leading system turn of a prompt, or None if it doesn't start with one"""
+    if not prompt.startswith(("<|im_start|>system", "<start_of_turn>system")):
+        return None
+    for ending in SYSTEM_TURN_ENDINGS:
+        index = prompt.find(ending)
+        if index != -1:
+            return prompt[:index + len(ending)]
+    return None
+
+def tokenize_prompt(llm, text):
+    """Tokenize text the way llama.cpp completions do, so prefix tokens line up with the prompt's"""
+    try:
+        return llm.tokenize(text.encode('utf-8'), special=True)
+    except TypeError:
+        # Builds without the special flag don't parse special tokens in completions either
+        return llm.tokenize(text.encode('utf-8'))
+
+class PrefixStateCache:
+    """
+    LRU of saved llama.cpp states, one per system prompt.
+
+    On a hit the saved state is loaded so the model context already holds the
+    prefix, and llama.cpp only evaluates the rest of the prompt. On a miss the
+    prefix is evaluated once and its state saved for later requests. When the
+    live context already starts with the prefix, llama.cpp's own prefix reuse
+    covers it (and may keep more of the last prompt), so nothing is loaded.
+    """
+
+    def __init__(self, llm, max_states=4):
+        self.llm = llm
+        self.max_states = max_states
+        self._states = OrderedDict()  # prefix text -> (tokens, LlamaState)
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, prefix):
+        """Evaluate a prefix and keep its state; returns its token count"""
+        tokens = tokenize_prompt(self.llm, prefix)
+        self.llm.reset()
+        self.llm.eval(tokens)
+        self._states[prefix] = (tokens, self.llm.save_state())
+        self._states.move_to_end(prefix)
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
+        return len(tokens)
+
+    def prepare(self, prompt):
+        """Put the model context at the state of prompt's system prefix; returns tokens reused"""
+        prefix = split_system_prefix(prompt)
+        if prefix is None:
+            return 0
+
+        entry = self._states.get(prefix)
+        if entry is None:
+            self.misses += 1
+            self.register(prefix)
+            return 0
+
+        self.hits += 1
+        self._states.move_to_end(prefix)
+        tokens, state = entry
+        if not self._live_prefix(tokens):
+            self.llm.load_state(state)
+        return len(tokens)
+
+    def _live_prefix(self, tokens):
+        """Whether the evaluated context already starts with tokens"""
+        return self.llm.n_tokens >= len(tokens) and list(self.llm.input_ids[:len(tokens)]) == tokens
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "prefixes": len(self._states),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class GenerationStats:
+    """Time-to-first-token and decode throughput of one generation"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.completion_tokens = 0
+        self.prefix_tokens_reused = 0
+
+    def token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.completion_tokens += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def as_dict(self):
+        end = self.finished_at or time.perf_counter()
+        ttft = (self.first_token_at - self.started) if self.first_token_at else None
+        decode_seconds = end - self.first_token_at if self.first_token_at else 0
+        return {
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "total_ms": round((end - self.started) * 1000, 1),
+            "completion_tokens": self.completion_tokens,
+            # The first token comes out of prompt evaluation, so it isn't part of the decode rate
+            "tokens_per_second": round((self.completion_tokens - 1) / decode_seconds, 2)
+            if decode_seconds > 0 and self.completion_tokens > 1 else None,
+            "prefix_tokens_reused": self.prefix_tokens_reused
+        }
+
+def stream_completion(llm, prompt, stats, prefix_cache=None, check=None, **kwargs):
+    """
+    Yield (text, finish_reason) chunks as llama.cpp produces them, recording
+    timings in stats. finish_reason is None until the last chunk. check(), if
+    given, runs before each token and may raise to abort the generation.
+    """
+    if prefix_cache is not None:
+        stats.prefix_tokens_reused = prefix_cache.prepare(prompt)
+
+    kwargs.setdefault("stop", STOP_TOKENS)
+    try:
+        for chunk in llm(prompt, stream=True, echo=False, **kwargs):
+            if check is not None:
+                check()
+            choice = chunk['choices'][0]
+            if choice['text']:
+                stats.token()
+            yield choice['text'], choice.get('finish_reason')
+    finally:
+        stats.finish()
+
+def complete(llm, prompt, prefix_cache=None, check=None, **kwargs):
+    """Run a full completion; returns (text, finish_reason, stats)"""
+    stats = GenerationStats()
+    parts = []
+    finish_reason = "stop"
+    for text, reason in stream_completion(llm, prompt, stats, prefix_cache, check, **kwargs):
+        parts.append(text)
+        finish_reason = reason or finish_reason
+
+    log_stats(stats)
+    return ''.join(parts), finish_reason, stats
+
+def log_stats(stats):
+    metrics = stats.as_dict()
+    logger.info(f"Generated {metrics['completion_tokens']} tokens: TTFT {metrics['ttft_ms']} ms, "
+                f"{metrics['tokens_per_second']} tok/s, {metrics['prefix_tokens_reused']} prefix tokens reused")
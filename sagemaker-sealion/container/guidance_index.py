@@ -0,0 +1,184 @@
+"""
+Pre-generated guidance lookup for the SEA-LION handlers
+phase1-content.json / phase2-content.json hold step-by-step device guidance
+keyed by device, language, style and step. They are loaded once into an
+in-memory index so structured guidance requests are answered with a dict
+lookup; only misses fall through to generation, and those are logged so
+they can be pre-generated later.
+
+The content files are read from GUIDANCE_CONTENT_PATHS (comma-separated)
+or, when that is unset, from the model directory, where
+build-model-archive.sh packages them next to the GGUF file.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = "en"
+DEFAULT_STYLE = "direct"
+
+# Entry fields kept in the index, stored as tuples in this order
+FIELDS = (
+    "device_name", "step_name", "step_title", "step_description",
+    "step_instructions", "step_warnings", "step_tips", "generation_quality_score"
+)
+
+# Content files looked up in the model directory; later files override earlier ones
+CONTENT_FILES = ("phase1-content.json", "phase2-content.json")
+
+LANGUAGE_NAMES = {
+    "en": "English", "id": "Indonesian", "th": "Thai", "ms": "Malay",
+    "vi": "Vietnamese", "fil": "Filipino", "zh": "Chinese", "my": "Burmese", "km": "Khmer", "lo": "Lao"
+}
+
+def _intern(value):
+    return sys.intern(str(value).strip().lower())
+
+def guidance_key(device_key, step_number, language_code=DEFAULT_LANGUAGE, style_key=DEFAULT_STYLE):
+    """Normalized index key: (device_key, language_code, style_key, step_number)"""
+    return (_intern(device_key), _intern(language_code or DEFAULT_LANGUAGE),
+            _intern(style_key or DEFAULT_STYLE), int(step_number))
+
+def guidance_request(body):
+    """Index key for a structured guidance request body, or None for free-form prompts"""
+    if not isinstance(body, dict) or "device_key" not in body or "step_number" not in body:
+        return None
+    try:
+        return guidance_key(body["device_key"], body["step_number"],
+                            body.get("language_code"), body.get("style_key"))
+    except (TypeError, ValueError):
+        return None
+
+def guidance_prompt(key):
+    """User prompt asking the model for a guidance step that isn't pre-generated"""
+    device_key, language_code, style_key, step_number = key
+    device = device_key.replace('_', ' ')
+    language = LANGUAGE_NAMES.get(language_code, language_code)
+    return (f"Give step {step_number} of the instructions for using a {device}, in {language}, "
+            f"in a {style_key} style. Include the step title, instructions, warnings and tips.")
+
+def render_guidance(entry):
+    """Plain-text answer for a guidance entry"""
+    parts = [entry["step_title"], entry["step_instructions"]]
+    if entry.get("step_warnings"):
+        parts.append(f"Warning: {entry['step_warnings']}")
+    if entry.get("step_tips"):
+        parts.append(f"Tip: {entry['step_tips']}")
+    return "\n\n".join(p for p in parts if p)
+
+class GuidanceIndex:
+    """
+    Immutable map from guidance key to entry.
+
+    Later files override earlier ones, so phase2 content supersedes phase1
+    for the same key. Misses are counted per key and, with miss_log set,
+    appended to a JSONL file for the pre-generation job.
+    """
+
+    def __init__(self, entries=(), miss_log=None):
+        self._entries = {}
+        self._steps = {}  # (device, language, style) -> number of steps
+        self.miss_log = miss_log
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.missed_keys = Counter()
+        for entry in entries:
+            self.add(entry)
+
+    @classmethod
+    def from_files(cls, paths, miss_log=None):
+        index = cls(miss_log=miss_log)
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+            for entry in entries:
+                index.add(entry)
+            logger.info(f"Loaded {len(entries)} guidance entries from {path}")
+        return index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        key = guidance_key(entry["device_key"], entry["step_number"],
+                           entry.get("language_code"), entry.get("style_key"))
+        self._entries[key] = tuple(entry.get(field) for field in FIELDS)
+        series = key[:3]
+        self._steps[series] = max(self._steps.get(series, 0), key[3])
+
+    def get(self, key):
+        """Entry dict for a key, or None (misses are recorded)"""
+        values = self._entries.get(key)
+        if values is None:
+            self._record_miss(key)
+            return None
+        self.hits += 1
+        device_key, language_code, style_key, step_number = key
+        return {
+            "device_key": device_key,
+            "language_code": language_code,
+            "style_key": style_key,
+            "step_number": step_number,
+            "total_steps": self._steps[key[:3]],
+            **dict(zip(FIELDS, values))
+        }
+
+    def lookup(self, device_key, step_number, language_code=DEFAULT_LANGUAGE, style_key=DEFAULT_STYLE):
+        return self.get(guidance_key(device_key, step_number, language_code, style_key))
+
+    def _record_miss(self, key):
+        with self._lock:
+            self.misses += 1
+            self.missed_keys[key] += 1
+            first = self.missed_keys[key] == 1
+            if self.miss_log:
+                with open(self.miss_log, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({
+                        "device_key": key[0], "language_code": key[1], "style_key": key[2],
+                        "step_number": key[3], "missed_at": time.time()
+                    }) + "\n")
+        if first:
+            logger.info(f"Guidance miss (not pre-generated): {key}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "top_misses": [
+                {"key": list(key), "count": count} for key, count in self.missed_keys.most_common(10)
+            ]
+        }
+
+def guidance_index_from_env(model_dir=None):
+    """
+    Build the index from GUIDANCE_CONTENT_PATHS, or from CONTENT_FILES in
+    model_dir when it is unset. Returns None (with a warning) when there is
+    no content; configured paths that don't exist raise FileNotFoundError.
+    """
+    configured = os.environ.get('GUIDANCE_CONTENT_PATHS')
+    if configured:
+        paths = [p for p in configured.split(',') if p]
+        missing = [p for p in paths if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"GUIDANCE_CONTENT_PATHS files not found: {', '.join(missing)}")
+    else:
+        candidates = [os.path.join(model_dir, name) for name in CONTENT_FILES] if model_dir else []
+        paths = [p for p in candidates if os.path.exists(p)]
+    if not paths:
+        logger.warning(f"No guidance content (GUIDANCE_CONTENT_PATHS unset, none of {CONTENT_FILES} "
+                       f"in {model_dir}); every guidance request goes to the model")
+        return None
+    index = GuidanceIndex.from_files(paths, miss_log=os.environ.get('GUIDANCE_MISS_LOG') or None)
+    logger.info(f"Guidance index ready: {len(index)} entries")
+    return index
@@ -8,20 +8,29 @@ import json
 import logging
 from llama_cpp import Llama
 
+from completion_cache import completion_cache_from_env, should_cache
+from generation import PrefixStateCache, complete, format_prompt
+from guidance_index import guidance_index_from_env, guidance_prompt, guidance_request, render_guidance
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global model instance
+# Global model instance, its system-prompt KV cache, the completion cache
+# and the index of pre-generated guidance
 llm = None
+prefix_cache = None
+completion_cache = None
+guidance = None
 
 def model_fn(model_dir):
     """
     Load the model for inference
     This function is called once when the container starts
     """
-    global llm
+    global llm, prefix_cache, completion_cache, guidance
     
+    guidance = guidance_index_from_env(model_dir)
     logger.info(f"Loading model from {model_dir}")
     
     # Find the GGUF model file
@@ -39,6 +48,8 @@ def model_fn(model_dir):
         n_threads=os.cpu_count(),  # Use all available CPU cores
         verbose=False
     )
+    prefix_cache = PrefixStateCache(llm)
+    completion_cache = completion_cache_from_env(model_path)
     
     logger.info("Model loaded successfully")
     return llm
@@ -63,27 +74,59 @@ def predict_fn(input_data, model):
     global llm
     
     try:
+        # Structured guidance requests are answered from pre-generated content when possible
+        key = guidance_request(input_data)
+        if key is not None and guidance is not None:
+            entry = guidance.get(key)
+            if entry is not None:
+                return {
+                    "prompt": "",
+                    "choices": [{"text": render_guidance(entry), "finish_reason": "stop"}],
+                    "metrics": {"guidance": "hit"}
+                }
+        
         # Extract parameters from input
         prompt = input_data.get('prompt', '')
+        if not prompt and key is not None:
+            prompt = format_prompt(guidance_prompt(key))
         max_tokens = input_data.get('max_tokens', 400)
         temperature = input_data.get('temperature', 0.2)
         
         if not prompt:
             raise ValueError('No prompt provided')
         
+        # Repeated deterministic (or opted-in) requests are answered from the completion cache
+        cache_key = None
+        if completion_cache is not None and should_cache(temperature, input_data.get('cache')):
+            cache_key = completion_cache.key(prompt, max_tokens=max_tokens, temperature=temperature)
+            cached = completion_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Completion cache hit for prompt: {prompt[:100]}...")
+                return {
+                    "prompt": prompt,
+                    "choices": [{"text": cached["text"], "finish_reason": cached["finish_reason"]}],
+                    "metrics": {"cache": "hit", "cache_stats": completion_cache.stats()}
+                }
+        
         logger.info(f"Generating response for prompt: {prompt[:100]}...")
         
-        # Generate response using llama-cpp-python
-        response = llm(
+        # Generate response, reusing the cached KV state of the system prompt
+        text, finish_reason, stats = complete(
+            llm,
             prompt,
+            prefix_cache=prefix_cache,
             max_tokens=max_tokens,
-            temperature=temperature,
-            stop=["</s>", "<|end_of_text|>"],
-            echo=False
+            temperature=temperature
         )
+        if cache_key is not None:
+            completion_cache.put(cache_key, {"text": text, "finish_reason": finish_reason})
         
         logger.info("Response generated successfully")
-        return response
+        return {
+            "prompt": prompt,
+            "choices": [{"text": text, "finish_reason": finish_reason}],
+            "metrics": {**stats.as_dict(), "cache": "miss" if cache_key else "bypass"}
+        }
         
     except Exception as e:
         logger.error(f"Error during inference: {str(e)}")
@@ -100,13 +143,14 @@ def output_fn(prediction, content_type):
                 "message": {
                     "content": prediction['choices'][0]['text'].strip()
                 },
-                "finish_reason": "stop"
+                "finish_reason": prediction['choices'][0].get('finish_reason', 'stop')
             }],
             "usage": {
                 "prompt_tokens": len(prediction.get('prompt', '').split()),
                 "completion_tokens": len(prediction['choices'][0]['text'].split()),
                 "total_tokens": len(prediction.get('prompt', '').split()) + len(prediction['choices'][0]['text'].split())
-            }
+            },
+            "metrics": prediction.get('metrics', {})
         }
         
         return json.dumps(result)
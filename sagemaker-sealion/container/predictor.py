@@ -3,9 +3,16 @@
 import os
 import json
 import logging
-from flask import Flask, request
+import threading
+import time
+from flask import Flask, Response, request
 from llama_cpp import Llama
 
+from completion_cache import completion_cache_from_env, should_cache
+from generation import GenerationStats, PrefixStateCache, complete, format_prompt, log_stats, stream_completion
+from guidance_index import guidance_index_from_env, guidance_prompt, guidance_request, render_guidance
+from scheduler import ModelScheduler, QueueFull, DeadlineExceeded
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,42 +20,199 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 
-# Global model instance
+# Global model instance, its system-prompt KV cache and the completion cache
 llm = None
+prefix_cache = None
+completion_cache = None
+
+MODEL_PATH = os.environ.get('MODEL_PATH', "/opt/program/model/Gemma-SEA-LION-v4-27B-IT-Q4_K_M.gguf")
+
+# Pre-generated guidance is small and loads instantly, so it can answer
+# structured requests even while the model is still loading
+guidance = guidance_index_from_env(os.path.dirname(MODEL_PATH))
+
+# Model lifecycle (loading -> ready | failed) and startup timings
+model_status = {"state": "loading", "error": None, "timings": {}}
+_load_lock = threading.Lock()
+_loader = None
+
+# All generations run on the scheduler's model thread; HTTP threads only queue work
+scheduler = ModelScheduler(
+    max_queue=int(os.environ.get('SCHEDULER_MAX_QUEUE', '8')),
+    short_threshold=int(os.environ.get('SCHEDULER_SHORT_TOKENS', '600')),
+    short_burst=int(os.environ.get('SCHEDULER_SHORT_BURST', '3'))
+)
+
+# Default and maximum per-request deadline, kept under gunicorn's worker timeout
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT_SECONDS', '240'))
 
 def load_model():
-    """Load the GGUF model"""
-    global llm
-    
-    model_path = "/opt/program/model/Gemma-SEA-LION-v4-27B-IT-Q4_K_M.gguf"
+    """Load the GGUF model and warm it up; returns startup timings in ms"""
+    global llm, prefix_cache, completion_cache
     
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model file not found at {model_path}")
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
     
-    logger.info(f"Loading model from {model_path}")
+    logger.info(f"Loading model from {MODEL_PATH} ({os.path.getsize(MODEL_PATH) / 1024 ** 3:.1f} GB)")
+    timings = {}
     
-    # Initialize the model with CPU-optimized settings
-    llm = Llama(
-        model_path=model_path,
+    # Initialize the model with CPU-optimized settings. The weights are
+    # mmap'd, so this mostly maps the file and reads its metadata.
+    start = time.perf_counter()
+    model = Llama(
+        model_path=MODEL_PATH,
         n_ctx=2048,  # Context length
         n_threads=os.cpu_count(),  # Use all available CPU cores
         verbose=False
     )
+    timings["mmap_load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    cache = PrefixStateCache(model)
     
+    # Warm-up generation touches every layer, paging the mmap'd weights in
+    # before the first real request has to wait for the disk
+    _, _, stats = complete(model, format_prompt("Hello"), cache, max_tokens=1, temperature=0)
+    timings["warmup_first_token_ms"] = stats.as_dict()["ttft_ms"]
+    
+    completion_cache = completion_cache_from_env(MODEL_PATH)
+    llm, prefix_cache = model, cache
     logger.info("Model loaded successfully")
-    return llm
+    return timings
+
+def _load_in_background():
+    start = time.perf_counter()
+    try:
+        timings = load_model()
+        timings["startup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        model_status.update(state="ready", error=None, timings=timings)
+        logger.info(f"Model ready, startup timings: {timings}")
+    except Exception as e:
+        model_status.update(state="failed", error=str(e))
+        logger.error(f"Failed to load model: {str(e)}")
+
+def start_loading():
+    """Begin loading the model in a background thread (no-op while loading or loaded)"""
+    global _loader
+    with _load_lock:
+        if _loader is not None and (_loader.is_alive() or model_status["state"] == "ready"):
+            return
+        model_status.update(state="loading", error=None)
+        _loader = threading.Thread(target=_load_in_background, name="model-loader", daemon=True)
+        _loader.start()
+
+@app.route('/live', methods=['GET'])
+def live():
+    """Liveness: the server process is up, whether or not the model is loaded yet"""
+    return {
+        **model_status,
+        "scheduler": scheduler.stats(),
+        "completion_cache": completion_cache.stats() if completion_cache else None,
+        "guidance": guidance.stats() if guidance else None
+    }, 200
 
 @app.route('/ping', methods=['GET'])
 def ping():
-    """Health check endpoint required by SageMaker"""
-    global llm
-    if llm is None:
-        try:
-            load_model()
-        except Exception as e:
-            logger.error(f"Failed to load model: {str(e)}")
-            return '', 500
-    return '', 200
+    """Readiness check required by SageMaker: 200 only once the model is warmed up"""
+    state = model_status["state"]
+    if state == "ready":
+        return '', 200
+    if state == "failed":
+        # Retry the load; SageMaker keeps polling until its health check timeout
+        start_loading()
+        return {'error': model_status["error"]}, 500
+    return {'status': 'loading'}, 503
+
+def parse_flag(value):
+    """Boolean request flag; JSON clients also send it as a string ("false", "0", ...)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def sse_event(payload):
+    """One server-sent event; SageMaker response streaming passes the bytes through as-is"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def estimate_cost(prompt, max_tokens):
+    """Rough token cost of a request (~4 characters per prompt token)"""
+    return len(prompt) // 4 + max_tokens
+
+def format_result(prompt, text, finish_reason, metrics):
+    """OpenAI-style response body"""
+    return {
+        "choices": [{
+            "message": {
+                "content": text.strip()
+            },
+            "finish_reason": finish_reason
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(text.split()),
+            "total_tokens": len(prompt.split()) + len(text.split())
+        },
+        "metrics": metrics
+    }
+
+def cached_events(cached, metrics):
+    """Replay a cached completion as a (single chunk) event stream"""
+    yield sse_event({"choices": [{"delta": {"content": cached["text"]}, "finish_reason": None}]})
+    yield sse_event({
+        "choices": [{"delta": {}, "finish_reason": cached["finish_reason"]}],
+        "metrics": metrics
+    })
+    yield "data: [DONE]\n\n"
+
+def request_key(mode, prompt, max_tokens, temperature):
+    """
+    Identity of a request for single-flight: same prompt and parameters share
+    one generation. Only deterministic requests are coalesced (None otherwise),
+    as sampled ones should each get their own answer.
+    """
+    if temperature != 0:
+        return None
+    return (mode, prompt, max_tokens, temperature)
+
+def complete_job(prompt, max_tokens, temperature, cache_key=None):
+    """Scheduler job running a full completion (and filling the completion cache)"""
+    def run(job):
+        text, finish_reason, stats = complete(llm, prompt, prefix_cache, job.check,
+                                              max_tokens=max_tokens, temperature=temperature)
+        if cache_key is not None:
+            completion_cache.put(cache_key, {"text": text, "finish_reason": finish_reason})
+        return text, finish_reason, stats
+    return run
+
+def stream_job(prompt, max_tokens, temperature, cache_key=None):
+    """Scheduler job emitting OpenAI-style chunk events, then a final stats event"""
+    def run(job):
+        stats = GenerationStats()
+        finish_reason = "stop"
+        parts = []
+        for text, reason in stream_completion(llm, prompt, stats, prefix_cache, job.check,
+                                              max_tokens=max_tokens, temperature=temperature):
+            finish_reason = reason or finish_reason
+            if text:
+                parts.append(text)
+                job.emit(sse_event({"choices": [{"delta": {"content": text}, "finish_reason": None}]}))
+        
+        log_stats(stats)
+        if cache_key is not None:
+            completion_cache.put(cache_key, {"text": ''.join(parts), "finish_reason": finish_reason})
+        job.emit(sse_event({
+            "choices": [{"delta": {}, "finish_reason": finish_reason}],
+            "metrics": {**stats.as_dict(), "queue_ms": job.queue_ms,
+                        "cache": "miss" if cache_key else "bypass"}
+        }))
+        job.emit("data: [DONE]\n\n")
+    return run
+
+def stream_events(job):
+    """Relay a streaming job's events to the client"""
+    try:
+        yield from job.stream()
+    except Exception as e:
+        # Headers are already sent, so errors have to travel in the stream
+        logger.error(f"Error during streaming inference: {str(e)}")
+        yield sse_event({"error": str(e) or type(e).__name__})
 
 @app.route('/invocations', methods=['POST'])
 def invocations():
@@ -60,54 +224,100 @@ def invocations():
         if not input_data:
             return {'error': 'No input data provided'}, 400
         
+        # Structured guidance requests (device_key + step_number) are answered
+        # from pre-generated content; misses are generated like any prompt
+        stream = parse_flag(input_data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+        key = guidance_request(input_data)
+        if key is not None and guidance is not None:
+            start = time.perf_counter()
+            entry = guidance.get(key)
+            if entry is not None:
+                answer = {"text": render_guidance(entry), "finish_reason": "stop"}
+                metrics = {"guidance": "hit", "lookup_us": round((time.perf_counter() - start) * 1e6, 1)}
+                if stream:
+                    return Response(cached_events(answer, metrics), mimetype='text/event-stream',
+                                    headers={'Cache-Control': 'no-cache'})
+                result = format_result('', answer["text"], "stop", metrics)
+                result["guidance"] = entry
+                return json.dumps(result), 200, {'Content-Type': 'application/json'}
+        
         prompt = input_data.get('prompt', '')
-        max_tokens = input_data.get('max_tokens', 400)
-        temperature = input_data.get('temperature', 0.2)
+        if not prompt and key is not None:
+            prompt = format_prompt(guidance_prompt(key))
+        try:
+            max_tokens = int(input_data.get('max_tokens', 400))
+            temperature = float(input_data.get('temperature', 0.2))
+            timeout = min(float(input_data.get('timeout', REQUEST_TIMEOUT)), REQUEST_TIMEOUT)
+        except (TypeError, ValueError):
+            return {'error': 'max_tokens, temperature and timeout must be numbers'}, 400
         
         if not prompt:
             return {'error': 'No prompt provided'}, 400
         
+        if model_status["state"] != "ready":
+            return {'error': f'Model not ready ({model_status["state"]})'}, 503, {'Retry-After': '10'}
+        
+        # Repeated deterministic (or opted-in) requests are answered from the completion cache
+        cache_key = None
+        cached = None
+        if completion_cache is not None and should_cache(temperature, input_data.get('cache')):
+            cache_key = completion_cache.key(prompt, max_tokens=max_tokens, temperature=temperature)
+            cached = completion_cache.get(cache_key)
+        
+        if cached is not None:
+            logger.info(f"Completion cache hit for prompt: {prompt[:100]}...")
+            if stream:
+                return Response(cached_events(cached, {"cache": "hit"}), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache'})
+            result = format_result(prompt, cached["text"], cached["finish_reason"], {"cache": "hit"})
+            return json.dumps(result), 200, {'Content-Type': 'application/json'}
+        
         logger.info(f"Generating response for prompt: {prompt[:100]}...")
+        cost = estimate_cost(prompt, max_tokens)
+        
+        # Stream tokens as they are produced (InvokeEndpointWithResponseStream
+        # forwards the Accept header, or the client can ask with "stream": true)
+        # Identical deterministic requests already queued or running share that job (and its stream)
+        if stream:
+            job = scheduler.submit(stream_job(prompt, max_tokens, temperature, cache_key), cost, timeout,
+                                   key=request_key('stream', prompt, max_tokens, temperature))
+            return Response(
+                stream_events(job),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache'}
+            )
         
-        # Generate response
-        response = llm(
-            prompt,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            stop=["</s>", "<|end_of_text|>"],
-            echo=False
+        # Generate response on the model thread, reusing the cached KV state of the system prompt
+        job = scheduler.submit(
+            complete_job(prompt, max_tokens, temperature, cache_key),
+            cost,
+            timeout,
+            key=request_key('complete', prompt, max_tokens, temperature)
         )
+        text, finish_reason, stats = job.wait()
         
         # Format response to match OpenAI-style format
-        result = {
-            "choices": [{
-                "message": {
-                    "content": response['choices'][0]['text'].strip()
-                },
-                "finish_reason": "stop"
-            }],
-            "usage": {
-                "prompt_tokens": len(prompt.split()),
-                "completion_tokens": len(response['choices'][0]['text'].split()),
-                "total_tokens": len(prompt.split()) + len(response['choices'][0]['text'].split())
-            }
-        }
+        result = format_result(prompt, text, finish_reason,
+                               {**stats.as_dict(), "queue_ms": job.queue_ms,
+                                "cache": "miss" if cache_key else "bypass"})
         
         return json.dumps(result), 200, {'Content-Type': 'application/json'}
         
+    except QueueFull:
+        logger.warning(f"Rejecting request, scheduler at capacity: {scheduler.stats()}")
+        return {'error': 'Server busy, retry later'}, 429, {'Retry-After': '5'}
+    except DeadlineExceeded:
+        return {'error': 'Request deadline exceeded'}, 504
     except Exception as e:
         logger.error(f"Error during inference: {str(e)}")
         return {'error': str(e)}, 500
 
+# Start loading as soon as the module is imported (gunicorn worker boot or
+# __main__), so the weights are on their way before the first /ping
+if os.environ.get('PREDICTOR_EAGER_LOAD', '1') != '0':
+    start_loading()
+
 if __name__ == '__main__':
-    # Load model when starting
-    try:
-        load_model()
-        logger.info("Model loaded successfully on startup")
-    except Exception as e:
-        logger.error(f"Failed to load model on startup: {str(e)}")
-        # Don't exit, let the ping endpoint handle model loading
-    
     # Start Flask app
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
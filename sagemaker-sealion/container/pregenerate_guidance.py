@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Offline bulk pre-generation of device guidance with SEA-LION
+Enumerates the device x language x style x step matrix, generates every
+entry that isn't done yet across a pool of worker processes (each loads the
+GGUF model with its share of the CPU threads), and appends each result to a
+JSONL checkpoint as it lands, so an interrupted run resumes where it
+stopped. The finished entries are written in the phase1-content.json schema,
+ready for GUIDANCE_CONTENT_PATHS. Any small chat GGUF works for a trial run.
+
+Usage:
+    python pregenerate_guidance.py --model models/qwen2-0_5b-instruct-q4_k_m.gguf --limit 6
+    python pregenerate_guidance.py --model /opt/program/model/Gemma-SEA-LION-v4-27B-IT-Q4_K_M.gguf \\
+        --workers 2 --misses /var/log/guidance-misses.jsonl
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+
+from generation import PrefixStateCache, complete, format_prompt
+from guidance_index import LANGUAGE_NAMES, guidance_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+logger = logging.getLogger(__name__)
+
+# Default matrix, following the supported devices/languages/styles in
+# aws-deployment/guidance-redesign-schema.sql
+DEVICES = {
+    "blood_pressure_monitor": "Blood Pressure Monitor",
+    "digital_oral_thermometer": "Digital Oral Thermometer",
+    "digital_ear_thermometer": "Digital Ear Thermometer",
+    "glucose_meter": "Glucose Meter",
+    "nebulizer": "Nebulizer",
+    "pulse_oximeter": "Pulse Oximeter"
+}
+DEFAULT_DEVICES = ["blood_pressure_monitor", "digital_oral_thermometer", "digital_ear_thermometer"]
+LANGUAGES = ["en", "id", "th", "fil", "vi", "ms", "zh"]
+STYLES = {
+    "direct": "straightforward, concise instructions",
+    "gentle": "a friendly, reassuring tone with empathy",
+    "detailed": "comprehensive step-by-step guidance"
+}
+STEP_NAMES = {1: "Preparation", 2: "Setup", 3: "Measurement", 4: "Reading", 5: "Completion"}
+
+GUIDANCE_FIELDS = ("step_title", "step_instructions", "step_warnings", "step_tips")
+PROVIDER = "SIMISAI-SEA-LION"
+
+def enumerate_matrix(devices, languages, styles, steps):
+    """All keys in priority order: direct style and English first, as in the pre-generation strategy"""
+    return [
+        guidance_key(device, step, language, style)
+        for style in styles
+        for language in languages
+        for device in devices
+        for step in steps
+    ]
+
+def load_misses(path):
+    """Keys logged by GuidanceIndex as requested but not pre-generated"""
+    keys = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                miss = json.loads(line)
+                keys.append(guidance_key(miss["device_key"], miss["step_number"],
+                                         miss["language_code"], miss["style_key"]))
+    return keys
+
+def load_checkpoint(path):
+    """Completed entries by key; a line cut short by an interruption is ignored"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("entry"):
+                done[tuple(record["key"])] = record["entry"]
+    return done
+
+def build_prompt(key):
+    device_key, language_code, style_key, step_number = key
+    device = DEVICES.get(device_key, device_key.replace('_', ' ').title())
+    step_name = STEP_NAMES.get(step_number, f"Step {step_number}")
+    language = LANGUAGE_NAMES.get(language_code, language_code)
+    style = STYLES.get(style_key, style_key)
+    return format_prompt(
+        f"Write step {step_number} ({step_name}) of the instructions for using a {device} at home. "
+        f"Write in {language}, using {style}. Reply with only a JSON object with the keys "
+        f"\"step_title\" (a short title), \"step_instructions\" (2-3 sentences), "
+        f"\"step_warnings\" (one sentence) and \"step_tips\" (one sentence)."
+    )
+
+def parse_guidance(text):
+    """The guidance fields from the model's JSON reply; raises ValueError if incomplete"""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError("no JSON object in output")
+    fields = json.loads(text[start:end + 1])
+    missing = [field for field in GUIDANCE_FIELDS if not str(fields.get(field) or '').strip()]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    return {field: str(fields[field]).strip() for field in GUIDANCE_FIELDS}
+
+def build_entry(key, fields):
+    """An entry in the phase1-content.json schema"""
+    device_key, language_code, style_key, step_number = key
+    device_name = DEVICES.get(device_key, device_key.replace('_', ' ').title())
+    return {
+        "device_key": device_key,
+        "device_name": device_name,
+        "language_code": language_code,
+        "style_key": style_key,
+        "step_number": step_number,
+        "step_name": STEP_NAMES.get(step_number, f"Step {step_number}"),
+        "step_title": fields["step_title"],
+        "step_description": f"Step {step_number}: {fields['step_title']} for {device_name}",
+        "step_instructions": fields["step_instructions"],
+        "step_warnings": fields["step_warnings"],
+        "step_tips": fields["step_tips"],
+        "is_ai_generated": True,
+        "generated_by_ai_provider": PROVIDER,
+        "generation_quality_score": None,
+        "generated_at": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    }
+
+# Per-process model, loaded once by the pool initializer
+_llm = None
+_prefix_cache = None
+_settings = {}
+
+def _init_worker(model_path, threads, max_tokens, temperature, retries):
+    global _llm, _prefix_cache
+    from llama_cpp import Llama
+
+    _llm = Llama(model_path=model_path, n_ctx=2048, n_threads=threads, verbose=False)
+    # Every prompt shares the system turn, so each worker evaluates it once
+    _prefix_cache = PrefixStateCache(_llm)
+    _settings.update(max_tokens=max_tokens, temperature=temperature, retries=retries)
+    logger.info(f"Worker ready with {threads} threads")
+
+def _generate(key):
+    """Generate one entry, retrying unparseable output; returns a checkpoint record"""
+    prompt = build_prompt(key)
+    start = time.perf_counter()
+    tokens = 0
+    error = None
+    for attempt in range(_settings["retries"] + 1):
+        text, finish_reason, stats = complete(_llm, prompt, _prefix_cache,
+                                              max_tokens=_settings["max_tokens"],
+                                              temperature=_settings["temperature"])
+        tokens += stats.completion_tokens
+        try:
+            fields = parse_guidance(text)
+        except ValueError as e:
+            error = f"attempt {attempt + 1}: {e} (finish_reason={finish_reason})"
+            continue
+        return {"key": list(key), "entry": build_entry(key, fields),
+                "seconds": round(time.perf_counter() - start, 2), "completion_tokens": tokens}
+    return {"key": list(key), "error": error,
+            "seconds": round(time.perf_counter() - start, 2), "completion_tokens": tokens}
+
+def write_output(path, keys, done):
+    """Write every completed entry, in matrix order, as a phase1-content.json style array"""
+    entries = [done[key] for key in keys if key in done]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+    return len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk guidance pre-generation with SEA-LION')
+    parser.add_argument('--model', required=True, help='Path to a GGUF model')
+    parser.add_argument('--checkpoint', default='guidance-checkpoint.jsonl', help='JSONL progress file (resumed if present)')
+    parser.add_argument('--output', default='guidance-content.json', help='Output file in the phase1-content.json schema')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes, each with its own model')
+    parser.add_argument('--threads', type=int, default=None, help='llama.cpp threads per worker (default: cores / workers)')
+    parser.add_argument('--devices', default=','.join(DEFAULT_DEVICES), help='Comma-separated device keys')
+    parser.add_argument('--languages', default=','.join(LANGUAGES), help='Comma-separated language codes')
+    parser.add_argument('--styles', default=','.join(STYLES), help='Comma-separated style keys')
+    parser.add_argument('--steps', type=int, default=5, help='Steps per device')
+    parser.add_argument('--misses', help='GUIDANCE_MISS_LOG file; its keys are generated first')
+    parser.add_argument('--limit', type=int, default=None, help='Generate at most this many entries this run')
+    parser.add_argument('--max-tokens', type=int, default=400, help='Tokens per generation')
+    parser.add_argument('--temperature', type=float, default=0.3, help='Sampling temperature')
+    parser.add_argument('--retries', type=int, default=2, help='Retries for output that is not valid guidance JSON')
+    args = parser.parse_args()
+
+    keys = enumerate_matrix(args.devices.split(','), args.languages.split(','),
+                            args.styles.split(','), range(1, args.steps + 1))
+    if args.misses:
+        keys = load_misses(args.misses) + keys
+    keys = list(dict.fromkeys(keys))
+
+    done = load_checkpoint(args.checkpoint)
+    pending = [key for key in keys if key not in done]
+    if args.limit is not None:
+        pending = pending[:args.limit]
+    logger.info(f"{len(keys)} entries in matrix, {len(keys) - len(pending)} already done or skipped, "
+                f"{len(pending)} to generate")
+
+    if pending:
+        workers = max(1, min(args.workers, len(pending)))
+        threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+        start = time.perf_counter()
+        generated = failed = 0
+
+        with open(args.checkpoint, 'a', encoding='utf-8') as checkpoint, \
+                multiprocessing.Pool(workers, _init_worker, (args.model, threads, args.max_tokens,
+                                                            args.temperature, args.retries)) as pool:
+            for record in pool.imap_unordered(_generate, pending):
+                checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+
+                if record.get("entry"):
+                    done[tuple(record["key"])] = record["entry"]
+                    generated += 1
+                else:
+                    failed += 1
+                    logger.warning(f"Failed {record['key']}: {record['error']}")
+
+                hours = (time.perf_counter() - start) / 3600
+                finished = generated + failed
+                rate = generated / hours if hours > 0 else 0.0
+                eta_minutes = (len(pending) - finished) / (finished / hours) * 60 if finished else 0.0
+                logger.info(f"[{finished}/{len(pending)}] {record['key']} in {record['seconds']} s | "
+                            f"{rate:.0f} entries/hour | ETA {eta_minutes:.1f} min")
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Generated {generated} entries ({failed} failed) in {elapsed:.1f} s with {workers} workers "
+                    f"x {threads} threads: {generated / elapsed * 3600:.0f} entries/hour")
+
+    written = write_output(args.output, keys, done)
+    logger.info(f"Wrote {written}/{len(keys)} entries to {args.output}")
+
+if __name__ == '__main__':
+    main()
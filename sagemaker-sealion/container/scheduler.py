@@ -0,0 +1,225 @@
+"""
+Request scheduler for the single SEA-LION llama.cpp model
+The Llama object is not thread-safe, so every generation runs on one model
+thread. HTTP threads submit jobs to a bounded queue (full queue = reject
+with backpressure), jobs carry a deadline, and short requests are served
+ahead of long ones without starving them. Identical requests submitted
+while one is already queued or running share that job (single-flight).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    """The scheduler is at capacity; the client should retry later"""
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed while queued or generating"""
+
+class Cancelled(Exception):
+    """The client went away (e.g. a stream was closed)"""
+
+class Job:
+    """
+    One unit of model work. fn(job) runs on the model thread; streaming jobs
+    hand chunks back with job.emit() and HTTP threads read them with
+    job.stream(). Any number of requests can wait on or stream the same job;
+    it is cancelled only once all of them have gone away.
+    """
+
+    def __init__(self, fn, cost, deadline, key=None):
+        self.fn = fn
+        self.cost = cost
+        self.deadline = deadline
+        self.key = key
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self._chunks = []
+        self._cond = threading.Condition()
+        self._consumers = 0
+
+    @property
+    def queue_ms(self):
+        started = self.started_at or time.monotonic()
+        return round((started - self.submitted_at) * 1000, 1)
+
+    def check(self):
+        """Called between tokens: stop work nobody will receive"""
+        if self.cancelled.is_set():
+            raise Cancelled()
+        if time.monotonic() > self.deadline:
+            raise DeadlineExceeded()
+
+    def emit(self, chunk):
+        self.check()
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def _attach(self):
+        with self._cond:
+            self._consumers += 1
+
+    def _detach(self):
+        with self._cond:
+            self._consumers -= 1
+            if self._consumers == 0 and not self.done.is_set():
+                self.cancelled.set()
+
+    def wait(self):
+        """Block until the job finishes; returns its result or raises its error"""
+        self._attach()
+        try:
+            if not self.done.wait(timeout=max(0.0, self.deadline - time.monotonic()) + 1.0):
+                raise DeadlineExceeded()
+        finally:
+            self._detach()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def stream(self):
+        """Yield every emitted chunk (from the start) until the job finishes"""
+        self._attach()
+        try:
+            index = 0
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: index < len(self._chunks) or self.done.is_set())
+                    chunks = self._chunks[index:]
+                    finished = self.done.is_set()
+                index += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if finished and index == len(self._chunks):
+                    break
+            if self.error is not None:
+                raise self.error
+        finally:
+            self._detach()
+
+    def _finish(self, result=None, error=None):
+        with self._cond:
+            self.result = result
+            self.error = error
+            self.done.set()
+            self._cond.notify_all()
+
+class ModelScheduler:
+    """
+    Bounded two-class queue in front of one model thread.
+
+    Jobs whose estimated cost (prompt + max new tokens) is at most
+    short_threshold go to the short queue and are preferred, but after
+    short_burst consecutive short jobs a waiting long job always runs next.
+    """
+
+    def __init__(self, max_queue=8, short_threshold=600, short_burst=3):
+        self.max_queue = max_queue
+        self.short_threshold = short_threshold
+        self.short_burst = short_burst
+        self._short = deque()
+        self._long = deque()
+        self._cond = threading.Condition()
+        self._shorts_in_a_row = 0
+        self._inflight = {}  # key -> queued or running Job
+        self._thread = None
+        self.running_job = None
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.coalesced = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="model-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, fn, cost, timeout, key=None):
+        """
+        Queue fn(job) to run on the model thread; raises QueueFull at capacity.
+        With a key, a request identical to one already queued or running gets
+        that job back instead of starting another generation.
+        """
+        with self._cond:
+            job = self._inflight.get(key) if key is not None else None
+            if job is not None and not job.done.is_set() and not job.cancelled.is_set():
+                self.coalesced += 1
+                return job
+            
+            if len(self._short) + len(self._long) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull()
+            job = Job(fn, cost, time.monotonic() + timeout, key)
+            if key is not None:
+                self._inflight[key] = job
+            (self._short if cost <= self.short_threshold else self._long).append(job)
+            self._cond.notify()
+        self.start()
+        return job
+
+    def _retire(self, job, result=None, error=None):
+        with self._cond:
+            if job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        job._finish(result, error)
+
+    def _next_job(self):
+        if self._short and (not self._long or self._shorts_in_a_row < self.short_burst):
+            self._shorts_in_a_row += 1
+            return self._short.popleft()
+        self._shorts_in_a_row = 0
+        return self._long.popleft()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._short and not self._long:
+                    self._cond.wait()
+                job = self._next_job()
+
+            if job.cancelled.is_set():
+                self._retire(job, error=Cancelled())
+                continue
+            if time.monotonic() > job.deadline:
+                self.expired += 1
+                logger.warning(f"Dropping request that expired after {job.queue_ms} ms in queue")
+                self._retire(job, error=DeadlineExceeded())
+                continue
+
+            job.started_at = time.monotonic()
+            self.running_job = job
+            try:
+                self._retire(job, result=job.fn(job))
+            except DeadlineExceeded as e:
+                self.expired += 1
+                self._retire(job, error=e)
+            except Exception as e:
+                self._retire(job, error=e)
+            finally:
+                self.running_job = None
+                self.completed += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued_short": len(self._short),
+                "queued_long": len(self._long),
+                "max_queue": self.max_queue,
+                "busy": self.running_job is not None,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight)
+            }
@@ -0,0 +1,115 @@
+import sqlite3
+import time
+
+import pytest
+
+from completion_cache import CompletionCache, model_fingerprint, should_cache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for TTL checks"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+def disk_rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+def test_evicts_least_recently_used():
+    cache = CompletionCache("model", max_entries=2)
+    cache.put("a", {"text": "A"})
+    cache.put("b", {"text": "B"})
+    assert cache.get("a") == {"text": "A"}
+
+    cache.put("c", {"text": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"text": "A"}
+    assert cache.get("c") == {"text": "C"}
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire(clock):
+    cache = CompletionCache("model", ttl_seconds=60)
+    cache.put("a", {"text": "A"})
+
+    clock[0] += 59
+    assert cache.get("a") == {"text": "A"}
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_disk_tier_survives_restart_and_promotes(tmp_path):
+    path = str(tmp_path / "cache" / "completions.db")
+    cache = CompletionCache("model", max_entries=1, disk_path=path)
+    cache.put("a", {"text": "A"})
+    cache.put("b", {"text": "B"})
+
+    # Evicted from memory but still on disk
+    assert cache.get("a") == {"text": "A"}
+    assert cache.stats()["disk_hits"] == 1
+
+    restarted = CompletionCache("model", max_entries=1, disk_path=path)
+    assert restarted.get("b") == {"text": "B"}
+    assert restarted.get("b") == {"text": "B"}
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.stats()["hits"] == 1
+
+def test_disk_expired_rows_are_ignored_and_trimmed(tmp_path, clock):
+    path = str(tmp_path / "completions.db")
+    cache = CompletionCache("model", max_entries=1, ttl_seconds=60, disk_path=path)
+    cache.put("a", {"text": "A"})
+    cache.put("b", {"text": "B"})
+
+    clock[0] += 61
+    assert cache.get("a") is None
+
+    CompletionCache("model", disk_path=path)
+    assert disk_rows(path) == 0
+
+def test_disk_trimmed_at_high_water(tmp_path, clock):
+    path = str(tmp_path / "completions.db")
+    cache = CompletionCache("model", max_entries=1, disk_path=path, max_disk_entries=10)
+
+    for i in range(11):
+        clock[0] += 1
+        cache.put(f"k{i}", {"text": str(i)})
+    assert disk_rows(path) == 11
+
+    clock[0] += 1
+    cache.put("k11", {"text": "11"})
+
+    assert disk_rows(path) == 10
+    assert cache.get("k1") is None
+    assert cache.get("k2") == {"text": "2"}
+
+def test_key_normalizes_prompt_and_covers_params():
+    cache = CompletionCache("model")
+    key = cache.key("What is  the\r\nreading? ", temperature=0, max_tokens=64)
+
+    assert key == cache.key("What is the\nreading?", max_tokens=64, temperature=0)
+    assert key != cache.key("What is the\nreading?", temperature=0, max_tokens=128)
+    assert key != CompletionCache("other-model").key("What is the\nreading?", temperature=0, max_tokens=64)
+
+def test_fingerprint_tracks_model_contents(tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF" + bytes(4096))
+    first = model_fingerprint(str(model))
+
+    model.write_bytes(b"GGUF" + bytes(4095) + b"\x01")
+
+    assert model_fingerprint(str(model)) != first
+
+@pytest.mark.parametrize("temperature, requested, expected", [
+    (0, None, True),
+    ("0.0", None, True),
+    (0.7, None, False),
+    (None, None, False),
+    (0.7, True, True),
+    (0, False, False),
+    (0.7, "true", True),
+    (0, "false", False),
+    (0, "0", False),
+])
+def test_should_cache(temperature, requested, expected):
+    assert should_cache(temperature, requested) is expected
@@ -0,0 +1,88 @@
+import pytest
+
+from generation import PrefixStateCache, format_prompt, split_system_prefix
+
+class FakeLlama:
+    """Token-per-byte stand-in for llama_cpp.Llama's context and state API"""
+
+    def __init__(self):
+        self.input_ids = []
+        self.loads = 0
+        self.evals = 0
+
+    @property
+    def n_tokens(self):
+        return len(self.input_ids)
+
+    def tokenize(self, data, special=False):
+        return list(data)
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens):
+        self.evals += 1
+        self.input_ids = self.input_ids + list(tokens)
+
+    def save_state(self):
+        return list(self.input_ids)
+
+    def load_state(self, state):
+        self.loads += 1
+        self.input_ids = list(state)
+
+@pytest.fixture
+def llm():
+    return FakeLlama()
+
+def test_split_system_prefix():
+    prompt = format_prompt("Why is my thermometer blank?", system_prompt="Be brief.")
+
+    prefix = split_system_prefix(prompt)
+
+    assert prefix == "<|im_start|>system\nBe brief.\n<|im_end|>\n"
+    assert prompt.startswith(prefix)
+    assert split_system_prefix("<|im_start|>user\nhi\n<|im_end|>\n") is None
+
+def test_miss_registers_then_hit_reuses(llm):
+    cache = PrefixStateCache(llm)
+    prompt = format_prompt("first question")
+    prefix = split_system_prefix(prompt)
+
+    assert cache.prepare(prompt) == 0
+    assert cache.prepare(format_prompt("second question")) == len(prefix)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+def test_hit_loads_state_only_when_context_moved_on(llm):
+    cache = PrefixStateCache(llm)
+    prefix_tokens = len(split_system_prefix(format_prompt("q")))
+    cache.prepare(format_prompt("q"))
+
+    # Context still holds the prefix: llama.cpp reuses it without a load
+    cache.prepare(format_prompt("q"))
+    assert llm.loads == 0
+
+    llm.eval(list(b"rest of the last prompt"))
+    cache.prepare(format_prompt("q"))
+    assert llm.loads == 0
+
+    # Another system prompt took over the context
+    llm.reset()
+    llm.eval(list(b"<|im_start|>system\nsomething else"))
+    cache.prepare(format_prompt("q"))
+    assert llm.loads == 1
+    assert llm.n_tokens == prefix_tokens
+
+def test_keeps_most_recent_prefixes(llm):
+    cache = PrefixStateCache(llm, max_states=2)
+    prompts = [format_prompt("q", system_prompt=f"System {i}.") for i in range(3)]
+    cache.prepare(prompts[0])
+    cache.prepare(prompts[1])
+    cache.prepare(prompts[0])
+
+    cache.prepare(prompts[2])
+
+    assert cache.stats()["prefixes"] == 2
+    assert cache.prepare(prompts[0]) > 0
+    assert cache.prepare(prompts[1]) == 0
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import Cancelled, DeadlineExceeded, ModelScheduler, QueueFull
+
+LONG = 10_000
+
+@pytest.fixture
+def scheduler():
+    return ModelScheduler(max_queue=3, short_threshold=100, short_burst=2)
+
+@pytest.fixture
+def blocker(scheduler):
+    """Occupies the model thread until released, so later jobs stay queued"""
+    release = threading.Event()
+    running = threading.Event()
+
+    def block(job):
+        running.set()
+        release.wait(5)
+
+    scheduler.submit(block, LONG, timeout=10)
+    assert running.wait(5)
+    yield release
+    release.set()
+
+def test_rejects_when_full(scheduler, blocker):
+    for _ in range(scheduler.max_queue):
+        scheduler.submit(lambda job: None, 1, timeout=10)
+
+    with pytest.raises(QueueFull):
+        scheduler.submit(lambda job: None, 1, timeout=10)
+    assert scheduler.stats()["rejected"] == 1
+
+def test_drops_job_that_expires_in_queue(scheduler, blocker):
+    ran = []
+    job = scheduler.submit(ran.append, 1, timeout=0.05)
+    time.sleep(0.1)
+    blocker.set()
+
+    with pytest.raises(DeadlineExceeded):
+        job.wait()
+    assert not ran
+    assert scheduler.stats()["expired"] == 1
+
+def test_deadline_stops_running_job(scheduler):
+    def generate(job):
+        while True:
+            job.check()
+            time.sleep(0.01)
+
+    job = scheduler.submit(generate, 1, timeout=0.1)
+
+    with pytest.raises(DeadlineExceeded):
+        job.wait()
+    assert scheduler.stats()["expired"] == 1
+
+def test_closing_stream_cancels_generation(scheduler):
+    stopped = threading.Event()
+
+    def generate(job):
+        try:
+            for i in range(1000):
+                job.emit(i)
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    job = scheduler.submit(generate, 1, timeout=10)
+    stream = job.stream()
+    assert next(stream) == 0
+    stream.close()
+
+    assert stopped.wait(2)
+    assert job.cancelled.is_set()
+    with pytest.raises(Cancelled):
+        job.wait()
+
+def test_shared_job_survives_one_consumer_leaving(scheduler, blocker):
+    key = ("prompt", 0.0)
+    proceed = threading.Event()
+
+    def generate(job):
+        job.emit("partial")
+        proceed.wait(5)
+        job.check()
+        return "answer"
+
+    first = scheduler.submit(generate, 1, timeout=10, key=key)
+    second = scheduler.submit(lambda job: "other", 1, timeout=10, key=key)
+    assert second is first
+    assert scheduler.stats()["coalesced"] == 1
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(first.wait()))
+    waiter.start()
+    time.sleep(0.05)
+    stream = first.stream()
+    blocker.set()
+    assert next(stream) == "partial"
+    stream.close()
+    proceed.set()
+    waiter.join(5)
+
+    assert not first.cancelled.is_set()
+    assert results == ["answer"]
+    assert scheduler.submit(lambda job: None, 1, timeout=10, key=key) is not first
+
+def test_long_jobs_are_not_starved():
+    scheduler = ModelScheduler(max_queue=8, short_threshold=100, short_burst=2)
+    release = threading.Event()
+    order = []
+
+    def record(name):
+        def fn(job):
+            release.wait(5)
+            order.append(name)
+        return fn
+
+    scheduler.submit(record("blocker"), LONG, timeout=10)
+    time.sleep(0.05)
+    jobs = [scheduler.submit(record(name), LONG, timeout=10) for name in ("L1", "L2")]
+    jobs += [scheduler.submit(record(f"S{i}"), 1, timeout=10) for i in range(1, 6)]
+    release.set()
+    for job in jobs:
+        job.wait()
+
+    assert order == ["blocker", "S1", "S2", "L1", "S3", "S4", "L2", "S5"]
@@ -7,13 +7,24 @@ import json
 import logging
 from typing import Dict, Any, List
 
+from completion_cache import completion_cache_from_env, should_cache
+from generation import PrefixStateCache, complete, format_prompt, split_system_prefix
+from guidance_index import guidance_index_from_env, guidance_prompt, guidance_request, render_guidance
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SEA_LIONHandler:
+    # Sampling settings for every request
+    max_tokens = 400
+    temperature = 0.7
+    
     def __init__(self):
         self.model = None
+        self.prefix_cache = None
+        self.completion_cache = None
+        self.guidance = None
         self.context = None
         self.initialized = False
         self.model_path = None
@@ -27,6 +38,13 @@ class SEA_LIONHandler:
             
             # Find the GGUF model file in the model directory
             model_dir = context.system_properties.get("model_dir", "/opt/ml/model")
+            
+            # Pre-generated guidance answers structured requests even without the model
+            try:
+                self.guidance = guidance_index_from_env(model_dir)
+            except Exception as e:
+                logger.error(f"Failed to load guidance content: {str(e)}")
+            
             logger.info(f"Looking for GGUF model in: {model_dir}")
             
             # Search for GGUF files
@@ -57,6 +75,12 @@ class SEA_LIONHandler:
                     use_mlock=True
                 )
                 
+                # Evaluate the fixed system prompt once; every request starts from its state
+                self.prefix_cache = PrefixStateCache(self.model)
+                prefix_tokens = self.prefix_cache.register(split_system_prefix(self._format_prompt("")))
+                logger.info(f"Cached system prompt state ({prefix_tokens} tokens)")
+                self.completion_cache = completion_cache_from_env(self.model_path)
+                
                 logger.info("SEA-LION model loaded successfully!")
                 self.initialized = True
                 
@@ -76,8 +100,11 @@ class SEA_LIONHandler:
             
         return True
 
-    def preprocess(self, data: List[Dict[str, Any]]) -> str:
-        """Preprocess the input data"""
+    def preprocess(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Preprocess the input data into the prompt plus the request's 'cache'
+        flag and guidance key (kept per request, not on the shared handler)
+        """
         if not data:
             raise ValueError("No input data provided")
         
@@ -98,8 +125,14 @@ class SEA_LIONHandler:
         else:
             body = input_data
         
+        # Sampling is non-deterministic, so caching answers is opt-in per request
+        cache_requested = body.get("cache") if isinstance(body, dict) else None
+        guidance_key = guidance_request(body)
+        
         # Extract prompt
-        if "prompt" in body:
+        if guidance_key is not None and not body.get("prompt"):
+            prompt = guidance_prompt(guidance_key)
+        elif "prompt" in body:
             prompt = body["prompt"]
         elif "messages" in body:
             # Convert messages to prompt format
@@ -116,13 +149,22 @@ class SEA_LIONHandler:
             prompt = str(body)
         
         logger.info(f"Preprocessed prompt: {prompt[:100]}...")
-        return prompt
+        return {"prompt": prompt, "cache": cache_requested, "guidance_key": guidance_key}
 
-    def inference(self, prompt: str) -> Dict[str, Any]:
-        """Run inference on the prompt"""
+    def inference(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run inference on a preprocessed request"""
+        prompt = request["prompt"]
+        guidance_key = request["guidance_key"]
         logger.info(f"Running inference on prompt: {prompt[:100]}...")
         
         try:
+            # Structured guidance requests are answered from pre-generated content when possible
+            if guidance_key is not None and self.guidance is not None:
+                entry = self.guidance.get(guidance_key)
+                if entry is not None:
+                    logger.info(f"Guidance hit for {guidance_key}")
+                    return self._build_response("", render_guidance(entry), "stop", {"guidance": "hit"})
+            
             # Check if we have the actual model loaded
             if self.model is not None:
                 logger.info("Using actual SEA-LION model for inference")
@@ -130,33 +172,31 @@ class SEA_LIONHandler:
                 # Create a proper prompt for SEA-LION
                 formatted_prompt = self._format_prompt(prompt)
                 
+                # Serve repeated opted-in questions from the completion cache
+                cache_key = None
+                if self.completion_cache is not None and should_cache(self.temperature, request["cache"]):
+                    cache_key = self.completion_cache.key(formatted_prompt, max_tokens=self.max_tokens,
+                                                          temperature=self.temperature)
+                    cached = self.completion_cache.get(cache_key)
+                    if cached is not None:
+                        logger.info("Completion cache hit")
+                        return self._build_response(formatted_prompt, cached["text"],
+                                                    cached["finish_reason"], {"cache": "hit"})
+                
                 # Generate response using the actual model
-                response = self.model(
+                text, finish_reason, stats = complete(
+                    self.model,
                     formatted_prompt,
-                    max_tokens=400,
-                    temperature=0.7,
-                    stop=["</s>", "<|end_of_text|>", "[INST]", "[/INST]"],
-                    echo=False
+                    prefix_cache=self.prefix_cache,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    stop=["</s>", "<|end_of_text|>", "[INST]", "[/INST]"]
                 )
+                if cache_key is not None:
+                    self.completion_cache.put(cache_key, {"text": text, "finish_reason": finish_reason})
                 
-                # Extract the generated text
-                generated_text = response['choices'][0]['text'].strip()
-                
-                logger.info(f"Generated response: {generated_text[:100]}...")
-                
-                return {
-                    "choices": [{
-                        "message": {
-                            "content": generated_text
-                        },
-                        "finish_reason": "stop"
-                    }],
-                    "usage": {
-                        "prompt_tokens": len(formatted_prompt.split()),
-                        "completion_tokens": len(generated_text.split()),
-                        "total_tokens": len(formatted_prompt.split()) + len(generated_text.split())
-                    }
-                }
+                return self._build_response(formatted_prompt, text, finish_reason,
+                                            {**stats.as_dict(), "cache": "miss" if cache_key else "bypass"})
             else:
                 # Fallback to mock response if model not loaded
                 logger.info("Using mock response - model not available")
@@ -166,18 +206,33 @@ class SEA_LIONHandler:
             logger.error(f"Error during inference: {str(e)}")
             return self._get_mock_response(prompt)
     
+    def _build_response(self, formatted_prompt: str, text: str, finish_reason: str,
+                        metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """OpenAI-style response for generated (or cached) text"""
+        # Extract the generated text
+        generated_text = text.strip()
+        
+        logger.info(f"Generated response: {generated_text[:100]}...")
+        
+        return {
+            "choices": [{
+                "message": {
+                    "content": generated_text
+                },
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": len(formatted_prompt.split()),
+                "completion_tokens": len(generated_text.split()),
+                "total_tokens": len(formatted_prompt.split()) + len(generated_text.split())
+            },
+            "metrics": metrics
+        }
+    
     def _format_prompt(self, user_input: str) -> str:
         """Format the user input into a proper prompt for SEA-LION"""
-        # SEA-LION instruction format
-        formatted_prompt = f"""<|im_start|>system
-You are SEA-LION, an advanced AI assistant specialized in medical device troubleshooting and ASEAN language support. Provide helpful, accurate, and concise responses.
-<|im_end|>
-<|im_start|>user
-{user_input}
-<|im_end|>
-<|im_start|>assistant
-"""
-        return formatted_prompt
+        # SEA-LION instruction format (shared system prompt lives in generation.py)
+        return format_prompt(user_input)
     
     def _get_mock_response(self, prompt: str) -> Dict[str, Any]:
         """Get a mock response when the model is not available"""
@@ -204,6 +259,8 @@ You are SEA-LION, an advanced AI assistant specialized in medical device trouble
             "response": inference_output["choices"][0]["message"]["content"],
             "usage": inference_output["usage"]
         }
+        if "metrics" in inference_output:
+            result["metrics"] = inference_output["metrics"]
         
         logger.info("Postprocessing completed")
         return [result]
@@ -215,10 +272,10 @@ You are SEA-LION, an advanced AI assistant specialized in medical device trouble
                 self.initialize(context)
             
             # Preprocess
-            prompt = self.preprocess(data)
+            request = self.preprocess(data)
             
             # Inference
-            inference_output = self.inference(prompt)
+            inference_output = self.inference(request)
             
             # Postprocess
             result = self.postprocess(inference_output)
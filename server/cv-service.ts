@@ -1,4 +1,5 @@
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import readline from 'readline';
 import path from 'path';
 import fs from 'fs';
 import dotenv from 'dotenv';
@@ -19,9 +20,141 @@ export interface CVResponse {
   image_size: [number, number];
 }
 
+interface PendingRequest {
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+  timer: NodeJS.Timeout;
+}
+
+/**
+ * A long-lived `detect_screen.py --serve` process that keeps the model loaded
+ * and answers one newline-delimited JSON request per line.
+ */
+class DetectionWorker {
+  private process: ChildProcessWithoutNullStreams;
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 0;
+  private ready: Promise<void>;
+  public alive = true;
+
+  constructor(pythonScript: string, modelPath: string, env: NodeJS.ProcessEnv, private timeoutMs: number) {
+    this.process = spawn('python', [
+      pythonScript,
+      '--model', modelPath,
+      '--conf', '0.5',
+      '--serve'
+    ], { env });
+
+    const lines = readline.createInterface({ input: this.process.stdout });
+
+    this.ready = new Promise((resolveReady, rejectReady) => {
+      // A worker stuck loading the model (e.g. a slow Hugging Face download)
+      // would otherwise hold every request; kill it so the pool starts a fresh one
+      const readyTimer = setTimeout(() => {
+        const error = new Error(`Detection worker not ready after ${this.timeoutMs} ms`);
+        rejectReady(error);
+        this.failAll(error);
+        this.stop();
+      }, this.timeoutMs);
+
+      lines.on('line', (line) => {
+        let message: any;
+        try {
+          message = JSON.parse(line);
+        } catch (error) {
+          console.error('Detection worker emitted invalid JSON:', line);
+          return;
+        }
+
+        if (message.ready) {
+          clearTimeout(readyTimer);
+          resolveReady();
+          return;
+        }
+
+        const request = this.pending.get(message.id);
+        if (request) {
+          clearTimeout(request.timer);
+          this.pending.delete(message.id);
+          request.resolve(message);
+        }
+      });
+
+      this.process.on('error', (error) => {
+        const startError = new Error(`Failed to start Python process: ${error.message}`);
+        clearTimeout(readyTimer);
+        rejectReady(startError);
+        this.failAll(startError);
+      });
+
+      this.process.on('close', (code) => {
+        const error = new Error(`Detection worker exited with code ${code}`);
+        clearTimeout(readyTimer);
+        rejectReady(error);
+        this.failAll(error);
+      });
+    });
+
+    // Writing after the process died raises EPIPE here rather than crashing the server
+    this.process.stdin.on('error', (error) => {
+      this.failAll(new Error(`Detection worker stdin error: ${error.message}`));
+      this.process.kill();
+    });
+
+    this.process.stderr.on('data', (data) => {
+      console.error('Detection worker:', data.toString().trim());
+    });
+  }
+
+  get load(): number {
+    return this.pending.size;
+  }
+
+  /**
+   * Send one request: { image: path } or { image_b64: base64 bytes }
+   */
+  async detect(request: { image?: string; image_b64?: string }): Promise<any> {
+    await this.ready;
+    if (!this.alive) {
+      throw new Error('Detection worker is not running');
+    }
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      // A hung worker would otherwise leave the request waiting forever;
+      // kill it so the pool starts a fresh one
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Detection worker timed out after ${this.timeoutMs} ms`));
+        this.stop();
+      }, this.timeoutMs);
+      this.pending.set(id, { resolve, reject, timer });
+      this.process.stdin.write(JSON.stringify({ id, ...request }) + '\n');
+    });
+  }
+
+  /**
+   * Mark the worker dead and reject everything still waiting on it
+   */
+  private failAll(error: Error) {
+    this.alive = false;
+    this.pending.forEach((request) => {
+      clearTimeout(request.timer);
+      request.reject(error);
+    });
+    this.pending.clear();
+  }
+
+  stop() {
+    this.process.kill();
+  }
+}
+
 export class CVService {
   private modelPath: string;
   private pythonScript: string;
+  private workers: DetectionWorker[] = [];
+  private poolSize: number;
+  private workerTimeoutMs: number;
 
   constructor() {
     // Use environment variable to choose model source
@@ -39,37 +172,106 @@ export class CVService {
     
     this.pythonScript = path.resolve(process.cwd(), 'cv_model/detect_screen.py');
     
+    // Number of warm detection workers (0 = spawn a fresh process per request)
+    this.poolSize = parseInt(process.env.CV_WORKER_POOL_SIZE || '1', 10);
+    
+    // Longest a worker may take to load the model, and a request to wait on it
+    this.workerTimeoutMs = parseInt(process.env.CV_WORKER_TIMEOUT_MS || '30000', 10);
+    
     // Log the current configuration
     console.log('CV Service initialized with:');
     console.log(`- Model path: ${this.modelPath}`);
     console.log(`- Python script: ${this.pythonScript}`);
+    console.log(`- Worker pool size: ${this.poolSize}`);
+    console.log(`- Worker load and request timeout: ${this.workerTimeoutMs} ms`);
     console.log(`- Environment: ${process.env.NODE_ENV}`);
   }
 
+  private getPythonEnv() {
+    return {
+      ...process.env,
+      HUGGINGFACE_TOKEN: process.env.HUGGINGFACE_TOKEN || '',
+      HF_HUB_TOKEN: process.env.HUGGINGFACE_TOKEN || '',
+    };
+  }
+
+  /**
+   * Pick the least busy warm worker, (re)starting workers as needed
+   */
+  private getWorker(): DetectionWorker {
+    this.workers = this.workers.filter((worker) => worker.alive);
+    
+    if (this.workers.length < this.poolSize) {
+      const worker = new DetectionWorker(this.pythonScript, this.modelPath, this.getPythonEnv(), this.workerTimeoutMs);
+      this.workers.push(worker);
+      return worker;
+    }
+    
+    return this.workers.reduce((best, worker) => (worker.load < best.load ? worker : best));
+  }
+
+  /**
+   * Stop all warm detection workers
+   */
+  shutdown() {
+    this.workers.forEach((worker) => worker.stop());
+    this.workers = [];
+  }
+
   /**
    * Process an image and return detections
    * This is where you implement your CV logic
    */
   async detectObjects(imagePath: string): Promise<CVResponse> {
+    if (this.poolSize <= 0) {
+      return this.detectObjectsOneShot(['--image', imagePath]);
+    }
+    
+    return this.detectWithWorker({ image: imagePath });
+  }
+
+  /**
+   * Run detection on a warm worker from the pool
+   */
+  private async detectWithWorker(request: { image?: string; image_b64?: string }): Promise<CVResponse> {
+    const startTime = Date.now();
+    const result = await this.getWorker().detect(request);
+    
+    if (!result.success) {
+      console.error('Detection worker error:', result.error);
+    }
+    
+    return {
+      detections: result.detections || [],
+      processing_time: Date.now() - startTime,
+      image_size: result.image_size || [0, 0]
+    };
+  }
+
+  /**
+   * Run detection in a fresh Python process (pays model load on every call)
+   */
+  private async detectObjectsOneShot(imageArgs: string[], imageBytes?: Buffer): Promise<CVResponse> {
     return new Promise((resolve, reject) => {
       const startTime = Date.now();
       
       // Set environment variables for Python process
-      const env = {
-        ...process.env,
-        HUGGINGFACE_TOKEN: process.env.HUGGINGFACE_TOKEN || '',
-        HF_HUB_TOKEN: process.env.HUGGINGFACE_TOKEN || '',
-      };
+      const env = this.getPythonEnv();
       
       // Spawn Python process for inference
       const pythonProcess = spawn('python', [
         this.pythonScript,
         '--model', this.modelPath,
-        '--image', imagePath,
+        ...imageArgs,
         '--conf', '0.5',
         '--output', 'json'
       ], { env });
 
+      // Stream image bytes over stdin instead of writing a temp file
+      if (imageBytes) {
+        pythonProcess.stdin.end(imageBytes);
+      }
+
       let output = '';
       let errorOutput = '';
 
@@ -115,28 +317,12 @@ export class CVService {
     // Remove data URL prefix if present
     const base64Image = base64Data.replace(/^data:image\/[a-z]+;base64,/, '');
     
-    // Create temporary file
-    const tempDir = path.resolve(process.cwd(), 'temp');
-    if (!fs.existsSync(tempDir)) {
-      fs.mkdirSync(tempDir, { recursive: true });
+    // Hand the bytes straight to Python - no temporary files on disk
+    if (this.poolSize <= 0) {
+      return this.detectObjectsOneShot(['--image', '-'], Buffer.from(base64Image, 'base64'));
     }
     
-    const tempImagePath = path.join(tempDir, `temp_${Date.now()}.jpg`);
-    
-    try {
-      // Write base64 to file
-      fs.writeFileSync(tempImagePath, base64Image, 'base64');
-      
-      // Process the image
-      const result = await this.detectObjects(tempImagePath);
-      
-      return result;
-    } finally {
-      // Clean up temporary file
-      if (fs.existsSync(tempImagePath)) {
-        fs.unlinkSync(tempImagePath);
-      }
-    }
+    return this.detectWithWorker({ image_b64: base64Image });
   }
 
   /**